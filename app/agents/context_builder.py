@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import math
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import litellm
+
+from app.cache import redis_cache
+from app.core.metrics import record_llm_call, record_llm_tokens
+from app.core.config import (
+    GEMINI_API_KEY, SUPPORT_CONTEXT_TOKEN_BUDGET, CONTEXT_RECENT_TURNS, CONTEXT_TURN_MAX_TOKENS,
+    CONTEXT_SUMMARY_MAX_TOKENS, CONTEXT_SUMMARY_MODEL,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Estimating beats tokenizing here: it is free, and the budgets only need to be roughly right.
+# English text averages about four characters per token on the Gemini and GPT tokenizers.
+_CHARS_PER_TOKEN = 4
+
+_FENCED = re.compile(r"```.*?(?:```|$)", re.DOTALL)
+_LIST_LINE = re.compile(r"^\s*(?:[-*•]|\d+[.)]|\|)")
+_FIELD = re.compile(r"['\"]\w+['\"]\s*:")
+_MAX_LIST_LINES = 5
+_OMITTED = "[data omitted]"
+
+# Stores the new summary and drops whichever folded turns are still at the head of the history
+# (commits may have trimmed some away meanwhile; the summary still covers them). Returns how many
+# were dropped, or -1 if another refresh replaced the summary first.
+_FOLD_LUA = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[3] then
+    return -1
+end
+local folded = #ARGV - 3
+local head = redis.call('LRANGE', KEYS[1], 0, folded - 1)
+local gone = 0
+while gone < folded do
+    local present = true
+    for i = 1, folded - gone do
+        if head[i] ~= ARGV[3 + gone + i] then
+            present = false
+            break
+        end
+    end
+    if present then
+        break
+    end
+    gone = gone + 1
+end
+redis.call('LTRIM', KEYS[1], folded - gone, -1)
+redis.call('SETEX', KEYS[2], ARGV[2], ARGV[1])
+return folded - gone
+"""
+
+_SUMMARY_INSTRUCTIONS = (
+    "You keep a running summary of a customer support conversation for an online learning platform. "
+    "Merge the new turns into the existing summary. Keep what the assistant may need later: client names, "
+    "order IDs, courses, amounts, what was created or changed, and open questions. Leave out raw data listings. "
+    f"Reply with the summary only, in at most {CONTEXT_SUMMARY_MAX_TOKENS * 3 // 4} words."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    limit = max(max_tokens, 1) * _CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return "…" + text[-(limit - 1):].lstrip() if keep_end else text[:limit - 1].rstrip() + "…"
+
+
+def _is_data(line: str) -> bool:
+    text = line.strip()
+    return (text[:1] in "{[" and len(text) > 40) or len(_FIELD.findall(text)) >= 3
+
+
+def strip_tool_output(text: str) -> str:
+    """
+    Drops the parts of an answer that only mattered once: code blocks, raw records dumped from
+    tools, and long lists or tables beyond their first few rows.
+    """
+    out: List[str] = []
+    list_lines = 0
+    for line in _FENCED.sub(_OMITTED, text).splitlines():
+        if _is_data(line):
+            if not out or out[-1] != _OMITTED:
+                out.append(_OMITTED)
+            continue
+        list_lines = list_lines + 1 if _LIST_LINE.match(line) else 0
+        if list_lines > _MAX_LIST_LINES:
+            if list_lines == _MAX_LIST_LINES + 1:
+                out.append("[more rows omitted]")
+            continue
+        out.append(line)
+    return "\n".join(out).strip()
+
+
+def _turn_text(turn: Dict[str, Any], max_tokens: int) -> str:
+    content = str(turn.get("content", ""))
+    if turn.get("role") == "assistant":
+        content = strip_tool_output(content)
+    return f"{str(turn.get('role', 'user')).capitalize()}: {truncate_tokens(content, max_tokens)}"
+
+
+class ContextBuilder:
+    """
+    Builds an agent prompt within a token budget: the latest turns (tool output stripped, each
+    capped), then the rolling summary of older turns, then the user's prompt. What does not fit is
+    left out, oldest first, so the prompt stays under budget unless the user's message alone exceeds it.
+    """
+
+    def __init__(self, budget: int, recent_turns: int, turn_max_tokens: int, summary_max_tokens: int):
+        self.budget = budget
+        self.history_limit = recent_turns * 2  # user and assistant entries
+        self.turn_max_tokens = turn_max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self._lock = threading.Lock()
+        self._stats = {"builds": 0, "prompt_tokens": 0, "max_prompt_tokens": 0, "dropped_turns": 0, "over_budget": 0}
+
+    def build(self, prompt: str, conversation_history: List[Dict[str, Any]]) -> str:
+        user_line = f"User: {prompt}"
+        header = "Previous conversation:\n"
+        remaining = self.budget - estimate_tokens(user_line) - estimate_tokens(header) - 1
+
+        summary = next((str(t.get("content", "")) for t in conversation_history if t.get("role") == "summary"), "")
+        turns = [t for t in conversation_history if t.get("role") != "summary"][-self.history_limit:]
+        lines: List[str] = []
+        for turn in reversed(turns):
+            line = _turn_text(turn, self.turn_max_tokens)
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                break
+            lines.insert(0, line)
+            remaining -= cost
+
+        summary_tokens = min(self.summary_max_tokens, remaining - 10)
+        if summary and summary_tokens > 0:
+            lines.insert(0, f"Summary of earlier conversation: {truncate_tokens(summary, summary_tokens, keep_end=True)}")
+
+        context = header + "\n".join(lines) + "\n\n" if lines else ""
+        full_prompt = f"{context}{user_line}"
+        self._record(estimate_tokens(full_prompt), len(turns) - sum(1 for l in lines if not l.startswith("Summary")))
+        return full_prompt
+
+    def _record(self, tokens: int, dropped: int):
+        with self._lock:
+            self._stats["builds"] += 1
+            self._stats["prompt_tokens"] += tokens
+            self._stats["max_prompt_tokens"] = max(self._stats["max_prompt_tokens"], tokens)
+            self._stats["dropped_turns"] += dropped
+            self._stats["over_budget"] += 1 if tokens > self.budget else 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            builds = self._stats["builds"]
+            return {
+                "budget_tokens": self.budget,
+                "builds": builds,
+                "avg_prompt_tokens": round(self._stats["prompt_tokens"] / builds, 1) if builds else 0.0,
+                "max_prompt_tokens": self._stats["max_prompt_tokens"],
+                "dropped_turns": self._stats["dropped_turns"],
+                "over_budget": self._stats["over_budget"],
+            }
+
+
+class RollingSummary:
+    """
+    Folds history turns older than the verbatim window into a per-session summary stored next to
+    the history in Redis. Refreshes run after a turn is committed, off the request path; if the
+    summarizer model fails, an extractive summary (questions and first sentences) is kept instead.
+    """
+
+    def __init__(self, keep_entries: int, model: str, max_tokens: int, ttl: int = 3600):
+        self.keep_entries = keep_entries
+        self.model = model
+        self.max_tokens = max_tokens
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._running = set()
+        self._tasks = set()
+        self._counters = {"refreshes": 0, "folded_turns": 0, "fallbacks": 0, "conflicts": 0, "errors": 0}
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _plan(self, raw_history: List[str]) -> Optional[Tuple[List[str], List[Dict[str, Any]]]]:
+        """The raw entries to fold and their decoded turns, or None while everything fits the window."""
+        if len(raw_history) <= self.keep_entries:
+            return None
+        folded = raw_history[:len(raw_history) - self.keep_entries]
+        return folded, redis_cache._decode_history(folded)
+
+    def _messages(self, summary: Optional[str], turns: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        conversation = "\n".join(_turn_text(t, CONTEXT_TURN_MAX_TOKENS) for t in turns)
+        return [
+            {"role": "system", "content": _SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{conversation}"},
+        ]
+
+    def _fallback(self, summary: Optional[str], turns: List[Dict[str, Any]]) -> str:
+        parts = [summary] if summary else []
+        for turn in turns:
+            text = strip_tool_output(str(turn.get("content", ""))).replace(_OMITTED, "").strip()
+            first_sentence = re.split(r"(?<=[.!?])\s|\n", text, maxsplit=1)[0]
+            parts.append(f"{str(turn.get('role', 'user')).capitalize()}: {first_sentence}")
+        return " ".join(parts)
+
+    def _summary_text(self, resp: Any, started: float) -> Optional[str]:
+        record_llm_call(self.model, time.perf_counter() - started)
+        usage = getattr(resp, "usage", None)
+        record_llm_tokens(self.model, getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+        return resp.choices[0].message.content
+
+    def _finish(self, text: Optional[str], summary: Optional[str], turns: List[Dict[str, Any]]) -> str:
+        if not text or not text.strip():
+            self._count("fallbacks")
+            text = self._fallback(summary, turns)
+        return truncate_tokens(text.strip(), self.max_tokens, keep_end=True)
+
+    def _fold_args(self, session_id: str, folded: List[str], summary: Optional[str], new_summary: str):
+        keys = [redis_cache._history_key(session_id), redis_cache._summary_key(session_id)]
+        return keys, [new_summary, self.ttl, summary or "", *folded]
+
+    def _folded(self, dropped: int, turns: List[Dict[str, Any]]):
+        if dropped >= 0:
+            self._count("refreshes")
+            self._count("folded_turns", len(turns))
+        else:
+            self._count("conflicts")
+
+    async def refresh_async(self, session_id: str):
+        """Folds the session's older turns into its summary, if there are any beyond the window."""
+        if not redis_cache.redis_available():
+            return
+        try:
+            client = redis_cache._get_async_redis_client()
+            pipe = client.pipeline(transaction=False)
+            pipe.lrange(redis_cache._history_key(session_id), 0, -1)
+            pipe.get(redis_cache._summary_key(session_id))
+            raw_history, summary = await pipe.execute()
+            plan = self._plan(raw_history)
+            if plan is None:
+                return
+            folded, turns = plan
+            started = time.perf_counter()
+            try:
+                resp = await litellm.acompletion(model=self.model, messages=self._messages(summary, turns), api_key=GEMINI_API_KEY)
+                text = self._summary_text(resp, started)
+            except Exception as e:
+                record_llm_call(self.model, time.perf_counter() - started, ok=False)
+                logger.warning(f"[{session_id}] Summarizer failed, keeping an extractive summary: {e}")
+                text = None
+            keys, args = self._fold_args(session_id, folded, summary, self._finish(text, summary, turns))
+            self._folded(await client.eval(_FOLD_LUA, len(keys), *keys, *args), turns)
+        except Exception as e:
+            self._count("errors")
+            logger.error(f"[{session_id}] Error refreshing conversation summary: {e}", exc_info=True)
+
+    def refresh(self, session_id: str):
+        """Synchronous version of refresh_async, for callers off the event loop."""
+        try:
+            client = redis_cache._get_redis_client()
+            pipe = client.pipeline(transaction=False)
+            pipe.lrange(redis_cache._history_key(session_id), 0, -1)
+            pipe.get(redis_cache._summary_key(session_id))
+            raw_history, summary = pipe.execute()
+            plan = self._plan(raw_history)
+            if plan is None:
+                return
+            folded, turns = plan
+            started = time.perf_counter()
+            try:
+                resp = litellm.completion(model=self.model, messages=self._messages(summary, turns), api_key=GEMINI_API_KEY)
+                text = self._summary_text(resp, started)
+            except Exception as e:
+                record_llm_call(self.model, time.perf_counter() - started, ok=False)
+                logger.warning(f"[{session_id}] Summarizer failed, keeping an extractive summary: {e}")
+                text = None
+            keys, args = self._fold_args(session_id, folded, summary, self._finish(text, summary, turns))
+            self._folded(client.eval(_FOLD_LUA, len(keys), *keys, *args), turns)
+        except Exception as e:
+            self._count("errors")
+            logger.error(f"[{session_id}] Error refreshing conversation summary: {e}", exc_info=True)
+
+    def schedule(self, session_id: str):
+        """
+        Starts a refresh in the background: a task when called on the event loop, a thread otherwise.
+        At most one refresh per session runs at a time in this process.
+        """
+        with self._lock:
+            if session_id in self._running:
+                return
+            self._running.add(session_id)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            threading.Thread(target=self._run_refresh, args=(session_id,), daemon=True).start()
+        else:
+            task = loop.create_task(self._run_refresh_async(session_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _run_refresh(self, session_id: str):
+        try:
+            self.refresh(session_id)
+        finally:
+            with self._lock:
+                self._running.discard(session_id)
+
+    async def _run_refresh_async(self, session_id: str):
+        try:
+            await self.refresh_async(session_id)
+        finally:
+            with self._lock:
+                self._running.discard(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"model": self.model, "keep_turns": self.keep_entries // 2, "running": len(self._running), **self._counters}
+
+
+support_context = ContextBuilder(SUPPORT_CONTEXT_TOKEN_BUDGET, CONTEXT_RECENT_TURNS, CONTEXT_TURN_MAX_TOKENS, CONTEXT_SUMMARY_MAX_TOKENS)
+rolling_summary = RollingSummary(support_context.history_limit, CONTEXT_SUMMARY_MODEL, CONTEXT_SUMMARY_MAX_TOKENS)
@@ -1,5 +1,7 @@
+import logging
 import os
-from crewai import Agent, Task, Crew , LLM
+from crewai import Agent, Task, Crew
+from crewai.agents.agent_builder.utilities.base_token_process import TokenProcess
 
 from app.tools.get_total_revenue_tool import get_total_revenue_this_month_tool
 from app.tools.get_outstanding_payments_tool import get_outstanding_payments_tool
@@ -9,18 +11,30 @@ from app.tools.get_enrollment_trends_tool import get_enrollment_trends_tool
 from app.tools.get_top_services_tool import get_top_services_tool
 from app.tools.get_course_completion_rates_tool import get_course_completion_rates_tool
 from app.tools.get_attendance_percentage_by_class_tool import get_attendance_percentage_by_class_tool
+from app.tools.get_revenue_series_tool import get_revenue_series_tool
+from app.tools.get_enrollment_series_tool import get_enrollment_series_tool
 
-from app.core.config import GEMINI_API_KEY 
+from app.agents.llm import get_llm
+from app.agents.streaming import step_callback
+from app.agents.model_tiers import FAST, PRO, model_for, run_tiered
+from app.services.run_context import agent_run
+from app.cache.similarity_cache import DATA_COLLECTIONS, similarity_cache
+from app.cache.tool_cache import get_data_versions
+from app.core.config import SIMILARITY_CACHE_ENABLED, FAST_TIER_MAX_ITER, CREW_VERBOSE
+
+
+logger = logging.getLogger(__name__)
 
 
 class DashboardAgent:
     def __init__(self):
-        direct_llm = LLM(
-            model="gemini/gemini-2.5-pro",
-            api_key=GEMINI_API_KEY,
-    
-        )
-        self.agent = Agent(
+        # One crewai Agent per model tier; each query runs on the tier chosen for it.
+        self.agents = {tier: self._build_agent(tier) for tier in (FAST, PRO)}
+        self.agent = self.agents[PRO]
+
+    def _build_agent(self, tier: str) -> Agent:
+        limits = {"max_iter": FAST_TIER_MAX_ITER} if tier == FAST else {}
+        return Agent(
             role="Dashboard Analytics Bot",
             goal="Provide accurate and insightful analytics and metrics useful for business owners, covering revenue, client insights, service analytics, and attendance reports.",
             tools=[
@@ -32,33 +46,58 @@ class DashboardAgent:
                 get_top_services_tool,
                 get_course_completion_rates_tool,
                 get_attendance_percentage_by_class_tool,
+                get_revenue_series_tool,
+                get_enrollment_series_tool,
             ],
-            llm=direct_llm, 
-            verbose=True,
+            llm=get_llm(model_for("dashboard", tier)),
+            verbose=CREW_VERBOSE,
             allow_delegation=False,
+            **limits,
             backstory=(
                 "You are an expert AI analyst providing key business metrics and insights from the MongoDB database. "
                 "Your primary function is to interpret requests for analytics and generate detailed reports using the available tools. "
                 "You can generate reports on total revenue, outstanding payments, client engagement (active/inactive, new clients), "
-                "service popularity, enrollment trends, and class attendance percentages."
+                "service popularity, enrollment trends, class attendance percentages, and revenue or enrollment "
+                "time series over any date range and granularity."
             )
         )
 
-    def run(self, prompt: str):
-    
-        print(f"Running Dashboard Agent for prompt: '{prompt}'...")
+    def run(self, prompt: str, lookup_cache: bool = True):
+        """
+        Answers a dashboard prompt and stores the answer in the near-duplicate cache. The API
+        routes look the cache up on the event loop before queueing and pass lookup_cache=False.
+        """
+        logger.debug("Running dashboard agent", extra={"prompt": prompt})
 
-        task = Task(
-            description=prompt,
-            agent=self.agent,
-            expected_output="A clear and accurate analytical report based on the query, using data from available tools."
-        )
+        use_similarity_cache = SIMILARITY_CACHE_ENABLED and similarity_cache.is_cacheable(prompt)
+        data_version = get_data_versions(DATA_COLLECTIONS) if use_similarity_cache else ""
+        if use_similarity_cache and lookup_cache:
+            cached_response = similarity_cache.get("dashboard", prompt, data_version)
+            if cached_response is not None:
+                logger.info("Similarity cache hit for dashboard prompt")
+                return cached_response
 
-        crew = Crew(
-            agents=[self.agent],
-            tasks=[task],
-            verbose=True
-        )
+        def kickoff(tier: str):
+            agent = self.agents[tier]
+            # Pooled agents are reused; count tokens from zero so the output reports this run only.
+            agent._token_process = TokenProcess()
+            task = Task(
+                description=prompt,
+                agent=agent,
+                expected_output="A clear and accurate analytical report based on the query, using data from available tools."
+            )
+
+            crew = Crew(
+                agents=[agent],
+                tasks=[task],
+                verbose=CREW_VERBOSE,
+                step_callback=step_callback
+            )
+            return crew.kickoff()
 
-        resp = crew.kickoff()
+        with agent_run():
+            # Text either way, so a cache hit and a fresh run look the same to callers.
+            resp = str(run_tiered("dashboard", prompt, kickoff))
+        if use_similarity_cache:
+            similarity_cache.set("dashboard", prompt, resp, data_version)
         return resp
\ No newline at end of file
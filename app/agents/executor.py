@@ -0,0 +1,107 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.agents.pool import AgentPool
+from app.core.logs import sampled_trace
+from app.core.metrics import QUEUE_WAIT, record_phase
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the agent executor queue is full and a request cannot be admitted."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Agent executor is saturated. Retry after {retry_after} seconds.")
+        self.retry_after = retry_after
+
+
+class AgentExecutor:
+    """
+    Runs blocking agent calls on a dedicated thread pool so the event loop stays free.
+    At most `max_workers` calls run at once and at most `max_queue` more may wait;
+    anything beyond that is rejected with ExecutorSaturated instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, retry_after: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def submit(self, pool: AgentPool, fn: Callable[[Any], Any]) -> Any:
+        """
+        Checks out an agent from `pool` and runs `fn(agent)` on a worker thread.
+        The time spent waiting for the agent and for a free thread counts as queue wait.
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated(self.retry_after)
+            self._pending += 1
+
+        submitted = time.perf_counter()
+        try:
+            async with pool.acquire() as agent:
+                ctx = contextvars.copy_context()
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(self._pool, ctx.run, self._run, fn, agent, submitted, pool.name)
+                try:
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # The worker keeps using the agent until fn returns; only then may it go back to the pool.
+                    await asyncio.wait({future})
+                    raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def is_saturated(self) -> bool:
+        """True when a submit right now would be rejected."""
+        with self._lock:
+            return self._pending >= self.max_workers + self.max_queue
+
+    def _run(self, fn: Callable[[Any], Any], agent: Any, submitted: float, pool_name: str) -> Any:
+        started = time.perf_counter()
+        waited = started - submitted
+        with self._lock:
+            self._running += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        QUEUE_WAIT.labels(pool_name).observe(waited)
+        record_phase("queue", waited)
+        try:
+            with sampled_trace():
+                return fn(agent)
+        finally:
+            record_phase("agent", time.perf_counter() - started)
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns queue depth and wait-time metrics."""
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed_total": self._completed,
+                "rejected_total": self._rejected,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 2),
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
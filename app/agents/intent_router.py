@@ -0,0 +1,220 @@
+import logging
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import INTENT_ROUTER_ENABLED, INTENT_ROUTER_INTENTS
+from app.services.async_mongodb_tool import AsyncMongoDBTool
+from app.services.mongodb_tool import MongoDBTool
+from app.services.run_context import agent_run
+
+
+logger = logging.getLogger(__name__)
+
+# Greetings, politeness and "can you show me" wrappers around the actual request.
+_PREFIX = re.compile(
+    r"^(?:(?:hi|hey|hello)\b[,!.]?\s*)?(?:(?:please|pls|kindly)\s+)?"
+    r"(?:(?:can|could|would|will)\s+you\s+(?:please\s+)?)?(?:(?:tell|show|give|get|fetch|check)\s+me\s+)?"
+)
+_SUFFIX = re.compile(r"(?:[\s,]+(?:please|pls|thanks|thank you))?[\s?.!]*$")
+
+_ORDER = r"order(?:\s+(?:id|number|no\.?))?\s*#?\s*(?P<order_id>\d+)"
+
+
+class Intent:
+    """
+    A support question that maps one-to-one onto a MongoDBTool call and a templated answer.
+    `handler` runs on MongoDBTool (executor threads), `async_handler` on AsyncMongoDBTool (the event loop).
+    """
+
+    def __init__(self, name: str, patterns: List[str], handler: Callable[[MongoDBTool, re.Match], Optional[str]],
+                 async_handler: Callable[[AsyncMongoDBTool, re.Match], Awaitable[Optional[str]]]):
+        self.name = name
+        self.patterns = [re.compile(p) for p in patterns]
+        self.handler = handler
+        self.async_handler = async_handler
+
+    def match(self, text: str) -> Optional[re.Match]:
+        for pattern in self.patterns:
+            m = pattern.fullmatch(text)
+            if m:
+                return m
+        return None
+
+
+def _order_status_text(order_id: int, order_status: str) -> str:
+    if order_status == "Not found":
+        return f"I couldn't find an order with ID {order_id}. Please check the order number."
+    return f"Order {order_id} is currently {order_status}."
+
+
+def _order_status(tool: MongoDBTool, m: re.Match) -> Optional[str]:
+    order_id = int(m.group("order_id"))
+    return _order_status_text(order_id, tool.get_order_status(order_id))
+
+
+async def _order_status_async(tool: AsyncMongoDBTool, m: re.Match) -> Optional[str]:
+    order_id = int(m.group("order_id"))
+    return _order_status_text(order_id, await tool.get_order_status(order_id))
+
+
+def _upcoming_classes_text(classes: List[Dict]) -> str:
+    if not classes:
+        return "There are no upcoming classes scheduled right now."
+    lines = []
+    for c in sorted(classes, key=lambda c: (str(c.get("date", "")), str(c.get("time", "")))):
+        when = " at ".join(str(c[k]) for k in ("date", "time") if c.get(k))
+        lines.append(f"- {c.get('course', 'Class')} with {c.get('instructor', 'TBA')} on {when}")
+    return "Upcoming classes:\n" + "\n".join(lines)
+
+
+def _upcoming_classes(tool: MongoDBTool, m: re.Match) -> Optional[str]:
+    return _upcoming_classes_text(tool.list_upcoming_classes())
+
+
+async def _upcoming_classes_async(tool: AsyncMongoDBTool, m: re.Match) -> Optional[str]:
+    return _upcoming_classes_text(await tool.list_upcoming_classes())
+
+
+def _dues_client_query(m: re.Match) -> Optional[str]:
+    """The client reference of a pending-dues question, or None when it does not look like one."""
+    client_query = m.group("client").strip(" '\"")
+    if not client_query or len(client_query.split()) > 5 or re.search(r"\b(and|or|with|order|orders)\b", client_query):
+        return None
+    return client_query
+
+
+def _pending_dues_text(client: Dict, pending: List[Dict]) -> str:
+    if not pending:
+        return f"{client['name']} has no pending dues."
+    total = sum(o.get("amount", 0) for o in pending)
+    return f"{client['name']} has ${total:.2f} in pending dues across {len(pending)} order(s)."
+
+
+def _pending_dues(tool: MongoDBTool, m: re.Match) -> Optional[str]:
+    client_query = _dues_client_query(m)
+    client = tool.get_client(client_query) if client_query else None
+    if not client:
+        # Might be a misspelling or not a client reference at all; let the agent handle it.
+        return None
+    return _pending_dues_text(client, tool.get_order_details_by_client(client_query, "pending"))
+
+
+async def _pending_dues_async(tool: AsyncMongoDBTool, m: re.Match) -> Optional[str]:
+    client_query = _dues_client_query(m)
+    client = await tool.get_client(client_query) if client_query else None
+    if not client:
+        return None
+    return _pending_dues_text(client, await tool.get_order_details_by_client(client_query, "pending"))
+
+
+_INTENTS = [
+    Intent("order_status", [
+        rf"(?:what(?:'s|\s+is)\s+)?(?:the\s+)?(?:current\s+)?status\s+(?:of|for)\s+(?:my\s+|the\s+)?{_ORDER}",
+        rf"(?:my\s+|the\s+)?{_ORDER}(?:'s)?\s+status",
+        rf"where(?:'s|\s+is)\s+(?:my\s+|the\s+)?{_ORDER}",
+    ], _order_status, _order_status_async),
+    Intent("upcoming_classes", [
+        r"(?:(?:list|show)\s+(?:me\s+)?|what\s+are\s+|which\s+are\s+)?(?:all\s+)?(?:the\s+)?(?:available\s+)?"
+        r"upcoming\s+(?:classes|services|sessions)(?:\s+available)?",
+        r"what\s+classes\s+are\s+(?:available|upcoming|coming\s+up)",
+    ], _upcoming_classes, _upcoming_classes_async),
+    Intent("pending_dues", [
+        r"(?:what\s+are\s+|what's\s+|show\s+|check\s+|list\s+)?(?:the\s+)?(?:total\s+)?pending\s+(?:dues|payments|amount)\s+(?:for|of)\s+(?P<client>.+)",
+        r"how\s+much\s+(?:does|do)\s+(?P<client>.+?)\s+owe",
+    ], _pending_dues, _pending_dues_async),
+]
+
+
+class IntentRouter:
+    """
+    Answers common support questions straight from the database tools when the whole prompt matches
+    one of the known intents; anything else, or a match the handler is unsure about, goes to the agent.
+    """
+
+    def __init__(self, intents: List[Intent], enabled: List[str]):
+        self.intents = [i for i in intents if i.name in enabled]
+        self.tool = MongoDBTool()
+        self.async_tool = AsyncMongoDBTool()
+        self._lock = threading.Lock()
+        self._misses = 0
+        self._metrics: Dict[str, Dict[str, float]] = {
+            i.name: {"hits": 0, "fallbacks": 0, "errors": 0, "total_ms": 0.0} for i in self.intents
+        }
+
+    def match(self, prompt: str) -> Optional[Tuple[Intent, re.Match]]:
+        """Pure pattern check, no I/O; safe to call on the event loop."""
+        if not INTENT_ROUTER_ENABLED or not self.intents:
+            return None
+        text = _SUFFIX.sub("", _PREFIX.sub("", " ".join(prompt.lower().split())))
+        for intent in self.intents:
+            m = intent.match(text)
+            if m:
+                return intent, m
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def answer(self, matched: Tuple[Intent, re.Match]) -> Optional[str]:
+        """Runs the matched intent's tool call. Returns None when the agent should answer instead."""
+        intent, m = matched
+        start = time.perf_counter()
+        outcome = "fallbacks"
+        try:
+            with agent_run():
+                answer = intent.handler(self.tool, m)
+            if answer is not None:
+                outcome = "hits"
+            return answer
+        except Exception as e:
+            outcome = "errors"
+            logger.warning(f"Intent '{intent.name}' failed, falling back to the agent: {e}")
+            return None
+        finally:
+            self._record(intent, outcome, start)
+
+    async def answer_async(self, matched: Tuple[Intent, re.Match]) -> Optional[str]:
+        """Async version of answer, on the native asyncio MongoDB client; for the API routes."""
+        intent, m = matched
+        start = time.perf_counter()
+        outcome = "fallbacks"
+        try:
+            with agent_run():
+                answer = await intent.async_handler(self.async_tool, m)
+            if answer is not None:
+                outcome = "hits"
+            return answer
+        except Exception as e:
+            outcome = "errors"
+            logger.warning(f"Intent '{intent.name}' failed, falling back to the agent: {e}")
+            return None
+        finally:
+            self._record(intent, outcome, start)
+
+    def _record(self, intent: Intent, outcome: str, start: float):
+        with self._lock:
+            metrics = self._metrics[intent.name]
+            metrics[outcome] += 1
+            metrics["total_ms"] += (time.perf_counter() - start) * 1000
+
+    def route(self, prompt: str) -> Optional[str]:
+        matched = self.match(prompt)
+        return self.answer(matched) if matched else None
+
+    def stats(self):
+        with self._lock:
+            intents = {
+                name: {
+                    "hits": int(m["hits"]),
+                    "fallbacks": int(m["fallbacks"]),
+                    "errors": int(m["errors"]),
+                    "avg_ms": round(m["total_ms"] / (m["hits"] + m["fallbacks"] + m["errors"]), 2)
+                              if m["hits"] + m["fallbacks"] + m["errors"] else 0.0,
+                }
+                for name, m in self._metrics.items()
+            }
+            return {"enabled": INTENT_ROUTER_ENABLED, "misses": self._misses, "intents": intents}
+
+
+intent_router = IntentRouter(_INTENTS, INTENT_ROUTER_INTENTS)
@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+from crewai import LLM
+
+try:
+    from crewai.events import crewai_event_bus, LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent
+except ImportError:
+    from crewai.utilities.events import crewai_event_bus, LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent
+
+from app.core.config import GEMINI_API_KEY, LLM_STREAMING
+from app.core.metrics import record_llm_call
+
+
+logger = logging.getLogger(__name__)
+
+# Start time of the LLM call in progress on each agent thread; LLM instances are shared between threads.
+_calls = threading.local()
+_handlers_lock = threading.Lock()
+_handlers_registered = False
+
+
+@lru_cache(maxsize=None)
+def get_llm(model: str) -> LLM:
+    """
+    Returns a process-wide LLM instance for the given model.
+    Agents share these so LiteLLM keeps reusing the same HTTP connections
+    instead of setting up a new client for every agent that is built.
+    """
+    return LLM(
+        model=model,
+        api_key=GEMINI_API_KEY,
+        stream=LLM_STREAMING,
+    )
+
+
+def _on_call_started(source, event):
+    _calls.started = time.perf_counter()
+
+
+def _on_call_finished(source, event):
+    started = getattr(_calls, "started", None)
+    if started is None:
+        return
+    _calls.started = None
+    record_llm_call(getattr(source, "model", "unknown"), time.perf_counter() - started, ok=not isinstance(event, LLMCallFailedEvent))
+
+
+def register_llm_metrics():
+    """Times every LLM call the agents make (per model) from the CrewAI event bus. Safe to call more than once."""
+    global _handlers_registered
+    with _handlers_lock:
+        if _handlers_registered:
+            return
+        crewai_event_bus.register_handler(LLMCallStartedEvent, _on_call_started)
+        crewai_event_bus.register_handler(LLMCallCompletedEvent, _on_call_finished)
+        crewai_event_bus.register_handler(LLMCallFailedEvent, _on_call_finished)
+        _handlers_registered = True
+        logger.info("Registered CrewAI event handlers for LLM metrics.")
@@ -0,0 +1,166 @@
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from app.agents.streaming import emit_event
+from app.cache.similarity_cache import similarity_cache
+from app.core.config import MODEL_TIERING_ENABLED, MODEL_TIERS, MODEL_PRICES
+from app.core.metrics import record_llm_tokens
+from app.services.run_context import wrote_data
+
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+PRO = "pro"
+
+# Words that point at one area of the data; a prompt touching two or more usually needs
+# several tool calls and some reasoning across their results.
+_DOMAINS = {
+    "orders": r"\border(s|ed)?\b",
+    "payments": r"\b(payment|paid|pay|dues?|owe|outstanding|revenue|spend)",
+    "classes": r"\b(class|classes|session|schedule|instructor|upcoming)\b",
+    "clients": r"\b(client|customer|member|signup|registered)s?\b",
+    "courses": r"\b(course|service|enrol+ment|enrol+ed)s?\b",
+    "attendance": r"\battend",
+}
+# Asks for comparison, explanation or analysis rather than a single fact.
+_ANALYTIC = re.compile(
+    r"\b(compare|comparison|versus|vs\.?|trend|trends|growth|over time|breakdown|break down|why|analy[sz]e|analysis|"
+    r"forecast|correlat\w*|insight|insights|summary|summari[sz]e|report|each|per (month|week|quarter|course)|"
+    r"between|month over month|year over year|and then)\b",
+    re.IGNORECASE,
+)
+# Follow-ups that only make sense with the conversation so far.
+_REFERENCE = re.compile(r"\b(it|that|those|them|this one|same|previous|earlier|above|he|she|they|their)\b", re.IGNORECASE)
+
+_FAILED_OUTPUT = re.compile(r"(agent stopped due to iteration limit|i (don't|do not) know|unable to (answer|complete))", re.IGNORECASE)
+
+_MAX_FAST_WORDS = 30
+
+
+def classify(prompt: str, has_history: bool = False) -> str:
+    """
+    Heuristic tiering: short, single-topic lookups go to the fast model; multi-topic,
+    analytical, long or context-dependent prompts go to the pro model. So do writes (create
+    a client or an order), which must not be re-run on another tier after a failure.
+    """
+    if not MODEL_TIERING_ENABLED or not similarity_cache.is_cacheable(prompt):
+        return PRO
+    text = prompt.lower()
+    if len(text.split()) > _MAX_FAST_WORDS or text.count("?") > 1:
+        return PRO
+    if _ANALYTIC.search(text):
+        return PRO
+    if sum(1 for pattern in _DOMAINS.values() if re.search(pattern, text)) > 1:
+        return PRO
+    if has_history and _REFERENCE.search(text):
+        return PRO
+    return FAST
+
+
+def model_for(agent_name: str, tier: str) -> str:
+    return MODEL_TIERS[agent_name][tier]
+
+
+def _cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prices = MODEL_PRICES.get(model)
+    if prices:
+        return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+    try:
+        import litellm
+        prompt_cost, completion_cost = litellm.cost_per_token(model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return prompt_cost + completion_cost
+    except Exception:
+        return 0.0
+
+
+class TierStats:
+    """Per agent and tier: runs, failures, escalations, latency, tokens and estimated spend."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def _entry(self, agent_name: str, tier: str) -> Dict[str, float]:
+        return self._stats.setdefault((agent_name, tier), {
+            "runs": 0, "failures": 0, "escalations": 0, "total_ms": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+        })
+
+    def record(self, agent_name: str, tier: str, elapsed: float, ok: bool, usage: Any = None):
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        model = model_for(agent_name, tier)
+        cost = _cost(model, prompt_tokens, completion_tokens)
+        record_llm_tokens(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            entry = self._entry(agent_name, tier)
+            entry["runs"] += 1
+            entry["failures"] += 0 if ok else 1
+            entry["total_ms"] += elapsed * 1000
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["cost_usd"] += cost
+
+    def escalated(self, agent_name: str):
+        with self._lock:
+            self._entry(agent_name, FAST)["escalations"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result: Dict[str, Any] = {"enabled": MODEL_TIERING_ENABLED}
+            for (agent_name, tier), entry in sorted(self._stats.items()):
+                runs = entry["runs"]
+                result.setdefault(agent_name, {})[tier] = {
+                    "model": model_for(agent_name, tier),
+                    "runs": int(runs),
+                    "failures": int(entry["failures"]),
+                    "escalations": int(entry["escalations"]),
+                    "avg_latency_ms": round(entry["total_ms"] / runs, 2) if runs else 0.0,
+                    "prompt_tokens": int(entry["prompt_tokens"]),
+                    "completion_tokens": int(entry["completion_tokens"]),
+                    "cost_usd": round(entry["cost_usd"], 6),
+                    "avg_cost_usd": round(entry["cost_usd"] / runs, 6) if runs else 0.0,
+                }
+            return result
+
+
+tier_stats = TierStats()
+
+
+def _failed(resp: Any) -> bool:
+    text = str(getattr(resp, "raw", resp) or "").strip()
+    return not text or bool(_FAILED_OUTPUT.search(text))
+
+
+def run_tiered(agent_name: str, prompt: str, kickoff: Callable[[str], Any], has_history: bool = False) -> Any:
+    """
+    Runs `kickoff(tier)` on the tier chosen for the prompt. A fast-tier run that raises or
+    gives up is retried once on the pro tier, unless it already wrote data: the write tools
+    are not idempotent, so a retry could create a second client or order.
+    """
+    tier = classify(prompt, has_history)
+    while True:
+        start = time.perf_counter()
+        try:
+            resp = kickoff(tier)
+        except Exception as e:
+            tier_stats.record(agent_name, tier, time.perf_counter() - start, ok=False)
+            if tier == PRO or wrote_data():
+                raise
+            logger.warning(f"{agent_name} fast tier failed, escalating to pro: {e}")
+        else:
+            ok = not _failed(resp)
+            tier_stats.record(agent_name, tier, time.perf_counter() - start, ok, getattr(resp, "token_usage", None))
+            if ok or tier == PRO:
+                return resp
+            if wrote_data():
+                logger.warning(f"{agent_name} fast tier gave up on '{prompt}' after writing data; not retrying on pro.")
+                return resp
+            logger.info(f"{agent_name} fast tier gave up on '{prompt}', escalating to pro.")
+        tier_stats.escalated(agent_name)
+        emit_event("escalate", {"from": model_for(agent_name, FAST), "to": model_for(agent_name, PRO)})
+        tier = PRO
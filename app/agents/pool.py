@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+
+
+logger = logging.getLogger(__name__)
+
+
+class AgentPool:
+    """
+    Holds a fixed number of pre-built agent instances and hands them out one
+    request at a time. A CrewAI Agent keeps per-run state, so an instance is
+    never shared by two requests at once; callers wait for a free one instead.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], size: int):
+        if size < 1:
+            raise ValueError(f"Agent pool '{name}' needs a size of at least 1, got {size}.")
+        self.name = name
+        self.size = size
+        self._factory = factory
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self._acquired = 0
+        self._waiting = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def fill(self):
+        """Builds every agent instance up front so no request pays for construction."""
+        while not self._queue.full():
+            self._queue.put_nowait(self._factory())
+        logger.info(f"Agent pool '{self.name}' ready with {self.size} instance(s).")
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Yields a free agent instance and returns it to the pool afterwards."""
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            agent = await self._queue.get()
+        finally:
+            self._waiting -= 1
+
+        waited = time.perf_counter() - started
+        self._acquired += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        try:
+            yield agent
+        finally:
+            self._queue.put_nowait(agent)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns a snapshot of pool usage."""
+        available = self._queue.qsize()
+        return {
+            "size": self.size,
+            "available": available,
+            "in_use": self.size - available,
+            "waiting": self._waiting,
+            "acquired_total": self._acquired,
+            "avg_wait_ms": round(self._total_wait / self._acquired * 1000, 2) if self._acquired else 0.0,
+            "max_wait_ms": round(self._max_wait * 1000, 2),
+        }
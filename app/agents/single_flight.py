@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List
+
+from app.cache import redis_cache
+from app.cache.similarity_cache import normalize_prompt, similarity_cache
+from app.core.config import (
+    SINGLE_FLIGHT_ENABLED, SINGLE_FLIGHT_LOCK_TTL, SINGLE_FLIGHT_RESULT_TTL,
+)
+
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Releases the lock only if this worker still owns it (it may have expired and been re-taken).
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def flight_key(agent_name: str, prompt: str, session_id: str = "global", conversation_history: List[Dict[str, Any]] = None) -> str:
+    """
+    Identifies queries that must get the same answer: same agent, same normalized prompt and
+    the same conversation so far. Prompts that write data are also scoped to their session,
+    so a retried "create order" coalesces but two users placing the same order do not.
+    """
+    context = json.dumps(conversation_history or [], sort_keys=True, default=str)
+    scope = "" if similarity_cache.is_cacheable(prompt) else session_id
+    raw = f"{agent_name}|{normalize_prompt(prompt)}|{scope}|{context}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _result_key(key: str, token: str) -> str:
+    return f"singleflight:result:{key}:{token}"
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight agent queries. Within a process, duplicates await the task
+    of the first caller. Across gunicorn workers, the first worker takes a Redis lock (SET NX)
+    and publishes the result on a channel; the others wait for it instead of running the query.
+    If the owner dies or Redis is unavailable, waiting workers run the query themselves.
+    Results are shared as text.
+    """
+
+    def __init__(self, lock_ttl: int, result_ttl: int):
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._counters = {"leaders": 0, "local_joins": 0, "remote_joins": 0, "remote_fallbacks": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> str:
+        """Returns str(await fn()), sharing one execution among concurrent callers with the same key."""
+        if not SINGLE_FLIGHT_ENABLED:
+            return str(await fn())
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count("local_joins")
+        else:
+            task = asyncio.create_task(self._run(key, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        # Shielded so one caller disconnecting does not cancel the run the others wait for.
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so a failure nobody awaited is not reported twice
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> str:
+        if not redis_cache.redis_available():
+            self._count("leaders")
+            return str(await fn())
+
+        client = redis_cache._get_async_redis_client()
+        lock_key = f"singleflight:lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await client.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except Exception as e:
+            redis_cache._mark_unhealthy(e)
+            acquired = True
+            token = None
+
+        if not acquired:
+            result = await self._wait_for_remote(client, key, lock_key)
+            if result is not _MISSING:
+                self._count("remote_joins")
+                return result
+            self._count("remote_fallbacks")
+
+        self._count("leaders")
+        try:
+            result = str(await fn())
+        except BaseException:
+            if token:
+                await self._release(client, lock_key, token)
+            raise
+        if token:
+            await self._publish(client, key, lock_key, token, result)
+        return result
+
+    async def _publish(self, client, key: str, lock_key: str, token: str, result: str):
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.setex(_result_key(key, token), self.result_ttl, result)
+            pipe.publish(f"singleflight:done:{key}", "1")
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Single-flight could not publish result: {e}")
+        await self._release(client, lock_key, token)
+
+    async def _release(self, client, lock_key: str, token: str):
+        try:
+            await client.eval(_RELEASE_LUA, 1, lock_key, token)
+        except Exception as e:
+            logger.warning(f"Single-flight could not release lock: {e}")
+
+    async def _wait_for_remote(self, client, key: str, lock_key: str):
+        """
+        Waits for the worker holding the lock to publish its result. Gives up when the lock
+        disappears without a result (owner failed) or expires, returning _MISSING.
+        Only the result of the run holding the lock now counts: results are keyed by the lock
+        token, so one left over from an earlier run of the same query is never returned.
+        """
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(f"singleflight:done:{key}")
+            token = await client.get(lock_key)
+            if token is None:
+                return _MISSING
+            result_key = _result_key(key, token)
+            deadline = time.monotonic() + self.lock_ttl
+            while time.monotonic() < deadline:
+                # Checked after subscribing, so a result published in between is not missed.
+                result = await client.get(result_key)
+                if result is not None:
+                    return result
+                if await client.get(lock_key) != token:
+                    return _MISSING
+                await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            return _MISSING
+        except Exception as e:
+            logger.warning(f"Single-flight wait failed, running the query here: {e}")
+            return _MISSING
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"enabled": SINGLE_FLIGHT_ENABLED, "in_flight": len(self._inflight), **self._counters}
+
+
+single_flight = SingleFlight(SINGLE_FLIGHT_LOCK_TTL, SINGLE_FLIGHT_RESULT_TTL)
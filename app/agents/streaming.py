@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+try:
+    from crewai.events import (
+        crewai_event_bus, LLMCallStartedEvent, LLMStreamChunkEvent,
+        ToolUsageStartedEvent, ToolUsageFinishedEvent, ToolUsageErrorEvent,
+    )
+except ImportError:
+    from crewai.utilities.events import (
+        crewai_event_bus, LLMCallStartedEvent, LLMStreamChunkEvent,
+        ToolUsageStartedEvent, ToolUsageFinishedEvent, ToolUsageErrorEvent,
+    )
+
+from app.core.config import SSE_MAX_EVENT_CHARS
+
+
+logger = logging.getLogger(__name__)
+
+# The EventStream of the request whose agent run is executing in this context, if any.
+# The agent executor copies the caller's context onto the worker thread, so CrewAI events
+# emitted while that run executes find their way back to the right response.
+_current_stream: ContextVar[Optional["EventStream"]] = ContextVar("current_event_stream", default=None)
+
+_FINAL_ANSWER = "Final Answer:"
+
+_handlers_lock = threading.Lock()
+_handlers_registered = False
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _truncate(value: Any) -> str:
+    text = str(value)
+    return text if len(text) <= SSE_MAX_EVENT_CHARS else text[:SSE_MAX_EVENT_CHARS] + "…"
+
+
+class EventStream:
+    """
+    Collects progress events from an agent run on a worker thread and hands them to the
+    event loop serving the SSE response. Only the tokens after "Final Answer:" are streamed
+    as `token` events; the reasoning in between is reported through `step` events.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._buffer = ""
+        self._in_final = False
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        """Thread-safe: queues an event for the SSE response."""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+
+    def llm_call_started(self):
+        self._buffer = ""
+        self._in_final = False
+
+    def chunk(self, text: str):
+        if self._in_final:
+            self.emit("token", {"text": text})
+            return
+        self._buffer += text
+        index = self._buffer.find(_FINAL_ANSWER)
+        if index >= 0:
+            self._in_final = True
+            rest = self._buffer[index + len(_FINAL_ANSWER):].lstrip()
+            self._buffer = ""
+            if rest:
+                self.emit("token", {"text": rest})
+
+    @contextmanager
+    def bind(self):
+        """Routes events from agent runs started in this context to this stream."""
+        token = _current_stream.set(self)
+        try:
+            yield self
+        finally:
+            _current_stream.reset(token)
+
+
+def emit_event(event: str, data: Dict[str, Any]):
+    """Sends an event to the stream of the agent run executing in this context, if it is being streamed."""
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.emit(event, data)
+
+
+def step_callback(step: Any):
+    """Crew step_callback: reports each ReAct step (thought, chosen tool and input) to the active stream."""
+    stream = _current_stream.get()
+    if stream is None:
+        return
+    data = {"thought": _truncate(getattr(step, "thought", "") or "")}
+    if getattr(step, "tool", None):
+        data["tool"] = step.tool
+        data["tool_input"] = _truncate(getattr(step, "tool_input", ""))
+    elif getattr(step, "result", None) is not None:
+        data["result"] = _truncate(step.result)
+    if any(data.values()):
+        stream.emit("step", data)
+
+
+def _on_llm_call_started(source, event):
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.llm_call_started()
+
+
+def _on_llm_chunk(source, event):
+    stream = _current_stream.get()
+    if stream is not None and event.chunk:
+        stream.chunk(event.chunk)
+
+
+def _on_tool_started(source, event):
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.emit("tool_start", {"tool": event.tool_name, "args": _truncate(event.tool_args)})
+
+
+def _on_tool_finished(source, event):
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.emit("tool_end", {"tool": event.tool_name, "from_cache": event.from_cache, "output": _truncate(event.output)})
+
+
+def _on_tool_error(source, event):
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.emit("tool_error", {"tool": event.tool_name, "error": _truncate(event.error)})
+
+
+def register_event_handlers():
+    """Subscribes the stream forwarders to the CrewAI event bus. Safe to call more than once."""
+    global _handlers_registered
+    with _handlers_lock:
+        if _handlers_registered:
+            return
+        crewai_event_bus.register_handler(LLMCallStartedEvent, _on_llm_call_started)
+        crewai_event_bus.register_handler(LLMStreamChunkEvent, _on_llm_chunk)
+        crewai_event_bus.register_handler(ToolUsageStartedEvent, _on_tool_started)
+        crewai_event_bus.register_handler(ToolUsageFinishedEvent, _on_tool_finished)
+        crewai_event_bus.register_handler(ToolUsageErrorEvent, _on_tool_error)
+        _handlers_registered = True
+        logger.info("Registered CrewAI event handlers for SSE streaming.")
@@ -1,5 +1,7 @@
+import logging
 import os
-from crewai import Agent, Task, Crew, LLM
+from crewai import Agent, Task, Crew
+from crewai.agents.agent_builder.utilities.base_token_process import TokenProcess
 from app.tools.get_order_status_tool import get_order_status_tool
 from app.tools.list_upcoming_classes_tool import list_upcoming_classes_tool
 from app.tools.filter_classes_tool import filter_classes_tool
@@ -11,18 +13,30 @@ from app.tools.calculate_pending_dues_tool import calculate_pending_dues_tool
 from app.tools.create_client_tool import create_client_tool
 from app.tools.create_order_tool import create_order_tool
 
-from app.cache.redis_cache import get_cached, set_cached, get_conversation_history, add_to_conversation_history
-from app.core.config import GEMINI_API_KEY
+from app.cache.redis_cache import load_session, commit_turn
+from app.cache.similarity_cache import DATA_COLLECTIONS, similarity_cache
+from app.cache.tool_cache import get_data_versions
+from app.core.config import SIMILARITY_CACHE_ENABLED, FAST_TIER_MAX_ITER, CREW_VERBOSE
+from app.agents.llm import get_llm
+from app.agents.streaming import step_callback
+from app.agents.model_tiers import FAST, PRO, model_for, run_tiered
+from app.agents.intent_router import intent_router
+from app.agents.context_builder import support_context, rolling_summary
+from app.services.run_context import agent_run
+
+
+logger = logging.getLogger(__name__)
 
 
 class SupportAgent:
     def __init__(self):
-        direct_llm = LLM(
-            model="gemini/gemini-2.5-pro",
-            api_key=GEMINI_API_KEY,
-        )
+        # One crewai Agent per model tier; each query runs on the tier chosen for it.
+        self.agents = {tier: self._build_agent(tier) for tier in (FAST, PRO)}
+        self.agent = self.agents[PRO]
 
-        self.agent = Agent(
+    def _build_agent(self, tier: str) -> Agent:
+        limits = {"max_iter": FAST_TIER_MAX_ITER} if tier == FAST else {}
+        return Agent(
             role="Support Assistant",
             goal=(
                 "Handle course, order, payment, and client queries, "
@@ -40,9 +54,10 @@ class SupportAgent:
                 create_client_tool,
                 create_order_tool,
             ],
-            llm=direct_llm,
-            verbose=True,
+            llm=get_llm(model_for("support", tier)),
+            verbose=CREW_VERBOSE,
             allow_delegation=False,
+            **limits,
             backstory=(
                 "You are a helpful AI assistant specialized in managing customer service "
                 "queries related to an online learning platform. Your expertise includes "
@@ -53,61 +68,73 @@ class SupportAgent:
             )
         )
 
-    def run(self, prompt: str, session_id: str = "global"):
-        print(f"[DEBUG] Received session_id: {session_id}")
 
+    def respond(self, prompt: str, conversation_history: list, session_id: str = "global", use_intent_router: bool = True):
+        """
+        Runs the crew for a prompt given already-loaded conversation history.
+        Does no Redis I/O, so callers can do that asynchronously around it.
+        Prompts matching a known intent are answered directly from the database; stand-alone
+        prompts (no history) are then checked against the near-duplicate cache.
+        """
+        if use_intent_router:
+            answer = intent_router.route(prompt)
+            if answer is not None:
+                logger.info("Intent fast path answered prompt", extra={"session_id": session_id})
+                return answer
+
+        use_similarity_cache = SIMILARITY_CACHE_ENABLED and not conversation_history and similarity_cache.is_cacheable(prompt)
+        data_version = get_data_versions(DATA_COLLECTIONS) if use_similarity_cache else ""
+        if use_similarity_cache:
+            cached_response = similarity_cache.get("support", prompt, data_version)
+            if cached_response is not None:
+                logger.info("Similarity cache hit", extra={"session_id": session_id})
+                return cached_response
+
+        full_prompt_for_agent = support_context.build(prompt, conversation_history)
+        logger.debug("Running support agent", extra={"session_id": session_id, "prompt": full_prompt_for_agent})
+
+        def kickoff(tier: str):
+            agent = self.agents[tier]
+            # Pooled agents are reused; count tokens from zero so the output reports this run only.
+            agent._token_process = TokenProcess()
+            task = Task(
+                description=full_prompt_for_agent,
+                agent=agent,
+                expected_output="A concise and helpful answer relevant to the user's query, considering the conversation history."
+            )
+
+            crew = Crew(
+                agents=[agent],
+                tasks=[task],
+                verbose=CREW_VERBOSE,
+                step_callback=step_callback
+            )
+            return crew.kickoff()
+
+        with agent_run():
+            resp = str(run_tiered("support", prompt, kickoff, has_history=bool(conversation_history)))
+        logger.debug("Support agent response", extra={"session_id": session_id, "response": resp})
+        if use_similarity_cache:
+            similarity_cache.set("support", prompt, resp, data_version)
+        return resp
+
+    def run(self, prompt: str, session_id: str = "global"):
         use_cache = session_id != "global"
-        print(f"[DEBUG] use_cache: {use_cache}")
 
         if use_cache:
-            cached_response = get_cached(session_id, prompt)
+            cached_response, conversation_history = load_session(session_id, prompt, limit=support_context.history_limit)
             if cached_response:
-                print(f"[{session_id}] ✅ Cache HIT for prompt: '{prompt}'")
+                logger.info("Response cache hit", extra={"session_id": session_id})
                 return {"cached": True, "response": cached_response}
-            else:
-                print(f"[{session_id}] ❌ Cache MISS for prompt: '{prompt}'")
-
-            conversation_history = get_conversation_history(session_id)
-            print(f"[{session_id}] Loaded conversation history: {conversation_history}")
+            logger.debug("Loaded conversation history", extra={"session_id": session_id, "history": conversation_history})
         else:
             conversation_history = []
-            print("[global] Skipping cache and conversation history")
-
-        context_string = ""
-        if conversation_history:
-            context_string = "Previous conversation:\n" + "\n".join([
-                f"{turn['role'].capitalize()}: {turn['content']}"
-                for turn in conversation_history
-            ]) + "\n\n"
-            print(f"[{session_id}] Built context from history:\n{context_string}")
-        else:
-            print(f"[{session_id}] No previous history to build context")
-
-        full_prompt_for_agent = f"{context_string}User: {prompt}"
-        print(f"[{session_id}] Running agent with prompt:\n{full_prompt_for_agent}")
 
-        task = Task(
-            description=full_prompt_for_agent,
-            agent=self.agent,
-            expected_output="A concise and helpful answer relevant to the user's query, considering the conversation history."
-        )
-
-        crew = Crew(
-            agents=[self.agent],
-            tasks=[task],
-            verbose=True
-        )
-
-        resp = crew.kickoff()
-        print(f"[{session_id}] Agent response:\n{resp}")
+        resp = self.respond(prompt, conversation_history, session_id)
         resp_text = str(resp)
 
         if use_cache:
-            add_to_conversation_history(session_id, "user", prompt)
-            add_to_conversation_history(session_id, "assistant", resp_text)
-            set_cached(session_id, prompt, resp_text)
-            print(f"[{session_id}] ✅ Response cached and conversation updated")
-        else:
-            print(f"[{session_id}] ❌ Skipping cache and history store (global session)")
+            commit_turn(session_id, prompt, resp_text)
+            rolling_summary.schedule(session_id)
 
         return {"cached": False, "response": resp}
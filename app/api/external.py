@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.services.external_api import ExternalAPI
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from app.services.async_external_api import AsyncExternalAPI
 from app.models.common import ClientCreate, OrderCreate, APIResponse 
+from app.core.config import BULK_BATCH_SIZE
 
 router = APIRouter()
 
-def get_external_api_instance() -> ExternalAPI:
-    """Provides an ExternalAPI instance."""
-    return ExternalAPI()
+_NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+def get_external_api_instance() -> AsyncExternalAPI:
+    """Provides an AsyncExternalAPI instance."""
+    return AsyncExternalAPI()
 
 @router.post(
     "/client",
@@ -16,13 +20,13 @@ def get_external_api_instance() -> ExternalAPI:
 )
 async def create_client(
     data: ClientCreate, 
-    api: ExternalAPI = Depends(get_external_api_instance) 
+    api: AsyncExternalAPI = Depends(get_external_api_instance) 
 ):
     """
     Endpoint to create a new client.
     """
     try:
-        result = api.create_client(data)
+        result = await api.create_client(data)
         return APIResponse(message="Client created successfully.", data=result)
     except Exception as e:
         raise HTTPException(
@@ -38,13 +42,13 @@ async def create_client(
 )
 async def create_order(
     data: OrderCreate,
-    api: ExternalAPI = Depends(get_external_api_instance) 
+    api: AsyncExternalAPI = Depends(get_external_api_instance) 
 ):
     """
     Endpoint to create a new order.
     """
     try:
-        result = api.create_order(data)
+        result = await api.create_order(data)
         if "error" in result:
              raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, 
@@ -57,4 +61,102 @@ async def create_order(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating order: {e}"
+        )
+
+
+async def _read_batches(request: Request):
+    """
+    Yields lists of rows from the request body, BULK_BATCH_SIZE at a time.
+    NDJSON bodies are parsed line by line while they stream in; anything else must be a JSON array.
+    Lines that are not valid JSON are passed through as exceptions so they are reported per row.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in _NDJSON_TYPES:
+        batch, buffer = [], b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    batch.append(_parse_line(line))
+                if len(batch) >= BULK_BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if buffer.strip():
+            batch.append(_parse_line(buffer))
+        if batch:
+            yield batch
+        return
+
+    try:
+        rows = await request.json()
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON body: {e}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array or an NDJSON body.")
+    for i in range(0, len(rows), BULK_BATCH_SIZE):
+        yield rows[i:i + BULK_BATCH_SIZE]
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON line: {e}")
+
+
+async def _bulk_ingest(request: Request, write_batch) -> dict:
+    results = []
+    async for batch in _read_batches(request):
+        results.extend(await write_batch(batch, len(results)))
+    succeeded = sum(1 for r in results if r["status"] == "created")
+    return {"total": len(results), "succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+
+@router.post(
+    "/clients/bulk",
+    response_model=APIResponse,
+    summary="Create many clients",
+    description="Creates clients from a JSON array or a streamed NDJSON body (Content-Type: application/x-ndjson) of ClientCreate objects. Returns a result for every row."
+)
+async def bulk_create_clients(
+    request: Request,
+    api: AsyncExternalAPI = Depends(get_external_api_instance)
+):
+    """
+    Endpoint to create clients in bulk.
+    """
+    try:
+        data = await _bulk_ingest(request, api.bulk_create_clients)
+        return APIResponse(message=f"Processed {data['total']} client row(s).", data=data)
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating clients: {e}"
+        )
+
+@router.post(
+    "/orders/bulk",
+    response_model=APIResponse,
+    summary="Create many orders",
+    description="Creates orders from a JSON array or a streamed NDJSON body (Content-Type: application/x-ndjson) of OrderCreate objects. Returns a result for every row."
+)
+async def bulk_create_orders(
+    request: Request,
+    api: AsyncExternalAPI = Depends(get_external_api_instance)
+):
+    """
+    Endpoint to create orders in bulk.
+    """
+    try:
+        data = await _bulk_ingest(request, api.bulk_create_orders)
+        return APIResponse(message=f"Processed {data['total']} order row(s).", data=data)
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating orders: {e}"
         )
\ No newline at end of file
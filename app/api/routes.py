@@ -1,19 +1,235 @@
-from fastapi import APIRouter, Header, Depends, HTTPException, status
-from app.agents.support_agent import SupportAgent
-from app.agents.dashboard_agent import DashboardAgent
-from app.models.common import AgentAPIResponse, AgentResponseData # Import specific response model
+import asyncio
+import json
+import time
+from typing import Literal
+from fastapi import APIRouter, BackgroundTasks, Header, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.agents.pool import AgentPool
+from app.agents.executor import AgentExecutor, ExecutorSaturated
+from app.agents.intent_router import intent_router
+from app.agents.streaming import EventStream, format_sse
+from app.agents.model_tiers import tier_stats
+from app.agents.single_flight import single_flight, flight_key
+from app.agents.context_builder import support_context, rolling_summary
+from app.cache.redis_cache import load_session_async, commit_turn_async, redis_stats
+from app.core.database import mongo_stats
+from app.core.logs import logging_stats
+from app.core.query_trace import query_tracer
+from app.cache.similarity_cache import DATA_COLLECTIONS, similarity_cache
+from app.cache.tool_cache import get_data_versions_async, tool_cache_stats
+from app.services.run_context import run_context_stats
+from app.services.async_mongodb_tool import AsyncMongoDBTool
+from app.core.config import (
+    SSE_HEARTBEAT_INTERVAL, BATCH_MAX_PARALLELISM, BATCH_MAX_QUERIES, BATCH_SATURATED_WAIT, SIMILARITY_CACHE_ENABLED,
+)
+from app.models.common import APIResponse, AgentAPIResponse, AgentResponseData, BatchQueryRequest # Import specific response model
 
 router = APIRouter()
 
+# Agent runs whose SSE client went away; kept referenced until they finish on their worker.
+_detached_runs = set()
+
+
+def get_support_agent_pool(request: Request) -> AgentPool:
+    """Provides the pool of pre-built SupportAgent instances."""
+    return request.app.state.support_agent_pool
+
+
+def get_dashboard_agent_pool(request: Request) -> AgentPool:
+    """Provides the pool of pre-built DashboardAgent instances."""
+    return request.app.state.dashboard_agent_pool
+
+
+def get_agent_executor(request: Request) -> AgentExecutor:
+    """Provides the executor that runs agents off the event loop."""
+    return request.app.state.agent_executor
+
+
+def _saturated(e: ExecutorSaturated) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _stream_agent_run(run, ready_response=None, cached=False, on_final=None):
+    """
+    Yields the SSE frames for one agent query: `start` right away, then `step`, `tool_start`,
+    `tool_end` and `token` events while `run()` executes, a keep-alive comment whenever nothing
+    happened for SSE_HEARTBEAT_INTERVAL seconds, and finally `final` (or `error`) and `done`.
+    A `ready_response` (cache hit, intent answer) is sent as the final answer without running anything.
+    """
+    yield format_sse("start", {"cached": cached})
+    if ready_response is not None:
+        yield format_sse("final", {"response": ready_response, "cached": cached})
+        yield format_sse("done", {})
+        return
+
+    stream = EventStream()
+
+    async def runner():
+        with stream.bind():
+            return await run()
+
+    task = asyncio.create_task(runner())
+    task.add_done_callback(lambda _: stream.queue.put_nowait(None))
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(stream.queue.get(), SSE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            yield format_sse(*item)
+
+        try:
+            resp = str(task.result())
+        except ExecutorSaturated as e:
+            yield format_sse("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Error processing query: {e}"})
+        else:
+            yield format_sse("final", {"response": resp, "cached": False})
+            if on_final:
+                await on_final(resp)
+        yield format_sse("done", {})
+    finally:
+        if not task.done():
+            # Cancelling would hand the agent back to its pool while a worker still uses it.
+            _detached_runs.add(task)
+            task.add_done_callback(_detached_runs.discard)
+
 
-def get_support_agent_instance() -> SupportAgent:
-    """Provides a SupportAgent instance."""
-    return SupportAgent()
+def runtime_snapshot(app) -> dict:
+    """The numbers behind /stats; also exported on /metrics."""
+    return {
+        "agent_pools": {
+            "support": app.state.support_agent_pool.stats(),
+            "dashboard": app.state.dashboard_agent_pool.stats(),
+        },
+        "executor": app.state.agent_executor.stats(),
+        "redis": redis_stats(),
+        "mongo": mongo_stats(),
+        "similarity_cache": similarity_cache.stats(),
+        "tool_cache": tool_cache_stats(),
+        "run_memo": run_context_stats(),
+        "intent_router": intent_router.stats(),
+        "model_tiers": tier_stats.snapshot(),
+        "single_flight": single_flight.stats(),
+        "context": {"support": support_context.stats(), "summaries": rolling_summary.stats()},
+        "logging": logging_stats(),
+        "query_trace": query_tracer.stats(),
+    }
 
 
-def get_dashboard_agent_instance() -> DashboardAgent:
-    """Provides a DashboardAgent instance."""
-    return DashboardAgent()
+@router.get(
+    "/stats",
+    summary="Runtime statistics",
+    description="Reports usage statistics for the agent pools, the agent executor, Redis, the response and tool caches and per-run lookup memoization."
+)
+async def runtime_stats(request: Request):
+    """
+    Returns pool statistics for each agent type and executor queue metrics.
+    """
+    return runtime_snapshot(request.app)
+
+
+@router.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description="Latency histograms per route, cache and history operation, LLM call (per model, with token counters), MongoDB tool method and agent queue wait, plus the /stats numbers as gauges, in the Prometheus text format."
+)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get(
+    "/admin/slow-queries",
+    summary="Slowest MongoDB query shapes",
+    description="Lists the slowest query shapes (command, collection and filter/pipeline with values replaced by \"?\") seen by this worker, with call counts, avg/max/total time, the calling tool methods, the last slow call (duration and request ID) and the explain() winning plan (COLLSCAN vs IXSCAN)."
+)
+async def slow_queries(
+    limit: int = Query(20, ge=1, le=500, description="How many shapes to return."),
+    sort: Literal["max", "avg", "total"] = Query("max", description="Rank by max, average or total time."),
+):
+    return {"slow_ms": query_tracer.slow_ms, "shapes": query_tracer.top(limit, sort)}
+
+
+@router.delete(
+    "/admin/slow-queries",
+    summary="Reset slow query statistics",
+    description="Clears the per-shape query timings and plans collected by this worker."
+)
+async def reset_slow_queries():
+    query_tracer.reset()
+    return {"message": "Slow query statistics cleared."}
+
+
+async def _commit_support_turn(session_id: str, q: str, resp: str):
+    """Stores a finished support turn, then folds older turns into the session summary in the background."""
+    await commit_turn_async(session_id, q, resp)
+    rolling_summary.schedule(session_id)
+
+
+async def _answer_support(q: str, session_id: str, pool: AgentPool, executor: AgentExecutor):
+    """
+    Answers one support prompt: session cache first, then the intent fast path, then a
+    coalesced agent run. Returns (response, cached); non-cached turns still need committing.
+    """
+    conversation_history = []
+    if session_id != "global":
+        cached_response, conversation_history = await load_session_async(session_id, q, limit=support_context.history_limit)
+        if cached_response:
+            return cached_response, True
+
+    matched = intent_router.match(q)
+    if matched:
+        answer = await intent_router.answer_async(matched)
+        if answer is not None:
+            return answer, False
+
+    resp = await single_flight.do(
+        flight_key("support", q, session_id, conversation_history),
+        lambda: executor.submit(pool, lambda agent: agent.respond(q, conversation_history, session_id, use_intent_router=False))
+    )
+    return resp, False
+
+
+async def _similar_dashboard_answer(q: str):
+    """
+    Looks the prompt up in the near-duplicate cache on the event loop, so a hit never waits for
+    an agent or counts toward executor saturation. None on a miss or for write prompts.
+    """
+    if not SIMILARITY_CACHE_ENABLED or not similarity_cache.is_cacheable(q):
+        return None
+    return similarity_cache.get("dashboard", q, await get_data_versions_async(DATA_COLLECTIONS))
+
+
+async def _answer_dashboard(q: str, pool: AgentPool, executor: AgentExecutor):
+    """
+    Answers one dashboard prompt: near-duplicate cache first, then a coalesced agent run.
+    Returns (response, cached).
+    """
+    cached_response = await _similar_dashboard_answer(q)
+    if cached_response is not None:
+        return cached_response, True
+    resp = await single_flight.do(
+        flight_key("dashboard", q), lambda: executor.submit(pool, lambda agent: agent.run(q, lookup_cache=False))
+    )
+    return resp, False
+
 
 @router.get(
     "/support/query",
@@ -23,19 +239,29 @@ def get_dashboard_agent_instance() -> DashboardAgent:
 )
 async def support_query(
     q: str,
+    background_tasks: BackgroundTasks,
     session_id: str = Header("global", description="Optional: Session ID for memory/caching. Defaults to 'global'."),
-    support_agent: SupportAgent = Depends(get_support_agent_instance)
+    pool: AgentPool = Depends(get_support_agent_pool),
+    executor: AgentExecutor = Depends(get_agent_executor)
 ):
     """
     Handles natural language queries for the Support Agent.
+    Cache and history are read in one pipelined round trip before the crew run, and the
+    finished turn is committed in one script call after the response has been sent.
+    Prompts matching a known intent are answered without waiting for an agent.
     """
     try:
-        result = support_agent.run(q, session_id)
+        resp, cached = await _answer_support(q, session_id, pool, executor)
+        if session_id != "global" and not cached:
+            background_tasks.add_task(_commit_support_turn, session_id, q, str(resp))
+
         return AgentAPIResponse(
             message="Query processed successfully by Support Agent.",
-            data=AgentResponseData(agent_response=result["response"]),
-            cached=result["cached"]
+            data=AgentResponseData(agent_response=resp),
+            cached=cached
         )
+    except ExecutorSaturated as e:
+        raise _saturated(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -50,21 +276,235 @@ async def support_query(
 )
 async def dashboard_query(
     q: str,
-    dashboard_agent: DashboardAgent = Depends(get_dashboard_agent_instance) 
+    pool: AgentPool = Depends(get_dashboard_agent_pool),
+    executor: AgentExecutor = Depends(get_agent_executor)
 ):
     """
     Handles natural language queries for the Dashboard Agent.
     """
     try:
-        result = dashboard_agent.run(q)
+        result, cached = await _answer_dashboard(q, pool, executor)
         
         return AgentAPIResponse(
             message="Query processed successfully by Dashboard Agent.",
             data=AgentResponseData(agent_response=result),
-            cached=False
+            cached=cached
         )
+    except ExecutorSaturated as e:
+        raise _saturated(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing dashboard query: {e}"
+        )
+
+async def _run_batch(batch: BatchQueryRequest, key_of, answer, session_of=lambda item: None):
+    """
+    Runs a batch of queries, at most `parallelism` at a time, through the same agent pools,
+    executor and caches as single queries. Queries with the same session (session_of) run one
+    after another in request order, so each sees the turns before it; other duplicates (same
+    flight key) run once. Yields one NDJSON line per query as soon as its answer is ready,
+    then a summary line.
+    """
+    started = time.perf_counter()
+    queries = batch.queries
+    parallelism = min(batch.parallelism or BATCH_MAX_PARALLELISM, BATCH_MAX_PARALLELISM)
+    # A lane is a list of runs done in order; a run answers the queries at its indexes once.
+    lanes = {}
+    for index, item in enumerate(queries):
+        session = session_of(item)
+        if session is None:
+            lanes.setdefault(("flight", key_of(item)), [[]])[0].append(index)
+        else:
+            lanes.setdefault(("session", session), []).append([index])
+    runs = sum(len(lane) for lane in lanes.values())
+    semaphore = asyncio.Semaphore(parallelism)
+    results = asyncio.Queue()
+
+    async def run_one(item):
+        deadline = time.monotonic() + BATCH_SATURATED_WAIT
+        while True:
+            async with semaphore:
+                try:
+                    resp, cached = await answer(item)
+                    return {"status": "ok", "response": str(resp), "cached": cached}
+                except ExecutorSaturated as e:
+                    retry_after = e.retry_after
+                except Exception as e:
+                    return {"status": "error", "error": str(e)}
+            # Other traffic filled the executor; wait for room (without holding a slot), but not forever.
+            if time.monotonic() + retry_after > deadline:
+                return {"status": "error", "error": f"Agent executor saturated for more than {BATCH_SATURATED_WAIT:g}s."}
+            await asyncio.sleep(retry_after)
+
+    async def run_lane(lane):
+        for indexes in lane:
+            await results.put((indexes, await run_one(queries[indexes[0]])))
+
+    tasks = [asyncio.create_task(run_lane(lane)) for lane in lanes.values()]
+    succeeded = 0
+    try:
+        for _ in range(runs):
+            indexes, result = await results.get()
+            for index in indexes:
+                line = {"index": index, "q": queries[index].q, "session_id": queries[index].session_id, **result}
+                if index != indexes[0]:
+                    line["duplicate_of"] = indexes[0]
+                yield json.dumps(line, default=str) + "\n"
+            if result["status"] == "ok":
+                succeeded += len(indexes)
+        yield json.dumps({
+            "done": True, "total": len(queries), "unique": runs, "parallelism": parallelism,
+            "succeeded": succeeded, "failed": len(queries) - succeeded,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _check_batch(batch: BatchQueryRequest):
+    if not batch.queries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No queries given.")
+    if len(batch.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch may contain at most {BATCH_MAX_QUERIES} queries."
+        )
+
+
+@router.post(
+    "/support/batch",
+    summary="Run many Support Agent queries",
+    description="Runs a list of support queries (each with an optional session_id) concurrently, at most `parallelism` at a time, and streams one NDJSON line per query as it finishes, followed by a summary line. Queries of the same session run one after another in request order; duplicate queries without a session run once."
+)
+async def support_batch(
+    batch: BatchQueryRequest,
+    pool: AgentPool = Depends(get_support_agent_pool),
+    executor: AgentExecutor = Depends(get_agent_executor)
+):
+    """
+    Handles a batch of support queries.
+    """
+    _check_batch(batch)
+
+    async def answer(item):
+        resp, cached = await _answer_support(item.q, item.session_id, pool, executor)
+        if item.session_id != "global" and not cached:
+            await _commit_support_turn(item.session_id, item.q, str(resp))
+        return resp, cached
+
+    return StreamingResponse(
+        # Answers depend on the session's history, so a session's queries run in order; only
+        # "global" (history-less) queries are coalesced.
+        _run_batch(
+            batch, lambda item: flight_key("support", item.q, item.session_id), answer,
+            session_of=lambda item: None if item.session_id == "global" else item.session_id
+        ),
+        media_type="application/x-ndjson"
+    )
+
+@router.post(
+    "/dashboard/batch",
+    summary="Run many Dashboard Agent queries",
+    description="Runs a list of dashboard queries concurrently, at most `parallelism` at a time, and streams one NDJSON line per query as it finishes, followed by a summary line. Duplicate queries run once."
+)
+async def dashboard_batch(
+    batch: BatchQueryRequest,
+    pool: AgentPool = Depends(get_dashboard_agent_pool),
+    executor: AgentExecutor = Depends(get_agent_executor)
+):
+    """
+    Handles a batch of dashboard queries.
+    """
+    _check_batch(batch)
+
+    async def answer(item):
+        return await _answer_dashboard(item.q, pool, executor)
+
+    return StreamingResponse(
+        _run_batch(batch, lambda item: flight_key("dashboard", item.q), answer),
+        media_type="application/x-ndjson"
+    )
+
+@router.get(
+    "/support/query/stream",
+    summary="Stream a Support Agent query",
+    description="Like /support/query, but responds with Server-Sent Events: start, step, tool_start, tool_end, token (final-answer text as it is generated), final and done. Cache hits and directly answered intents stream their final answer immediately."
+)
+async def support_query_stream(
+    q: str,
+    background_tasks: BackgroundTasks,
+    session_id: str = Header("global", description="Optional: Session ID for memory/caching. Defaults to 'global'."),
+    pool: AgentPool = Depends(get_support_agent_pool),
+    executor: AgentExecutor = Depends(get_agent_executor)
+):
+    """
+    Streams the Support Agent's progress for a natural language query.
+    """
+    use_cache = session_id != "global"
+    conversation_history = []
+    if use_cache:
+        cached_response, conversation_history = await load_session_async(session_id, q, limit=support_context.history_limit)
+        if cached_response:
+            return _sse_response(_stream_agent_run(None, ready_response=cached_response, cached=True))
+
+    matched = intent_router.match(q)
+    if matched:
+        answer = await intent_router.answer_async(matched)
+        if answer is not None:
+            if use_cache:
+                # Committed once the answer has been streamed, as support_query does.
+                background_tasks.add_task(_commit_support_turn, session_id, q, answer)
+            return _sse_response(_stream_agent_run(None, ready_response=answer))
+
+    if executor.is_saturated():
+        raise _saturated(ExecutorSaturated(executor.retry_after))
+
+    async def commit(resp: str):
+        if use_cache:
+            await _commit_support_turn(session_id, q, resp)
+
+    return _sse_response(_stream_agent_run(
+        lambda: executor.submit(pool, lambda agent: agent.respond(q, conversation_history, session_id, use_intent_router=False)),
+        on_final=commit
+    ))
+
+@router.get(
+    "/dashboard/query/stream",
+    summary="Stream a Dashboard Agent query",
+    description="Like /dashboard/query, but responds with Server-Sent Events: start, step, tool_start, tool_end, token (final-answer text as it is generated), final and done. Cache hits stream their final answer immediately."
+)
+async def dashboard_query_stream(
+    q: str,
+    pool: AgentPool = Depends(get_dashboard_agent_pool),
+    executor: AgentExecutor = Depends(get_agent_executor)
+):
+    """
+    Streams the Dashboard Agent's progress for a natural language query.
+    """
+    cached_response = await _similar_dashboard_answer(q)
+    if cached_response is not None:
+        return _sse_response(_stream_agent_run(None, ready_response=cached_response, cached=True))
+    if executor.is_saturated():
+        raise _saturated(ExecutorSaturated(executor.retry_after))
+    return _sse_response(_stream_agent_run(lambda: executor.submit(pool, lambda agent: agent.run(q, lookup_cache=False))))
+
+@router.get(
+    "/dashboard/snapshot",
+    response_model=APIResponse,
+    summary="Dashboard metrics snapshot",
+    description="Returns all dashboard metrics (client counts, revenue, outstanding payments, enrollment trends, top services, completion rates) as structured JSON, computed directly from the database without the LLM."
+)
+async def dashboard_snapshot():
+    """
+    Computes the dashboard snapshot with one aggregation per collection.
+    """
+    try:
+        snapshot = await AsyncMongoDBTool().get_dashboard_snapshot()
+        return APIResponse(message="Dashboard snapshot computed successfully.", data=snapshot)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error computing dashboard snapshot: {e}"
         )
\ No newline at end of file
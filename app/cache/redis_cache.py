@@ -1,58 +1,134 @@
 import redis
+import redis.asyncio as aioredis
+import asyncio
 import json
 import hashlib
 import logging 
-from app.core.config import REDIS_URL
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+from redis.asyncio.retry import Retry as AsyncRetry
+from app.core.config import REDIS_URL, REDIS_MAX_CONNECTIONS, REDIS_HEALTH_CHECK_INTERVAL
+from app.core.metrics import CACHE_LATENCY, HISTORY_LATENCY, timed_call
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
+# Connections are validated by redis-py itself: idle ones are re-checked after
+# REDIS_HEALTH_CHECK_INTERVAL seconds and broken ones are retried with backoff,
+# so individual operations never pay for an extra PING round trip. The retry
+# settings go on the pool (its connections use them); Redis() ignores them
+# when it is handed an existing connection_pool.
+_RETRY_ON = [redis.exceptions.ConnectionError, redis.exceptions.TimeoutError]
+
+r = None
+_async_client = None
+_health_task = None
+_healthy = True
+_reconnect_callbacks = []
 
-try:
-    r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
-    r.ping()
-    logging.info("Successfully connected to Redis at startup.")
-except redis.exceptions.ConnectionError as e:
-    logging.error(f"Initial Redis connection failed: {e}. Please check REDIS_URL and server status.")
-    r = None 
-except Exception as e:
-    logging.error(f"An unexpected error occurred during Redis client initialization: {e}")
-    r = None
 
 def _get_redis_client():
     """
-    Ensures a valid and connected Redis client instance is returned.
-    Attempts to reconnect if the global client is None or the connection is stale.
+    Returns the process-wide synchronous Redis client, creating its connection pool on first use.
+    Used by code that already runs off the event loop (agent executor threads, scripts).
     """
     global r
     if r is None:
-        logging.warning("Redis client is not initialized. Attempting to reconnect...")
+        pool = redis.ConnectionPool.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            retry=Retry(ExponentialBackoff(), 3),
+            retry_on_error=_RETRY_ON,
+        )
+        r = redis.Redis(connection_pool=pool)
+    return r
+
+
+def _get_async_redis_client():
+    """Returns the process-wide asyncio Redis client, creating its connection pool on first use."""
+    global _async_client
+    if _async_client is None:
+        pool = aioredis.ConnectionPool.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            retry=AsyncRetry(ExponentialBackoff(), 3),
+            retry_on_error=_RETRY_ON,
+        )
+        _async_client = aioredis.Redis(connection_pool=pool)
+    return _async_client
+
+
+async def _health_check_loop():
+    """Pings Redis in the background and records whether it is reachable."""
+    global _healthy
+    client = _get_async_redis_client()
+    while True:
         try:
-            r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
-            r.ping()
-            logging.info("Successfully reconnected to Redis.")
-        except redis.exceptions.ConnectionError as e:
-            logging.error(f"Redis reconnection failed: {e}. Further operations will fail.")
-            r = None 
-            raise 
+            await client.ping()
+            recovered = not _healthy
+            _healthy = True
+            if recovered:
+                logger.info("Redis connection restored.")
+                await _run_reconnect_callbacks()
         except Exception as e:
-            logging.error(f"An unexpected error occurred during Redis reconnection: {e}")
-            r = None
-            raise
+            if _healthy:
+                logger.error(f"Redis health check failed: {e}. Cache operations are skipped until it recovers.")
+            _healthy = False
+        await asyncio.sleep(REDIS_HEALTH_CHECK_INTERVAL)
+
+
+def on_reconnect(callback):
+    """Registers an async callback the health check awaits each time Redis becomes reachable again."""
+    _reconnect_callbacks.append(callback)
+
+
+async def _run_reconnect_callbacks():
+    for callback in _reconnect_callbacks:
+        try:
+            await callback()
+        except Exception as e:
+            logger.error(f"Redis reconnect callback {callback.__qualname__} failed: {e}", exc_info=True)
+
+
+async def init_async_redis():
+    """Creates the asyncio connection pool and starts the background health check."""
+    global _health_task
+    _get_async_redis_client()
+    _health_task = asyncio.create_task(_health_check_loop())
+
+
+async def close_async_redis():
+    """Stops the health check and closes the asyncio connection pool."""
+    global _async_client, _health_task, _commit_turn_script_async
+    _commit_turn_script_async = None
+    if _health_task is not None:
+        _health_task.cancel()
+        _health_task = None
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _mark_unhealthy(e: Exception):
+    """Records a connection failure seen by an operation; the health check clears it."""
+    global _healthy
+    if _health_task is not None:
+        _healthy = False
+    logger.error(f"Redis connection error: {e}")
+
+
+def redis_available() -> bool:
+    """False while the background health check sees Redis as down."""
+    return _healthy
 
-    
-    try:
-        r.ping()
-    except redis.exceptions.ConnectionError as e:
-        logging.error(f"Redis connection lost during ping check: {e}. Attempting to re-establish.")
-        r = None 
-        return _get_redis_client()
-    except Exception as e:
-        logging.error(f"An unexpected error occurred during Redis ping check: {e}")
-        r = None
-        raise 
-        
-    return r
+
+def redis_stats():
+    """Returns connection state for the runtime stats endpoint."""
+    return {"healthy": _healthy, "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL, "max_connections": REDIS_MAX_CONNECTIONS}
 
 
 def _cache_key(session_id: str, prompt: str):
@@ -60,84 +136,143 @@ def _cache_key(session_id: str, prompt: str):
     h = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
     return f"cache:{session_id}:{h}" 
 
-def get_cached(session_id: str, prompt: str):
+def _decode_cached(data):
+    if data:
+        try:
+            return json.loads(data)
+        except json.JSONDecodeError:
+            return data 
+    return None
+
+def _encode_cached(response):
+    return json.dumps(response) if isinstance(response, (dict, list)) else str(response)
+
+def _history_key(session_id: str):
+    """Generates a key for conversational history."""
+    return f"history:{session_id}"
+
+def _summary_key(session_id: str):
+    """Key of the rolling summary of the history turns that were folded out of the list."""
+    return f"summary:{session_id}"
+
+def _decode_history(raw_history):
+    history = []
+    for item in raw_history:
+        try:
+            history.append(json.loads(item))
+        except json.JSONDecodeError:
+            logger.warning(f"Warning: Could not decode history item (not valid JSON): '{item}'. Skipping.")
+            pass 
+    return history
+
+# Appends both sides of a turn, trims and refreshes the history list, and stores the
+# response cache entry atomically in one round trip.
+_COMMIT_TURN_LUA = """
+redis.call('RPUSH', KEYS[1], ARGV[1], ARGV[2])
+redis.call('LTRIM', KEYS[1], -tonumber(ARGV[3]), -1)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+redis.call('SETEX', KEYS[2], ARGV[5], ARGV[6])
+return 1
+"""
+_commit_turn_script = None
+_commit_turn_script_async = None
+
+
+def _commit_turn_args(session_id: str, prompt: str, response: str, max_length: int, history_ttl: int, cache_ttl: int):
+    # The rolling summary lives as long as the history it summarizes.
+    keys = [_history_key(session_id), _cache_key(session_id, prompt), _summary_key(session_id)]
+    args = [
+        json.dumps({"role": "user", "content": prompt}),
+        json.dumps({"role": "assistant", "content": response}),
+        max_length, history_ttl, cache_ttl, _encode_cached(response),
+    ]
+    return keys, args
+
+
+def _session_history(raw_history, summary):
+    history = _decode_history(raw_history)
+    return ([{"role": "summary", "content": summary}] if summary else []) + history
+
+
+@timed_call(HISTORY_LATENCY, "history", "load_session")
+def load_session(session_id: str, prompt: str, limit: int = 5):
     """
-    Retrieves cached response for a given session ID and exact prompt.
+    Fetches the cached response for the prompt, the last 'limit' history turns and the rolling
+    summary of older turns in one pipelined round trip. Returns a (cached_response, history) tuple;
+    the summary, if any, comes first in the history as a {"role": "summary"} entry.
     """
     try:
         client = _get_redis_client()
-        data = client.get(_cache_key(session_id, prompt))
-        if data:
-           
-            try:
-                return json.loads(data)
-            except json.JSONDecodeError:
-                return data 
-        return None
+        pipe = client.pipeline(transaction=False)
+        pipe.get(_cache_key(session_id, prompt))
+        pipe.lrange(_history_key(session_id), -limit, -1)
+        pipe.get(_summary_key(session_id))
+        cached, raw_history, summary = pipe.execute()
+        return _decode_cached(cached), _session_history(raw_history, summary)
     except redis.exceptions.ConnectionError as e:
-        logging.error(f"Redis connection error in get_cached: {e}")
-        return None
+        logger.error(f"Redis connection error in load_session: {e}")
+        return None, []
     except Exception as e:
-        logging.error(f"Error getting from exact prompt cache: {e}", exc_info=True) 
-        return None
+        logger.error(f"Error loading session: {e}", exc_info=True)
+        return None, []
 
-def set_cached(session_id: str, prompt: str, response: str, ttl: int = 300):
+@timed_call(HISTORY_LATENCY, "history", "commit_turn")
+def commit_turn(session_id: str, prompt: str, response: str, max_length: int = 10, history_ttl: int = 3600, cache_ttl: int = 300):
     """
-    Caches a response for a given session ID and exact prompt with a Time-To-Live (TTL).
+    Records a completed turn: appends the user and assistant messages to the history
+    and caches the response, all in a single atomic script call.
     """
+    global _commit_turn_script
     try:
         client = _get_redis_client()
-       
-        value_to_store = json.dumps(response) if isinstance(response, (dict, list)) else str(response)
-        client.setex(_cache_key(session_id, prompt), ttl, value_to_store)
+        if _commit_turn_script is None:
+            _commit_turn_script = client.register_script(_COMMIT_TURN_LUA)
+        keys, args = _commit_turn_args(session_id, prompt, response, max_length, history_ttl, cache_ttl)
+        _commit_turn_script(keys=keys, args=args)
     except redis.exceptions.ConnectionError as e:
-        logging.error(f"Redis connection error in set_cached: {e}")
+        logger.error(f"Redis connection error in commit_turn: {e}")
     except Exception as e:
-        logging.error(f"Error setting exact prompt cache: {e}", exc_info=True)
+        logger.error(f"Error committing conversation turn: {e}", exc_info=True)
 
-def _history_key(session_id: str):
-    """Generates a key for conversational history."""
-    return f"history:{session_id}"
 
-def get_conversation_history(session_id: str, limit: int = 5):
+@timed_call(HISTORY_LATENCY, "history", "load_session")
+async def load_session_async(session_id: str, prompt: str, limit: int = 5):
     """
-    Retrieves the last 'limit' turns of conversation history for a given session ID.
-    Returns a list of dictionaries like [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}]
+    Async version of load_session for use from the event loop.
     """
+    if not _healthy:
+        return None, []
     try:
-        client = _get_redis_client()
-        raw_history = client.lrange(_history_key(session_id), -limit, -1) 
-        history = []
-        for item in raw_history:
-            try:
-                history.append(json.loads(item))
-            except json.JSONDecodeError:
-                logging.warning(f"Warning: Could not decode history item (not valid JSON): '{item}'. Skipping.")
-                pass 
-        return history
+        client = _get_async_redis_client()
+        pipe = client.pipeline(transaction=False)
+        pipe.get(_cache_key(session_id, prompt))
+        pipe.lrange(_history_key(session_id), -limit, -1)
+        pipe.get(_summary_key(session_id))
+        cached, raw_history, summary = await pipe.execute()
+        return _decode_cached(cached), _session_history(raw_history, summary)
     except redis.exceptions.ConnectionError as e:
-        logging.error(f"Redis connection error in get_conversation_history: {e}")
-        return []
+        _mark_unhealthy(e)
+        return None, []
     except Exception as e:
-        logging.error(f"Error getting conversation history: {e}", exc_info=True)
-        return []
+        logger.error(f"Error loading session: {e}", exc_info=True)
+        return None, []
 
-def add_to_conversation_history(session_id: str, role: str, content: str, max_length: int = 10, ttl: int = 3600):
+@timed_call(HISTORY_LATENCY, "history", "commit_turn")
+async def commit_turn_async(session_id: str, prompt: str, response: str, max_length: int = 10, history_ttl: int = 3600, cache_ttl: int = 300):
     """
-    Adds a new turn to the conversation history for a given session ID.
-    Keeps the history limited to max_length turns and sets a TTL for the entire list.
+    Async version of commit_turn. Meant to be scheduled as a background task once the response is sent.
     """
+    global _commit_turn_script_async
+    if not _healthy:
+        return
     try:
-        client = _get_redis_client()
-        turn = {"role": role, "content": content}
-        client.rpush(_history_key(session_id), json.dumps(turn))
-        
-
-        client.ltrim(_history_key(session_id), -max_length, -1) 
-        
-        client.expire(_history_key(session_id), ttl)
-
+        client = _get_async_redis_client()
+        if _commit_turn_script_async is None:
+            _commit_turn_script_async = client.register_script(_COMMIT_TURN_LUA)
+        keys, args = _commit_turn_args(session_id, prompt, response, max_length, history_ttl, cache_ttl)
+        await _commit_turn_script_async(keys=keys, args=args)
     except redis.exceptions.ConnectionError as e:
-        logging.error(f"Redis connection error in add_to_conversation_history: {e}")
+        _mark_unhealthy(e)
     except Exception as e:
-        logging.error(f"Error adding to conversation history: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"Error committing conversation turn: {e}", exc_info=True)
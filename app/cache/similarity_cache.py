@@ -0,0 +1,220 @@
+import re
+import time
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional
+
+from app.core.config import (
+    SIMILARITY_CACHE_ENABLED, SIMILARITY_CACHE_THRESHOLD,
+    SIMILARITY_CACHE_TTL, SIMILARITY_CACHE_MAX_ENTRIES,
+)
+from app.core.metrics import CACHE_LATENCY, timed_call
+
+
+# Filler words that do not change what a prompt asks for.
+_STOPWORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "me", "my", "please", "pls", "can", "could",
+    "would", "you", "i", "want", "need", "get", "show", "give", "tell", "fetch", "find", "what",
+    "whats", "is", "are", "was", "about", "all", "some", "us", "let", "know", "do", "does",
+}
+# Prompts that create or change data must always reach the agent.
+_WRITE_PATTERN = re.compile(r"\b(create|register|add|enrol|enroll|book|sign\s*up|new\s+(client|order))\b", re.IGNORECASE)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9@._+-]+")
+_RAW_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9@._+-]+")
+# Words usually followed by a name: "client priya sharma", "instructor anil", "dues for rahul".
+_ENTITY_CUES = {
+    "client", "customer", "member", "student", "instructor", "teacher", "trainer", "named", "called",
+    "for", "by", "of", "with", "from",
+}
+_NAME_WORDS_AFTER_CUE = 2
+
+# Collections the agents answer from. Callers pass their data versions (tool_cache.get_data_versions)
+# with every lookup and store, so any write (bump_data_version) retires the answers cached before it.
+DATA_COLLECTIONS = ("clients", "orders", "payments", "classes", "attendance", "courses")
+
+_SHINGLE_SIZE = 3
+_NUM_PERM = 64
+_BANDS = 16
+_ROWS = _NUM_PERM // _BANDS
+_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [((i * 0x9E3779B97F4A7C15 + 1) % _PRIME, (i * 0xC2B2AE3D27D4EB4F + 7) % _PRIME) for i in range(1, _NUM_PERM + 1)]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Reduces a prompt to a canonical form: case-folded, punctuation and filler words
+    removed, remaining tokens sorted so word order does not matter.
+    """
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    tokens = [t.strip("._-") for t in _TOKEN_PATTERN.findall(text)]
+    return " ".join(sorted(t for t in tokens if t and t not in _STOPWORDS))
+
+
+def _shingles(normalized: str) -> frozenset:
+    padded = f" {normalized} "
+    if len(padded) <= _SHINGLE_SIZE:
+        return frozenset([padded])
+    return frozenset(padded[i:i + _SHINGLE_SIZE] for i in range(len(padded) - _SHINGLE_SIZE + 1))
+
+
+def _minhash(shingles: frozenset) -> tuple:
+    hashed = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return tuple(min((a * h + b) % _PRIME for h in hashed) for a, b in _PERMUTATIONS)
+
+
+def _bands(signature: tuple):
+    return [(i, signature[i * _ROWS:(i + 1) * _ROWS]) for i in range(_BANDS)]
+
+
+def _entities(prompt: str) -> frozenset:
+    """
+    Tokens that identify a record and must match exactly for a near-duplicate to count: numbers
+    (order IDs, phones, amounts), emails, capitalized words after the first, and the words that
+    follow a cue like "client" or "for", since users often type names in lower case.
+    "pending dues for Priya Sharma" is not "pending dues for Priya Sharda".
+    """
+    tokens = [t.strip("._-") for t in _RAW_TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", prompt))]
+    tokens = [t for t in tokens if t]
+    entities = set()
+    after_cue = 0
+    for i, token in enumerate(tokens):
+        lower = token.lower()
+        if any(c.isdigit() for c in token) or "@" in token or (i > 0 and token[0].isupper()):
+            entities.add(lower)
+        elif after_cue and lower not in _STOPWORDS:
+            entities.add(lower)
+        after_cue = _NAME_WORDS_AFTER_CUE if lower in _ENTITY_CUES else max(after_cue - 1, 0)
+    return frozenset(entities)
+
+
+class _Entry:
+    __slots__ = ("response", "version", "shingles", "entities", "signature", "expires_at")
+
+    def __init__(self, response, version, shingles, entities, signature, expires_at):
+        self.response = response
+        self.version = version
+        self.shingles = shingles
+        self.entities = entities
+        self.signature = signature
+        self.expires_at = expires_at
+
+
+class _Namespace:
+    def __init__(self):
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.buckets: Dict[tuple, set] = defaultdict(set)
+        self.counters = {"exact_hits": 0, "near_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for band in _bands(entry.signature):
+            bucket = self.buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band]
+
+
+class SimilarityCache:
+    """
+    In-process response cache that also matches near-duplicate prompts.
+    Prompts are normalized, then compared by character n-gram Jaccard similarity using
+    a MinHash/LSH index so lookups only verify a handful of candidates. A near match also
+    needs the same entity tokens (names, emails, IDs), since the cache is shared by all
+    sessions. Entries are only served for the data version they were computed at. Each
+    agent gets its own namespace.
+    """
+
+    def __init__(self, threshold: float, ttl: int, max_entries: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._namespaces: Dict[str, _Namespace] = defaultdict(_Namespace)
+
+    @timed_call(CACHE_LATENCY, "cache", "similarity", "get")
+    def get(self, namespace: str, prompt: str, version: str = "") -> Optional[Any]:
+        """Returns the response cached at `version` for the prompt or a near-duplicate of it, or None."""
+        key = normalize_prompt(prompt)
+        shingles = _shingles(key)
+        entities = _entities(prompt)
+        now = time.monotonic()
+        with self._lock:
+            ns = self._namespaces[namespace]
+            entry = ns.entries.get(key)
+            if entry is not None and entry.expires_at > now and entry.version == version:
+                ns.entries.move_to_end(key)
+                ns.counters["exact_hits"] += 1
+                return entry.response
+
+            signature = _minhash(shingles)
+            candidates = set()
+            for band in _bands(signature):
+                candidates |= ns.buckets.get(band, set())
+
+            best_key, best_score = None, 0.0
+            for candidate in candidates:
+                entry = ns.entries[candidate]
+                if entry.expires_at <= now or entry.version != version:
+                    ns.remove(candidate)
+                    continue
+                if entry.entities != entities:
+                    continue
+                score = len(shingles & entry.shingles) / len(shingles | entry.shingles)
+                if score > best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is not None and best_score >= self.threshold:
+                ns.entries.move_to_end(best_key)
+                ns.counters["near_hits"] += 1
+                return ns.entries[best_key].response
+
+            ns.counters["misses"] += 1
+            return None
+
+    @timed_call(CACHE_LATENCY, "cache", "similarity", "set")
+    def set(self, namespace: str, prompt: str, response: Any, version: str = ""):
+        """
+        Stores a response unless the prompt asks for a write. `version` is the data version read
+        before the answer was computed, so a write made during the run leaves the entry stale.
+        """
+        if not self.is_cacheable(prompt):
+            return
+        key = normalize_prompt(prompt)
+        shingles = _shingles(key)
+        entry = _Entry(response, version, shingles, _entities(prompt), _minhash(shingles), time.monotonic() + self.ttl)
+        with self._lock:
+            ns = self._namespaces[namespace]
+            ns.remove(key)
+            ns.entries[key] = entry
+            for band in _bands(entry.signature):
+                ns.buckets[band].add(key)
+            ns.counters["stores"] += 1
+            while len(ns.entries) > self.max_entries:
+                oldest = next(iter(ns.entries))
+                ns.remove(oldest)
+                ns.counters["evictions"] += 1
+
+    def is_cacheable(self, prompt: str) -> bool:
+        """Write requests (create client, create order, ...) are never answered from cache."""
+        return not _WRITE_PATTERN.search(prompt)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {}
+            for name, ns in self._namespaces.items():
+                lookups = ns.counters["exact_hits"] + ns.counters["near_hits"] + ns.counters["misses"]
+                hits = ns.counters["exact_hits"] + ns.counters["near_hits"]
+                namespaces[name] = {
+                    **ns.counters,
+                    "entries": len(ns.entries),
+                    "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+                }
+        return {"enabled": SIMILARITY_CACHE_ENABLED, "threshold": self.threshold, "namespaces": namespaces}
+
+
+similarity_cache = SimilarityCache(SIMILARITY_CACHE_THRESHOLD, SIMILARITY_CACHE_TTL, SIMILARITY_CACHE_MAX_ENTRIES)
@@ -0,0 +1,300 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.cache.redis_cache import _get_redis_client, _get_async_redis_client, on_reconnect, redis_available
+from app.core.config import TOOL_CACHE_ENABLED, TOOL_CACHE_TTL
+from app.core.metrics import CACHE_LATENCY, timed
+
+
+logger = logging.getLogger(__name__)
+
+_LOCAL_MAX_ENTRIES = 512
+
+_lock = threading.Lock()
+_local_versions: Dict[str, int] = {}
+_local_results: "OrderedDict[str, tuple]" = OrderedDict()
+# Collections whose Redis version bump was lost while Redis was down; replayed once it is back.
+_pending_bumps: Set[str] = set()
+_counters = {"hits": 0, "misses": 0, "redis_errors": 0, "replayed_bumps": 0}
+
+_MISS = object()
+
+
+def _version_key(collection: str):
+    return f"dataver:{collection}"
+
+
+def _count(name: str, n: int = 1):
+    with _lock:
+        _counters[name] += n
+
+
+def _redis_failed(action: str, e: Exception) -> bool:
+    """Counts and logs a failed Redis call; returns False, for `use_redis = _redis_failed(...)`."""
+    _count("redis_errors")
+    logger.warning(f"Tool cache could not {action}: {e}")
+    return False
+
+
+def _local_data_versions(collections: List[str]) -> str:
+    with _lock:
+        return ".".join(f"l{_local_versions.get(c, 0)}" for c in collections)
+
+
+def _bump_local(collections: Iterable[str]):
+    with _lock:
+        for collection in collections:
+            _local_versions[collection] = _local_versions.get(collection, 0) + 1
+
+
+def _defer_bumps(collections: Iterable[str]):
+    with _lock:
+        _pending_bumps.update(collections)
+
+
+def _take_pending_bumps() -> List[str]:
+    with _lock:
+        pending = sorted(_pending_bumps)
+        _pending_bumps.clear()
+        return pending
+
+
+def _versions_pipeline(client, bumps: List[str], collections: List[str]):
+    """INCRs `bumps`, then (if any collections are given) reads their versions, in one round trip."""
+    pipe = client.pipeline(transaction=False)
+    for collection in bumps:
+        pipe.incr(_version_key(collection))
+    if collections:
+        pipe.mget([_version_key(c) for c in collections])
+    return pipe
+
+
+def _joined_versions(results: List[Any]) -> str:
+    return ".".join(v or "0" for v in results[-1])
+
+
+def _replayed(pending: List[str]):
+    if pending:
+        _count("replayed_bumps", len(pending))
+        logger.info(f"Replayed data version bumps lost while Redis was down: {', '.join(pending)}")
+
+
+def get_data_versions(collections: Iterable[str]) -> str:
+    """
+    Returns the current data version of each collection, joined into one string.
+    Versions live in Redis so every worker sees the same value; the in-process
+    counters are used when Redis is unreachable. Bumps that could not reach Redis
+    are applied there first, so results cached before those writes are not served.
+    """
+    collections = list(collections)
+    if not redis_available():
+        return _local_data_versions(collections)
+    pending = _take_pending_bumps()
+    try:
+        results = _versions_pipeline(_get_redis_client(), pending, collections).execute()
+    except Exception as e:
+        _defer_bumps(pending)
+        _redis_failed("read data versions from Redis", e)
+        return _local_data_versions(collections)
+    _replayed(pending)
+    return _joined_versions(results)
+
+
+async def get_data_versions_async(collections: Iterable[str]) -> str:
+    """Async version of get_data_versions."""
+    collections = list(collections)
+    if not redis_available():
+        return _local_data_versions(collections)
+    pending = _take_pending_bumps()
+    try:
+        results = await _versions_pipeline(_get_async_redis_client(), pending, collections).execute()
+    except Exception as e:
+        _defer_bumps(pending)
+        _redis_failed("read data versions from Redis", e)
+        return _local_data_versions(collections)
+    _replayed(pending)
+    return _joined_versions(results)
+
+
+def bump_data_version(*collections: str):
+    """
+    Marks collections as changed so cached results computed from them are never served again.
+    Call after every write to those collections. The in-process versions are always bumped;
+    a bump that cannot reach Redis is kept and applied once Redis is reachable again.
+    """
+    _bump_local(collections)
+    _defer_bumps(collections)
+    if not redis_available():
+        return
+    pending = _take_pending_bumps()
+    try:
+        _versions_pipeline(_get_redis_client(), pending, []).execute()
+    except Exception as e:
+        _defer_bumps(pending)
+        _redis_failed("bump data versions in Redis", e)
+
+
+async def bump_data_version_async(*collections: str):
+    """Async version of bump_data_version."""
+    _bump_local(collections)
+    _defer_bumps(collections)
+    if not redis_available():
+        return
+    pending = _take_pending_bumps()
+    try:
+        await _versions_pipeline(_get_async_redis_client(), pending, []).execute()
+    except Exception as e:
+        _defer_bumps(pending)
+        _redis_failed("bump data versions in Redis", e)
+
+
+async def replay_pending_bumps_async():
+    """Applies the bumps lost while Redis was down; run by the Redis health check when it recovers."""
+    pending = _take_pending_bumps()
+    if not pending:
+        return
+    try:
+        await _versions_pipeline(_get_async_redis_client(), pending, []).execute()
+    except Exception as e:
+        _defer_bumps(pending)
+        _redis_failed("replay data version bumps in Redis", e)
+        return
+    _replayed(pending)
+
+
+def _local_get(key: str):
+    with _lock:
+        item = _local_results.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del _local_results[key]
+            return None
+        _local_results.move_to_end(key)
+        return value
+
+
+def _local_set(key: str, value: str, ttl: int):
+    with _lock:
+        _local_results[key] = (time.monotonic() + ttl, value)
+        _local_results.move_to_end(key)
+        while len(_local_results) > _LOCAL_MAX_ENTRIES:
+            _local_results.popitem(last=False)
+
+
+def _result_key(func, args, kwargs, versions: str, per_month: bool) -> str:
+    # Keyed by the bare method name so MongoDBTool and AsyncMongoDBTool share entries.
+    arg_hash = hashlib.sha1(json.dumps([args, kwargs], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    key = f"toolcache:{func.__name__}:{arg_hash}:{versions}"
+    # Same clock as queries.start_of_month(), so "this month" results expire when the month does.
+    return f"{key}:{datetime.now():%Y-%m}" if per_month else key
+
+
+def _decoded_hit(data: Optional[str]) -> Any:
+    """The cached value, or _MISS; counts the lookup either way."""
+    if data is None:
+        _count("misses")
+        return _MISS
+    _count("hits")
+    return json.loads(data)
+
+
+def cached_result(collections: Iterable[str], ttl: int = TOOL_CACHE_TTL, per_month: bool = False):
+    """
+    Decorator for MongoDBTool methods whose result depends only on their arguments and
+    the given collections (and, with per_month, on the current month). Results are keyed
+    by method, arguments and the collections' data versions, stored in Redis, and kept in
+    process memory while Redis is unavailable. Hits and misses both return the value as
+    decoded from its JSON form. Works on both regular and async methods; only the Redis
+    calls differ between the two wrappers.
+    """
+    collections = tuple(collections)
+
+    def decorator(func):
+        name = func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                if not TOOL_CACHE_ENABLED:
+                    return await func(self, *args, **kwargs)
+
+                use_redis = redis_available()
+                with timed(CACHE_LATENCY, "cache", "tool", "get"):
+                    key = _result_key(func, args, kwargs, await get_data_versions_async(collections), per_month)
+                    data = None
+                    if use_redis:
+                        try:
+                            data = await _get_async_redis_client().get(key)
+                        except Exception as e:
+                            use_redis = _redis_failed(f"read the cached result of {name}", e)
+                    if not use_redis:
+                        data = _local_get(key)
+                result = _decoded_hit(data)
+                if result is not _MISS:
+                    return result
+
+                data = json.dumps(await func(self, *args, **kwargs), default=str)
+                with timed(CACHE_LATENCY, "cache", "tool", "set"):
+                    if use_redis:
+                        try:
+                            await _get_async_redis_client().setex(key, ttl, data)
+                        except Exception as e:
+                            use_redis = _redis_failed(f"cache the result of {name}", e)
+                    if not use_redis:
+                        _local_set(key, data, ttl)
+                return json.loads(data)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not TOOL_CACHE_ENABLED:
+                return func(self, *args, **kwargs)
+
+            use_redis = redis_available()
+            with timed(CACHE_LATENCY, "cache", "tool", "get"):
+                key = _result_key(func, args, kwargs, get_data_versions(collections), per_month)
+                data = None
+                if use_redis:
+                    try:
+                        data = _get_redis_client().get(key)
+                    except Exception as e:
+                        use_redis = _redis_failed(f"read the cached result of {name}", e)
+                if not use_redis:
+                    data = _local_get(key)
+            result = _decoded_hit(data)
+            if result is not _MISS:
+                return result
+
+            data = json.dumps(func(self, *args, **kwargs), default=str)
+            with timed(CACHE_LATENCY, "cache", "tool", "set"):
+                if use_redis:
+                    try:
+                        _get_redis_client().setex(key, ttl, data)
+                    except Exception as e:
+                        use_redis = _redis_failed(f"cache the result of {name}", e)
+                if not use_redis:
+                    _local_set(key, data, ttl)
+            return json.loads(data)
+        return wrapper
+    return decorator
+
+
+def tool_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "enabled": TOOL_CACHE_ENABLED, "ttl": TOOL_CACHE_TTL, "local_entries": len(_local_results),
+            "pending_bumps": len(_pending_bumps), **_counters,
+        }
+
+
+on_reconnect(replay_pending_bumps_async)
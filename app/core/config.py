@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -5,6 +6,133 @@ load_dotenv()
 MONGO_URI   = os.getenv("MONGO_URI")
 DB_NAME     = os.getenv("DB_NAME")
 
+# MongoDB connection pool bounds and timeouts (milliseconds). MONGO_MIN_POOL_SIZE connections are opened at boot.
+MONGO_MAX_POOL_SIZE               = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE               = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS          = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS           = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS       = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+
+# Slow-query tracing: every find/aggregate/count/distinct/update/delete/insert is timed and grouped
+# by query shape; ones slower than QUERY_TRACE_SLOW_MS are logged with their explain() winning plan.
+# A shape is explained at most once per QUERY_TRACE_EXPLAIN_INTERVAL seconds, in a background thread.
+QUERY_TRACE_ENABLED          = os.getenv("QUERY_TRACE_ENABLED", "true").lower() == "true"
+QUERY_TRACE_SLOW_MS          = float(os.getenv("QUERY_TRACE_SLOW_MS", "100"))
+QUERY_TRACE_EXPLAIN          = os.getenv("QUERY_TRACE_EXPLAIN", "true").lower() == "true"
+QUERY_TRACE_EXPLAIN_INTERVAL = int(os.getenv("QUERY_TRACE_EXPLAIN_INTERVAL", "300"))
+QUERY_TRACE_MAX_SHAPES       = int(os.getenv("QUERY_TRACE_MAX_SHAPES", "500"))
+QUERY_TRACE_QUEUE_SIZE       = int(os.getenv("QUERY_TRACE_QUEUE_SIZE", "100"))
+
 REDIS_URL   = os.getenv("REDIS_URL")
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Model tiers per agent: simple single-topic queries run on the fast model, the rest on the pro model.
+# The fast tier is capped at FAST_TIER_MAX_ITER reasoning steps and escalates to pro when it fails.
+MODEL_TIERING_ENABLED = os.getenv("MODEL_TIERING_ENABLED", "true").lower() == "true"
+MODEL_TIERS = {
+    "support": {
+        "fast": os.getenv("SUPPORT_FAST_MODEL", "gemini/gemini-2.5-flash"),
+        "pro":  os.getenv("SUPPORT_PRO_MODEL", "gemini/gemini-2.5-pro"),
+    },
+    "dashboard": {
+        "fast": os.getenv("DASHBOARD_FAST_MODEL", "gemini/gemini-2.5-flash"),
+        "pro":  os.getenv("DASHBOARD_PRO_MODEL", "gemini/gemini-2.5-pro"),
+    },
+}
+FAST_TIER_MAX_ITER = int(os.getenv("FAST_TIER_MAX_ITER", "6"))
+
+# USD per million (input, output) tokens, used for the spend counters in /stats.
+# MODEL_PRICES takes a JSON object like {"gemini/gemini-2.5-pro": [1.25, 10.0]}; models missing here fall back to LiteLLM's price map.
+MODEL_PRICES = {
+    "gemini/gemini-2.5-flash": [0.30, 2.50],
+    "gemini/gemini-2.5-pro": [1.25, 10.00],
+    **json.loads(os.getenv("MODEL_PRICES", "{}")),
+}
+
+# Support agent prompt budget in estimated tokens (conversation context plus the user's prompt).
+# The last CONTEXT_RECENT_TURNS exchanges are sent verbatim, each capped at CONTEXT_TURN_MAX_TOKENS with bulky
+# tool output stripped; older ones are folded into a rolling summary by CONTEXT_SUMMARY_MODEL in the background.
+SUPPORT_CONTEXT_TOKEN_BUDGET = int(os.getenv("SUPPORT_CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_RECENT_TURNS         = int(os.getenv("CONTEXT_RECENT_TURNS", "2"))
+CONTEXT_TURN_MAX_TOKENS      = int(os.getenv("CONTEXT_TURN_MAX_TOKENS", "300"))
+CONTEXT_SUMMARY_MAX_TOKENS   = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "250"))
+CONTEXT_SUMMARY_MODEL        = os.getenv("CONTEXT_SUMMARY_MODEL", MODEL_TIERS["support"]["fast"])
+
+# Stream LLM output so the /stream endpoints can forward final-answer tokens as they arrive.
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"
+
+# Seconds between keep-alive comments on idle SSE streams, and the longest tool output/step text sent per event.
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "10"))
+SSE_MAX_EVENT_CHARS    = int(os.getenv("SSE_MAX_EVENT_CHARS", "2000"))
+
+# Logging: records go through a bounded queue to a writer thread as JSON lines (LOG_FORMAT=text for local runs).
+# LOG_LEVELS overrides levels per logger, e.g. "app.agents=DEBUG,LiteLLM=WARNING". DEBUG records from
+# LOG_SAMPLED_LOGGERS (agent traces) are kept for LOG_DEBUG_SAMPLE_RATE of the runs; fields are cut at LOG_MAX_FIELD_CHARS.
+LOG_LEVEL             = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS            = {
+    name.strip(): level.strip().upper()
+    for name, level in (item.split("=", 1) for item in os.getenv("LOG_LEVELS", "LiteLLM=WARNING,httpx=WARNING").split(",") if "=" in item)
+}
+LOG_FORMAT            = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE        = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_FIELD_CHARS   = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+LOG_SAMPLED_LOGGERS   = tuple(n.strip() for n in os.getenv("LOG_SAMPLED_LOGGERS", "app.agents").split(",") if n.strip())
+LOG_REDACT_PII        = os.getenv("LOG_REDACT_PII", "true").lower() == "true"
+
+# CrewAI's own step-by-step console output; keep it off in production.
+CREW_VERBOSE = os.getenv("CREW_VERBOSE", "false").lower() == "true"
+
+# Number of pre-built agent instances kept warm per agent type.
+SUPPORT_AGENT_POOL_SIZE   = int(os.getenv("SUPPORT_AGENT_POOL_SIZE", "4"))
+DASHBOARD_AGENT_POOL_SIZE = int(os.getenv("DASHBOARD_AGENT_POOL_SIZE", "2"))
+
+# Threads that run blocking agent work (crew.kickoff, pymongo, redis) off the event loop,
+# how many requests may wait for one, and the Retry-After hint sent once that queue is full.
+AGENT_EXECUTOR_WORKERS     = int(os.getenv("AGENT_EXECUTOR_WORKERS", "8"))
+AGENT_EXECUTOR_QUEUE_SIZE  = int(os.getenv("AGENT_EXECUTOR_QUEUE_SIZE", "32"))
+AGENT_EXECUTOR_RETRY_AFTER = int(os.getenv("AGENT_EXECUTOR_RETRY_AFTER", "5"))
+
+# Batch query endpoints: how many prompts of one batch run at once, the most prompts a batch may hold,
+# and how long (seconds) a prompt may keep waiting for room in a saturated executor before it fails.
+BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "4"))
+BATCH_MAX_QUERIES     = int(os.getenv("BATCH_MAX_QUERIES", "500"))
+BATCH_SATURATED_WAIT  = float(os.getenv("BATCH_SATURATED_WAIT", "30"))
+
+# Add a Server-Timing header (cache, history, queue, agent, llm, mongo phases) to every response.
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Redis connection pool size and how often (seconds) idle connections and the server are health-checked.
+REDIS_MAX_CONNECTIONS       = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+# Near-duplicate prompt cache that sits in front of crew.kickoff.
+SIMILARITY_CACHE_ENABLED     = os.getenv("SIMILARITY_CACHE_ENABLED", "true").lower() == "true"
+SIMILARITY_CACHE_THRESHOLD   = float(os.getenv("SIMILARITY_CACHE_THRESHOLD", "0.85"))
+SIMILARITY_CACHE_TTL         = int(os.getenv("SIMILARITY_CACHE_TTL", "300"))
+SIMILARITY_CACHE_MAX_ENTRIES = int(os.getenv("SIMILARITY_CACHE_MAX_ENTRIES", "1000"))
+
+# Identical agent queries in flight at the same time share one run, across workers via a Redis lock.
+# The lock expires after SINGLE_FLIGHT_LOCK_TTL seconds; results stay readable for SINGLE_FLIGHT_RESULT_TTL.
+SINGLE_FLIGHT_ENABLED    = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_LOCK_TTL   = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL", "120"))
+SINGLE_FLIGHT_RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "30"))
+
+# Result cache for MongoDBTool analytics, invalidated by per-collection data versions.
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+TOOL_CACHE_TTL     = int(os.getenv("TOOL_CACHE_TTL", "300"))
+
+# Pattern-matched support questions answered straight from the database, skipping the LLM.
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+INTENT_ROUTER_INTENTS = [i.strip() for i in os.getenv("INTENT_ROUTER_INTENTS", "order_status,upcoming_classes,pending_dues").split(",") if i.strip()]
+
+# Fall back to a MongoDB text index when exact/prefix client lookups find nothing.
+CLIENT_TEXT_SEARCH_ENABLED = os.getenv("CLIENT_TEXT_SEARCH_ENABLED", "false").lower() == "true"
+
+# IDs each process reserves from the counters collection per round trip.
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "20"))
+
+# Rows written per insert_many by the bulk ingestion endpoints.
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
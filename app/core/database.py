@@ -1,14 +1,167 @@
-from pymongo import MongoClient
-from app.core.config import MONGO_URI, DB_NAME
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import AsyncMongoClient, MongoClient, monitoring
+from app.core.config import (
+    MONGO_URI, DB_NAME,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    QUERY_TRACE_ENABLED,
+)
+from app.core.query_trace import query_tracer
 
 
-client = MongoClient(MONGO_URI)
-db     = client[DB_NAME]
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Records connection pool events for one client: checkout waits, connections in use and churn."""
 
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._max_in_use = 0
+        self._open = 0
+        self._checkouts = 0
+        self._checkout_failures = 0
+        self._pool_clears = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
 
-def get_mongo_db():
-    client = MongoClient(MONGO_URI)
-    try:
-        yield client[DB_NAME]
-    finally:
-        client.close()
+    def connection_checked_out(self, event):
+        wait = event.duration or 0.0
+        with self._lock:
+            self._in_use += 1
+            self._max_in_use = max(self._max_in_use, self._in_use)
+            self._checkouts += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self._open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._open -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool_clears += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": self._open,
+                "in_use": self._in_use,
+                "max_in_use": self._max_in_use,
+                "checkouts": self._checkouts,
+                "checkout_failures": self._checkout_failures,
+                "pool_clears": self._pool_clears,
+                "avg_checkout_wait_ms": round(self._total_wait / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "max_checkout_wait_ms": round(self._max_wait * 1000, 3),
+            }
+
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+_lock = threading.Lock()
+_client = None
+_db = None
+_async_client = None
+_async_db = None
+
+
+def _client_options(listener: PoolMetrics):
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "event_listeners": [listener, query_tracer] if QUERY_TRACE_ENABLED else [listener],
+    }
+
+
+def get_db():
+    """
+    Returns the database on the process-wide MongoClient. The app creates the client in its
+    lifespan; scripts and anything running before that get it created on first use.
+    """
+    global _client, _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                _client = MongoClient(MONGO_URI, **_client_options(sync_pool_metrics))
+                _db = _client[DB_NAME]
+    return _db
+
+
+def get_async_db():
+    """Returns the database on the process-wide AsyncMongoClient, for code running on the event loop."""
+    global _async_client, _async_db
+    if _async_db is None:
+        with _lock:
+            if _async_db is None:
+                _async_client = AsyncMongoClient(MONGO_URI, **_client_options(async_pool_metrics))
+                _async_db = _async_client[DB_NAME]
+    return _async_db
+
+
+def _warm_up_sync():
+    db = get_db()
+    with ThreadPoolExecutor(max_workers=max(MONGO_MIN_POOL_SIZE, 1)) as pool:
+        list(pool.map(lambda _: db.command("ping"), range(max(MONGO_MIN_POOL_SIZE, 1))))
+
+
+async def init_mongo():
+    """
+    Creates both clients and opens MONGO_MIN_POOL_SIZE connections on each with concurrent
+    pings, so the first requests after boot don't pay for server selection and handshakes.
+    """
+    await asyncio.to_thread(_warm_up_sync)
+    db = get_async_db()
+    await asyncio.gather(*(db.command("ping") for _ in range(max(MONGO_MIN_POOL_SIZE, 1))))
+
+
+async def close_mongo():
+    global _client, _db, _async_client, _async_db
+    with _lock:
+        client, async_client = _client, _async_client
+        _client = _db = _async_client = _async_db = None
+    if client is not None:
+        await asyncio.to_thread(client.close)
+    if async_client is not None:
+        await async_client.close()
+
+
+def mongo_stats():
+    """Returns pool settings and per-client pool metrics for the runtime stats endpoint."""
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "sync_pool": sync_pool_metrics.stats(),
+        "async_pool": async_pool_metrics.stats(),
+    }
@@ -0,0 +1,162 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app.core.config import (
+    LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_MAX_FIELD_CHARS,
+    LOG_DEBUG_SAMPLE_RATE, LOG_SAMPLED_LOGGERS, LOG_REDACT_PII,
+)
+
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is logged as a field.
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"(?<![\w-])(?:\+\d{1,3}[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?![\w-])")
+
+# Whether DEBUG records of the current agent run are kept; decided once per run so traces stay whole.
+_trace_sampled: ContextVar[Optional[bool]] = ContextVar("log_trace_sampled", default=None)
+
+_plain = logging.Formatter()
+_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_dropped = 0
+
+
+def truncate(value: Any, limit: int = LOG_MAX_FIELD_CHARS) -> Any:
+    """Shortens long strings (and the str() of other large values) to `limit` characters."""
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    text = value if isinstance(value, str) else str(value)
+    return text if len(text) <= limit else f"{text[:limit]}… [{len(text) - limit} more chars]"
+
+
+def redact(text: str) -> str:
+    return _PHONE.sub("[phone]", _EMAIL.sub("[email]", text))
+
+
+@contextmanager
+def sampled_trace():
+    """Decides once whether the DEBUG records logged inside the block (one agent run) are kept."""
+    token = _trace_sampled.set(random.random() < LOG_DEBUG_SAMPLE_RATE)
+    try:
+        yield
+    finally:
+        _trace_sampled.reset(token)
+
+
+class DebugSampler(logging.Filter):
+    """Keeps LOG_DEBUG_SAMPLE_RATE of the DEBUG records from the sampled loggers (agent traces)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or not record.name.startswith(LOG_SAMPLED_LOGGERS):
+            return True
+        sampled = _trace_sampled.get()
+        return sampled if sampled is not None else random.random() < LOG_DEBUG_SAMPLE_RATE
+
+
+class TruncatingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without blocking: the message is rendered and large
+    fields are truncated here, and records are dropped (and counted) when the queue is full.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = truncate(record.getMessage())
+        record.args = None
+        if record.exc_info:
+            record.exc_text = truncate(_plain.formatException(record.exc_info), LOG_MAX_FIELD_CHARS * 4)
+            record.exc_info = None
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                setattr(record, key, truncate(value))
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _lock:
+                _dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, any `extra=` fields and the exception."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        line = json.dumps(entry, default=str, ensure_ascii=False)
+        return redact(line) if LOG_REDACT_PII else line
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        return redact(line) if LOG_REDACT_PII else line
+
+
+def setup_logging():
+    """
+    Routes all logging through a bounded queue to a listener thread that writes JSON (or text,
+    LOG_FORMAT=text) lines to stdout, so request and agent threads never block on stdout.
+    Levels come from LOG_LEVEL and the per-logger LOG_LEVELS. Safe to call more than once.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+        handler = TruncatingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        handler.addFilter(DebugSampler())
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        for name, level in LOG_LEVELS.items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Writes out the queued records and stops the listener thread."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def logging_stats() -> Dict[str, Any]:
+    with _lock:
+        return {"running": _listener is not None, "dropped": _dropped, "queued": _listener.queue.qsize() if _listener else 0}
@@ -0,0 +1,254 @@
+import functools
+import inspect
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import SERVER_TIMING_ENABLED
+
+
+# Seconds; agent and LLM work runs far longer than the Redis and Mongo calls around it.
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+_REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency per route, until the last byte is sent.",
+    ["route", "method", "status"], buckets=_REQUEST_BUCKETS,
+)
+CACHE_LATENCY = Histogram(
+    "cache_operation_duration_seconds", "Response, similarity and tool cache lookups and stores.",
+    ["cache", "operation"], buckets=_FAST_BUCKETS,
+)
+HISTORY_LATENCY = Histogram(
+    "history_io_duration_seconds", "Conversation history reads and writes in Redis (pipelined with the response cache).",
+    ["operation"], buckets=_FAST_BUCKETS,
+)
+TOOL_LATENCY = Histogram(
+    "mongodb_tool_duration_seconds", "MongoDBTool / ExternalAPI method latency (sync and async), cache hits included.",
+    ["method"], buckets=_FAST_BUCKETS,
+)
+LLM_LATENCY = Histogram(
+    "llm_call_duration_seconds", "Latency of single LLM completions.",
+    ["model", "outcome"], buckets=_SLOW_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens", "Tokens used per model.", ["model", "kind"])
+QUEUE_WAIT = Histogram(
+    "agent_queue_wait_seconds", "Time from submitting an agent run until a worker thread starts it.",
+    ["agent"], buckets=_REQUEST_BUCKETS,
+)
+
+# Per-request phase durations (seconds) for the Server-Timing header. The dict is shared by
+# reference, so phases recorded on agent executor threads (which run on a copy of the
+# request's context) end up in the same place.
+_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_phases", default=None)
+_phases_lock = threading.Lock()
+# "Class.method" of the outermost instrumented tool call running in this context, so nested
+# tool calls are not counted twice in its phase and database commands can be traced to it.
+_current_tool: ContextVar[Optional[str]] = ContextVar("current_tool_call", default=None)
+# ID of the HTTP request being served (X-Request-ID, or generated by MetricsMiddleware).
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def current_tool() -> Optional[str]:
+    return _current_tool.get()
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def record_phase(phase: str, seconds: float):
+    """Adds time to a phase of the current request, if one is being measured."""
+    phases = _phases.get()
+    if phases is not None:
+        with _phases_lock:
+            phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(histogram: Histogram, phase: str, *labels: str):
+    """Observes the block's duration on `histogram` and adds it to the request's `phase`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.labels(*labels).observe(elapsed)
+        record_phase(phase, elapsed)
+
+
+def timed_call(histogram: Histogram, phase: str, *labels: str):
+    """Decorator form of timed(), for regular and async functions."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(histogram, phase, *labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(histogram, phase, *labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def _tool_call(method: str, caller: str):
+    outermost = _current_tool.get() is None
+    token = _current_tool.set(caller) if outermost else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if outermost:
+            _current_tool.reset(token)
+            record_phase("mongo", elapsed)
+        TOOL_LATENCY.labels(method).observe(elapsed)
+
+
+def _timed_method(name: str, caller: str, func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with _tool_call(name, caller):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _tool_call(name, caller):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def instrument_tool(cls):
+    """
+    Class decorator: times every public method of a MongoDB tool (MongoDBTool, ExternalAPI and
+    their async counterparts) and tags the database commands it issues with "Class.method".
+    """
+    for name, func in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(func):
+            setattr(cls, name, _timed_method(name, f"{cls.__name__}.{name}", func))
+    return cls
+
+
+def record_llm_call(model: str, seconds: float, ok: bool = True):
+    LLM_LATENCY.labels(model, "ok" if ok else "error").observe(seconds)
+    record_phase("llm", seconds)
+
+
+def record_llm_tokens(model: str, prompt_tokens: int, completion_tokens: int):
+    if prompt_tokens:
+        LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+
+
+def server_timing(phases: Dict[str, float], total: float) -> str:
+    with _phases_lock:
+        items = sorted(phases.items())
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in items + [("total", total)])
+
+
+def _incoming_request_id(scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-request-id":
+            return value.decode("latin-1")[:64] or None
+    return None
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that measures each HTTP request: observes its latency per route and
+    collects per-phase durations, sent as a Server-Timing header when SERVER_TIMING_ENABLED.
+    Streaming responses send their headers first, so their header only covers the phases
+    that finished before the first byte. Also assigns the request ID (the caller's
+    X-Request-ID or a new one), echoed back in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases: Dict[str, float] = {}
+        token = _phases.set(phases)
+        request_id = _incoming_request_id(scope) or uuid.uuid4().hex[:16]
+        id_token = _request_id.set(request_id)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                if SERVER_TIMING_ENABLED:
+                    headers.append("Server-Timing", server_timing(phases, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_id.reset(id_token)
+            _phases.reset(token)
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(getattr(route, "path", "unmatched"), scope["method"], str(status_code)).observe(time.perf_counter() - start)
+
+
+def _metric_name(path: Tuple[str, ...]) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(path)).lower()
+
+
+def _numeric_leaves(data: Dict[str, Any], path: Tuple[str, ...] = ()) -> Iterable[Tuple[Tuple[str, ...], float]]:
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield from _numeric_leaves(value, path + (str(key),))
+        elif isinstance(value, (bool, int, float)):
+            yield path + (str(key),), float(value)
+
+
+class RuntimeStatsCollector:
+    """
+    Exposes the numbers from the /stats snapshot (agent pools, executor, Mongo pools, caches,
+    intent router, model tiers, ...) as gauges named after their path, e.g.
+    agentapi_executor_running or agentapi_mongo_async_pool_in_use. Read at scrape time.
+    """
+
+    def __init__(self, snapshot: Callable[[], Dict[str, Any]], prefix: str = "agentapi"):
+        self.snapshot = snapshot
+        self.prefix = prefix
+
+    def collect(self):
+        for path, value in _numeric_leaves(self.snapshot()):
+            yield GaugeMetricFamily(_metric_name((self.prefix,) + path), f"/stats {'.'.join(path)}", value=value)
+
+
+_collector: Optional[RuntimeStatsCollector] = None
+
+
+def register_runtime_stats(snapshot: Callable[[], Dict[str, Any]]):
+    """Registers (or re-points, when the app is started again) the /stats collector."""
+    global _collector
+    if _collector is None:
+        _collector = RuntimeStatsCollector(snapshot)
+        REGISTRY.register(_collector)
+    else:
+        _collector.snapshot = snapshot
@@ -0,0 +1,310 @@
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.core.config import (
+    QUERY_TRACE_ENABLED, QUERY_TRACE_SLOW_MS, QUERY_TRACE_EXPLAIN, QUERY_TRACE_EXPLAIN_INTERVAL,
+    QUERY_TRACE_MAX_SHAPES, QUERY_TRACE_QUEUE_SIZE,
+)
+from app.core.metrics import current_request_id, current_tool
+
+
+logger = logging.getLogger(__name__)
+
+_EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+_TRACED = _EXPLAINABLE | {"insert"}
+
+# Fields of the sent command that belong to the session or transport, not the query; explain rejects most of them.
+_NOT_EXPLAINED = {"lsid", "txnNumber", "startTransaction", "autocommit", "readConcern", "writeConcern", "apiVersion", "apiStrict"}
+
+# Plan stages that read through an index rather than scanning the collection.
+_INDEX_STAGES = {"IXSCAN", "COUNT_SCAN", "DISTINCT_SCAN", "IDHACK", "EXPRESS_IXSCAN", "EXPRESS_CLUSTERED_IXSCAN"}
+
+
+def _shape(value: Any) -> Any:
+    """Replaces the literal values of a filter or pipeline with "?"; keys, operators and $field paths stay."""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if any(isinstance(item, dict) for item in value):
+            return [_shape(item) for item in value]
+        return "?"
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    return "?"
+
+
+def query_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a command that decides its plan, with literal values removed."""
+    if command_name == "find":
+        return {"filter": _shape(command.get("filter", {})), "sort": command.get("sort")}
+    if command_name == "aggregate":
+        return {"pipeline": _shape(command.get("pipeline", []))}
+    if command_name == "count":
+        return {"query": _shape(command.get("query", {}))}
+    if command_name == "distinct":
+        return {"key": command.get("key"), "query": _shape(command.get("query", {}))}
+    if command_name == "findAndModify":
+        return {"query": _shape(command.get("query", {})), "sort": command.get("sort")}
+    if command_name in ("update", "delete"):
+        # Bulk writes are grouped by their first statement, or every batch would be its own shape.
+        statements = command.get(f"{command_name}s") or [{}]
+        return {"q": _shape(statements[0].get("q", {}))}
+    return {}
+
+
+def _explain_command(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    explained = {key: value for key, value in command.items() if not key.startswith("$") and key not in _NOT_EXPLAINED}
+    if command_name in ("update", "delete"):
+        explained[f"{command_name}s"] = explained[f"{command_name}s"][:1]
+    return {"explain": explained, "verbosity": "queryPlanner"}
+
+
+def _find_key(data: Any, key: str) -> Any:
+    if isinstance(data, dict):
+        if key in data:
+            return data[key]
+        data = list(data.values())
+    if isinstance(data, list):
+        for item in data:
+            found = _find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+
+def _plan_stages(plan: Any, stages: List[str], indexes: List[str]):
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            stages.append(plan["stage"])
+        if isinstance(plan.get("indexName"), str):
+            indexes.append(plan["indexName"])
+        for value in plan.values():
+            _plan_stages(value, stages, indexes)
+    elif isinstance(plan, list):
+        for item in plan:
+            _plan_stages(item, stages, indexes)
+
+
+def winning_plan(explain_output: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Summarizes the winning plan of an explain() result: its stages (outermost first), the
+    indexes it uses and whether it reads the collection through an index ("IXSCAN") or
+    scans it ("COLLSCAN"). None when the output has no plan (e.g. aggregations without a $cursor stage).
+    """
+    plan = _find_key(explain_output, "winningPlan")
+    if plan is None:
+        return None
+    stages: List[str] = []
+    indexes: List[str] = []
+    _plan_stages(plan, stages, indexes)
+    if "COLLSCAN" in stages:
+        scan = "COLLSCAN"
+    elif _INDEX_STAGES.intersection(stages):
+        scan = "IXSCAN"
+    else:
+        scan = stages[-1] if stages else "UNKNOWN"
+    return {"scan": scan, "stages": stages, "indexes": sorted(set(indexes))}
+
+
+class _ShapeStats:
+    __slots__ = ("command", "collection", "shape", "count", "slow", "total_ms", "max_ms",
+                 "callers", "last_slow", "plan", "explained_at", "explain_pending")
+
+    def __init__(self, command: str, collection: str, shape: Dict[str, Any]):
+        self.command = command
+        self.collection = collection
+        self.shape = shape
+        self.count = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.callers: Dict[str, int] = {}
+        self.last_slow: Optional[Dict[str, Any]] = None
+        self.plan: Optional[Dict[str, Any]] = None
+        self.explained_at = 0.0
+        self.explain_pending = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "command": self.command,
+            "collection": self.collection,
+            "shape": self.shape,
+            "count": self.count,
+            "slow": self.slow,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "total_ms": round(self.total_ms, 3),
+            "callers": dict(self.callers),
+            "last_slow": self.last_slow,
+            "plan": self.plan,
+        }
+
+
+class QueryTracer(monitoring.CommandListener):
+    """
+    Command listener on both MongoDB clients. Times every query and write, tags it with the
+    calling tool method and the request ID, and aggregates the timings per query shape
+    (command, collection and filter/pipeline without literal values). Commands slower than
+    QUERY_TRACE_SLOW_MS are logged with the winning plan of their shape; plans are captured
+    with explain() on a background thread, so the query itself is never held up.
+    """
+
+    def __init__(self, slow_ms: float, max_shapes: int):
+        self.slow_ms = slow_ms
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Tuple[str, Dict[str, Any], Optional[str], Optional[str]]] = {}
+        self._shapes: Dict[Tuple[str, str, str], _ShapeStats] = {}
+        self._queue: "queue.Queue" = queue.Queue(QUERY_TRACE_QUEUE_SIZE)
+        self._worker: Optional[threading.Thread] = None
+        self._counters = {"operations": 0, "slow": 0, "untracked_shapes": 0, "explained": 0, "explain_failures": 0, "explain_dropped": 0}
+
+    def started(self, event):
+        if event.command_name not in _TRACED:
+            return
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.database_name, event.command, current_tool(), current_request_id(),
+            )
+
+    def succeeded(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is not None:
+            self._record(event.command_name, event.duration_micros / 1000, *pending)
+
+    def failed(self, event):
+        with self._lock:
+            self._pending.pop((event.connection_id, event.request_id), None)
+
+    def _record(self, command_name: str, ms: float, database: str, command: Dict[str, Any],
+                caller: Optional[str], request_id: Optional[str]):
+        collection = str(command.get(command_name, ""))
+        shape = query_shape(command_name, command)
+        key = (command_name, collection, json.dumps(shape, sort_keys=True, default=str))
+        slow = ms >= self.slow_ms
+        explain = False
+        with self._lock:
+            self._counters["operations"] += 1
+            stats = self._shapes.get(key)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    self._counters["untracked_shapes"] += 1
+                else:
+                    stats = self._shapes[key] = _ShapeStats(command_name, collection, shape)
+            if stats is not None:
+                stats.count += 1
+                stats.total_ms += ms
+                stats.max_ms = max(stats.max_ms, ms)
+                caller_name = caller or "untagged"
+                stats.callers[caller_name] = stats.callers.get(caller_name, 0) + 1
+            if not slow:
+                return
+            self._counters["slow"] += 1
+            entry = {"duration_ms": round(ms, 3), "caller": caller, "request_id": request_id, "at": time.time()}
+            plan = None
+            if stats is not None:
+                stats.slow += 1
+                stats.last_slow = entry
+                plan = stats.plan
+                explain = (
+                    QUERY_TRACE_EXPLAIN and command_name in _EXPLAINABLE and not stats.explain_pending
+                    and time.monotonic() - stats.explained_at >= QUERY_TRACE_EXPLAIN_INTERVAL
+                )
+                stats.explain_pending = stats.explain_pending or explain
+
+        if explain and self._enqueue((key, database, command_name, command, entry)):
+            return
+        if explain:
+            with self._lock:
+                stats.explain_pending = False
+        self._log_slow(command_name, collection, shape, entry, plan)
+
+    def _enqueue(self, job) -> bool:
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._counters["explain_dropped"] += 1
+            return False
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._explain_loop, name="query-explain", daemon=True)
+                self._worker.start()
+
+    def _explain_loop(self):
+        while True:
+            key, database, command_name, command, entry = self._queue.get()
+            plan = self._explain(database, command_name, command)
+            with self._lock:
+                stats = self._shapes.get(key)
+                if stats is not None:
+                    stats.explain_pending = False
+                    stats.explained_at = time.monotonic()
+                    stats.plan = plan or stats.plan
+                    plan = stats.plan
+            self._log_slow(command_name, key[1], json.loads(key[2]), entry, plan)
+
+    def _explain(self, database: str, command_name: str, command: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Imported here: app.core.database registers this listener when it creates its clients.
+        from app.core.database import get_db
+        try:
+            output = get_db().client[database].command(_explain_command(command_name, command))
+        except Exception as e:
+            with self._lock:
+                self._counters["explain_failures"] += 1
+            logger.warning(f"Could not explain slow {command_name}: {e}")
+            return None
+        with self._lock:
+            self._counters["explained"] += 1
+        return winning_plan(output)
+
+    def _log_slow(self, command_name: str, collection: str, shape: Dict[str, Any],
+                  entry: Dict[str, Any], plan: Optional[Dict[str, Any]]):
+        scan = plan["scan"] if plan else "unknown"
+        logger.warning(
+            f"Slow {command_name} on {collection}: {entry['duration_ms']} ms ({scan})",
+            extra={
+                "collection": collection, "command": command_name, "shape": json.dumps(shape, default=str),
+                "duration_ms": entry["duration_ms"], "caller": entry["caller"], "request_id": entry["request_id"],
+                "plan": plan,
+            },
+        )
+
+    def top(self, limit: int = 20, sort: str = "max") -> List[Dict[str, Any]]:
+        """The `limit` slowest query shapes by max, avg or total time."""
+        with self._lock:
+            shapes = [stats.as_dict() for stats in self._shapes.values()]
+        field = {"max": "max_ms", "avg": "avg_ms", "total": "total_ms"}[sort]
+        return sorted(shapes, key=lambda s: s[field], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": QUERY_TRACE_ENABLED,
+                "slow_ms": self.slow_ms,
+                "shapes": len(self._shapes),
+                "explain_queued": self._queue.qsize(),
+                **self._counters,
+            }
+
+
+query_tracer = QueryTracer(QUERY_TRACE_SLOW_MS, QUERY_TRACE_MAX_SHAPES)
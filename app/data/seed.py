@@ -1,7 +1,12 @@
-from app.core.database import db
+from app.core.database import get_db
+from app.cache.tool_cache import bump_data_version
+from app.services.client_resolver import backfill_client_search_fields
+from app.services.rollups import rebuild_rollups
+from app.services.id_allocator import id_allocator, async_id_allocator
 from datetime import datetime, timedelta
 
 def seed():
+    db = get_db()
     print("Clearing existing data...")
     db.clients.delete_many({})
     db.orders.delete_many({})
@@ -9,6 +14,9 @@ def seed():
     db.payments.delete_many({})
     db.courses.delete_many({})
     db.attendance.delete_many({})
+    db.counters.delete_many({})
+    id_allocator.reset()
+    async_id_allocator.reset()
     print("Data cleared.")
 
 
@@ -20,6 +28,7 @@ def seed():
         {"_id": 4, "name":"Neha Reddy","email":"neha@example.com","phone":"6666666666", "status": "active", "enrolled_services": ["Zumba Basics", "Yoga Beginner"], "created_at": datetime.now() - timedelta(days=15), "dob": datetime(1995, 7, 5)},
         {"_id": 5, "name":"Sita Devi","email":"sita@example.com","phone":"5555555555", "status": "active", "enrolled_services": ["Yoga Beginner"], "created_at": datetime.now() - timedelta(days=5), "dob": datetime(1988, 1, 25)}, # New client this month
     ])
+    backfill_client_search_fields(db)
     print("Clients seeded.")
 
 
@@ -72,6 +81,11 @@ def seed():
     ])
     print("Attendance seeded.")
 
+    print("Rebuilding rollups...")
+    rebuild_rollups()
+    print("Rollups rebuilt.")
+
+    bump_data_version("clients", "orders", "classes", "payments", "courses", "attendance")
     print("Mock data seeding complete!")
 
 if __name__ == "__main__":
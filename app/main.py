@@ -1,13 +1,55 @@
+import asyncio
+from app.core.logs import setup_logging
+# Before the other app imports, so anything logged while they load goes through the queue.
+setup_logging()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import routes, external
+from app.agents.pool import AgentPool
+from app.agents.executor import AgentExecutor
+from app.agents.support_agent import SupportAgent
+from app.agents.dashboard_agent import DashboardAgent
+from app.agents.streaming import register_event_handlers
+from app.agents.llm import register_llm_metrics
+from app.core.metrics import MetricsMiddleware, register_runtime_stats
+from app.cache.redis_cache import init_async_redis, close_async_redis
+from app.core.database import init_mongo, close_mongo
+from app.services.indexes import ensure_indexes
+from app.core.config import (
+    SUPPORT_AGENT_POOL_SIZE, DASHBOARD_AGENT_POOL_SIZE,
+    AGENT_EXECUTOR_WORKERS, AGENT_EXECUTOR_QUEUE_SIZE, AGENT_EXECUTOR_RETRY_AFTER,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_mongo()
+    await asyncio.to_thread(ensure_indexes)
+    app.state.support_agent_pool = AgentPool("support", SupportAgent, SUPPORT_AGENT_POOL_SIZE)
+    app.state.dashboard_agent_pool = AgentPool("dashboard", DashboardAgent, DASHBOARD_AGENT_POOL_SIZE)
+    app.state.support_agent_pool.fill()
+    app.state.dashboard_agent_pool.fill()
+    app.state.agent_executor = AgentExecutor(AGENT_EXECUTOR_WORKERS, AGENT_EXECUTOR_QUEUE_SIZE, AGENT_EXECUTOR_RETRY_AFTER)
+    register_event_handlers()
+    register_llm_metrics()
+    register_runtime_stats(lambda: routes.runtime_snapshot(app))
+    await init_async_redis()
+    yield
+    app.state.agent_executor.shutdown()
+    await close_async_redis()
+    await close_mongo()
+
 
 app = FastAPI(
     title="Multi-Agent Backend",
     version="1.0.0",
-    description="Backend for a multi-agent system using CrewAI and FastAPI, supporting client and dashboard queries, and external API interactions with MongoDB and Redis caching."
+    description="Backend for a multi-agent system using CrewAI and FastAPI, supporting client and dashboard queries, and external API interactions with MongoDB and Redis caching.",
+    lifespan=lifespan
 )
 
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -21,4 +21,12 @@ class AgentResponseData(BaseModel):
     agent_response: Any = Field(..., description="The raw response from the agent.")
 
 class AgentAPIResponse(APIResponse):
-    data: AgentResponseData
\ No newline at end of file
+    data: AgentResponseData
+
+class BatchQuery(BaseModel):
+    q: str = Field(..., description="The natural language query.")
+    session_id: str = Field("global", description="Optional: Session ID for memory/caching. Defaults to 'global'.")
+
+class BatchQueryRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., description="The queries to run.")
+    parallelism: Optional[int] = Field(None, ge=1, description="How many queries may run at once; capped by BATCH_MAX_PARALLELISM.")
@@ -0,0 +1,156 @@
+from pymongo.errors import BulkWriteError
+from app.core.database import get_async_db
+from app.cache.tool_cache import bump_data_version_async
+from app.services.run_context import invalidate
+from app.services.client_resolver import resolve_client_async, resolve_clients_async
+from app.services.rollups import record_order_async, record_orders_async
+from app.services.id_allocator import async_id_allocator
+from app.services.external_api import (
+    COURSE_COLLATION, client_document, order_document, validate_rows, write_errors,
+    enrollment_updates, course_queries, courses_by_lower_name,
+)
+from app.models.common import ClientCreate, OrderCreate
+from app.core.metrics import instrument_tool
+from datetime import datetime
+from typing import Dict, Any, List
+
+
+@instrument_tool
+class AsyncExternalAPI:
+    """
+    Async counterpart of ExternalAPI on the native asyncio MongoDB client, so the API routes
+    await their writes on the event loop instead of occupying a threadpool thread each.
+    """
+
+    async def create_client(self, data: ClientCreate) -> Dict[str, Any]:
+        """Creates a new client entry."""
+        new_id = await async_id_allocator.allocate_async("clients")
+        client_data = client_document(data, new_id, datetime.now())
+        result = await get_async_db().clients.insert_one(client_data)
+        await bump_data_version_async("clients")
+        invalidate("client")
+        return {"id": str(result.inserted_id), "client_id": new_id, "name": client_data["name"]}
+
+    async def bulk_create_clients(self, rows: List[Any], start_index: int = 0) -> List[Dict[str, Any]]:
+        """
+        Creates many clients with one unordered insert_many. Returns one result per row, in order;
+        invalid or rejected rows are reported without stopping the rest.
+        """
+        results, valid = validate_rows(rows, ClientCreate, start_index)
+        if not valid:
+            return results
+
+        now = datetime.now()
+        ids = await async_id_allocator.allocate_many_async("clients", len(valid))
+        docs = []
+        for (index, data), new_id in zip(valid, ids):
+            docs.append(client_document(data, new_id, now))
+            results[index - start_index] = {"index": index, "status": "created", "client_id": new_id, "name": data.name}
+
+        failed = await self._insert_many(get_async_db().clients, docs)
+        for position, error in failed.items():
+            index = valid[position][0]
+            results[index - start_index] = {"index": index, "status": "error", "error": error}
+        await bump_data_version_async("clients")
+        invalidate("client")
+        return results
+
+    async def bulk_create_orders(self, rows: List[Any], start_index: int = 0) -> List[Dict[str, Any]]:
+        """
+        Creates many orders. Clients and courses are resolved once per distinct name, IDs are
+        allocated in blocks, and orders, enrollments and rollups are each written in one bulk call.
+        """
+        results, valid = validate_rows(rows, OrderCreate, start_index)
+        if not valid:
+            return results
+
+        clients = await resolve_clients_async(get_async_db().clients, [data.client_name for _, data in valid])
+        courses = await self._find_courses([data.course_name for _, data in valid])
+
+        placeable = []
+        for index, data in valid:
+            if clients.get(data.client_name):
+                placeable.append((index, data))
+            else:
+                results[index - start_index] = {"index": index, "status": "error", "error": "Client not found. Please create client first."}
+        if not placeable:
+            return results
+
+        now = datetime.now()
+        ids = await async_id_allocator.allocate_many_async("orders", len(placeable))
+        order_ids = await async_id_allocator.allocate_many_async("order_number", len(placeable))
+        docs = []
+        for (index, data), new_id, new_order_id in zip(placeable, ids, order_ids):
+            client = clients[data.client_name]
+            order_data = order_document(data, client, courses.get(data.course_name), new_id, new_order_id, now)
+            docs.append(order_data)
+            results[index - start_index] = {"index": index, "status": "created", "order_id": new_order_id, "client_name": client["name"],
+                                            "course": order_data["course"], "amount": order_data["amount"]}
+
+        failed = await self._insert_many(get_async_db().orders, docs)
+        for position, error in failed.items():
+            index = placeable[position][0]
+            results[index - start_index] = {"index": index, "status": "error", "error": error}
+
+        written = [doc for position, doc in enumerate(docs) if position not in failed]
+        if written:
+            await get_async_db().clients.bulk_write(enrollment_updates(written), ordered=False)
+        await record_orders_async(written)
+        await bump_data_version_async("orders", "clients")
+        invalidate("client", "order", "orders")
+        return results
+
+    async def _insert_many(self, collection, docs: List[Dict[str, Any]]) -> Dict[int, str]:
+        """Unordered insert; returns {position in docs: error message} for the documents that failed."""
+        try:
+            await collection.insert_many(docs, ordered=False)
+            return {}
+        except BulkWriteError as e:
+            return write_errors(e)
+
+    async def create_order(self, data: OrderCreate) -> Dict[str, Any]:
+        """Creates a new order entry."""
+        client = await resolve_client_async(get_async_db().clients, data.client_name)
+        if not client:
+            return {"error": "Client not found. Please create client first."}
+
+        new_id = await async_id_allocator.allocate_async("orders")
+        new_order_id = await async_id_allocator.allocate_async("order_number")
+
+        course = await self._find_course(data.course_name)
+        order_data = order_document(data, client, course, new_id, new_order_id, datetime.now())
+
+        result = await get_async_db().orders.insert_one(order_data)
+        await record_order_async(order_data)
+
+        if order_data["course"] not in client.get("enrolled_services", []):
+            await get_async_db().clients.update_one(
+                {"_id": client["_id"]},
+                {"$addToSet": {"enrolled_services": order_data["course"]}}
+            )
+        await bump_data_version_async("orders", "clients")
+        invalidate("client", "order", "orders")
+
+        return {"id": str(result.inserted_id), "order_id": new_order_id, "client_name": client["name"], "course": order_data["course"], "status": order_data["status"], "amount": order_data["amount"]}
+
+    async def _find_courses(self, course_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Finds courses for many names: exact case-insensitive matches in one query, then per-name fallback."""
+        names = set(course_names)
+        found = {}
+        by_lower, exact_query = courses_by_lower_name(names)
+        async for course in get_async_db().courses.find(exact_query, collation=COURSE_COLLATION):
+            for name in by_lower.get(course["name"].lower(), []):
+                found.setdefault(name, course)
+        for name in names - found.keys():
+            course = await self._find_course(name)
+            if course:
+                found[name] = course
+        return found
+
+    async def _find_course(self, course_name: str) -> Dict[str, Any] | None:
+        """Finds a course by exact name (case-insensitive), then by partial name. Input is matched literally."""
+        for query in course_queries(course_name):
+            course = await get_async_db().courses.find_one(query)
+            if course:
+                return course
+        return None
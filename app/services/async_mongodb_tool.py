@@ -0,0 +1,143 @@
+import asyncio
+from app.core.database import get_async_db
+from app.cache.tool_cache import cached_result
+from app.services.run_context import memoized_async
+from app.services.client_resolver import resolve_client_async
+from app.services.rollups import ORDER_ROLLUPS, PAYMENT_ROLLUPS
+from app.services import queries
+from app.core.metrics import instrument_tool
+from typing import List, Dict, Any, Optional
+
+
+@instrument_tool
+class AsyncMongoDBTool:
+    """
+    Async counterpart of MongoDBTool on the native asyncio MongoDB client, for code that runs
+    on the event loop (API routes). Runs the same queries and shares the tool result cache.
+    """
+
+    async def get_client(self, query: str) -> Dict[str, Any] | None:
+        """Searches for a client by name, email, or phone. Memoized for the current agent run."""
+        client = await memoized_async("client", query.strip().lower(), lambda: self._find_client(query))
+        return dict(client) if client else client
+
+    async def _find_client(self, query: str) -> Dict[str, Any] | None:
+        return queries.format_client(await resolve_client_async(get_async_db().clients, query))
+
+    async def get_client_enrolled_services(self, client_query: str) -> List[Dict[str, Any]]:
+        """Retrieves enrolled services and their status for a given client query (name, email, or phone)."""
+        return queries.enrolled_services_result(await self.get_client(client_query))
+
+    async def get_order_status(self, order_id: int) -> str:
+        """Fetches status by order ID."""
+        order = await memoized_async("order", order_id, lambda: get_async_db().orders.find_one({"order_id": order_id}, {"status": 1}))
+        return order["status"] if order else "Not found"
+
+    async def _client_orders(self, client_id: int) -> List[Dict[str, Any]]:
+        """All orders of a client, loaded once per agent run and filtered in memory by callers."""
+        return await memoized_async("orders", client_id, lambda: (
+            get_async_db().orders.find({"client_id": client_id}, queries.ORDER_SUMMARY_PROJECTION).to_list()
+        ))
+
+    async def get_order_details_by_client(self, client_query: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Gets order details for a client, optionally filtered by status."""
+        client = await self.get_client(client_query)
+        if not client:
+            return []
+        return queries.filter_orders_by_status(await self._client_orders(client["_id"]), status)
+
+    async def get_payment_details_for_order(self, order_id: int) -> Dict[str, Any] | None:
+        """Retrieves payment details for a specific order."""
+        async def load():
+            return queries.format_payment(await get_async_db().payments.find_one({"order_id": order_id}))
+        payment = await memoized_async("payment", order_id, load)
+        return dict(payment) if payment else payment
+
+    async def calculate_pending_dues(self, client_query: str) -> str:
+        """Calculates total pending dues for a client."""
+        client = await self.get_client(client_query)
+        orders = await self._client_orders(client["_id"]) if client else []
+        return queries.pending_dues_message(client_query, client, orders)
+
+    async def list_upcoming_classes(self) -> List[Dict[str, Any]]:
+        """Lists all upcoming services/classes."""
+        return await get_async_db().classes.find(queries.UPCOMING_CLASSES_FILTER, {"_id": 0}).to_list()
+
+    async def filter_classes(self, query: str) -> List[Dict[str, Any]]:
+        """Filters classes by instructor or course."""
+        return await get_async_db().classes.find(queries.filter_classes_query(query), {"_id": 0}).to_list()
+
+
+    @cached_result(["payments"], per_month=True)
+    async def get_total_revenue_this_month(self) -> float:
+        """Calculates total revenue from paid orders this current month."""
+        result = await (await get_async_db().payments.aggregate(queries.revenue_this_month_pipeline())).to_list()
+        return result[0]["total_revenue"] if result else 0.0
+
+    @cached_result(["orders"])
+    async def get_outstanding_payments(self) -> List[Dict[str, Any]]:
+        """Lists orders with pending status and their amounts."""
+        return await get_async_db().orders.find(queries.OUTSTANDING_FILTER, queries.OUTSTANDING_PROJECTION).to_list()
+
+    @cached_result(["clients"])
+    async def get_active_inactive_clients_count(self) -> Dict[str, int]:
+        """Counts active and inactive clients."""
+        active_count, inactive_count = await asyncio.gather(
+            get_async_db().clients.count_documents({"status": "active"}),
+            get_async_db().clients.count_documents({"status": "inactive"}),
+        )
+        return {"active_clients": active_count, "inactive_clients": inactive_count}
+
+    @cached_result(["clients"], per_month=True)
+    async def get_new_clients_this_month(self) -> int:
+        """Counts new clients added this month."""
+        return await get_async_db().clients.count_documents({"created_at": {"$gte": queries.start_of_month()}})
+
+    @cached_result(["orders"])
+    async def get_enrollment_trends(self) -> List[Dict[str, Any]]:
+        """Provides enrollment trends by course."""
+        return await (await get_async_db().orders.aggregate(queries.enrollment_trends_pipeline())).to_list()
+
+    @cached_result(["orders"])
+    async def get_enrollment_series(self, start_date: str, end_date: str, granularity: str = "day",
+                                    course_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Orders per period and course between two dates (YYYY-MM-DD, inclusive), read from the daily rollups."""
+        pipeline = queries.enrollment_series_pipeline(start_date, end_date, granularity, course_name)
+        return await (await get_async_db()[ORDER_ROLLUPS].aggregate(pipeline)).to_list()
+
+    @cached_result(["payments"])
+    async def get_revenue_series(self, start_date: str, end_date: str, granularity: str = "day") -> List[Dict[str, Any]]:
+        """Revenue from completed payments per period between two dates (YYYY-MM-DD, inclusive), read from the daily rollups."""
+        pipeline = queries.revenue_series_pipeline(start_date, end_date, granularity)
+        return await (await get_async_db()[PAYMENT_ROLLUPS].aggregate(pipeline)).to_list()
+
+    @cached_result(["orders"])
+    async def get_top_services(self, limit: int = 3) -> List[Dict[str, Any]]:
+        """Identifies top courses based on enrollment count."""
+        return await (await get_async_db().orders.aggregate(queries.top_services_pipeline(limit))).to_list()
+
+    @cached_result(["orders"])
+    async def get_course_completion_rates(self) -> List[Dict[str, Any]]:
+        """Calculates approximate course completion rates."""
+        return await (await get_async_db().orders.aggregate(queries.completion_rates_pipeline())).to_list()
+
+    @cached_result(["classes", "attendance"])
+    async def get_attendance_percentage_by_class(self, course_name: Optional[str] = None, start_date: Optional[str] = None,
+                                                 end_date: Optional[str] = None, page: int = 1, page_size: int = 100) -> List[Dict[str, Any]]:
+        """Calculates attendance percentage for classes, optionally by course and class date range (YYYY-MM-DD, inclusive)."""
+        pipeline = queries.attendance_pipeline(course_name, start_date, end_date, page, page_size)
+        return await (await get_async_db().classes.aggregate(pipeline)).to_list()
+
+    @cached_result(["clients", "orders", "payments"], per_month=True)
+    async def get_dashboard_snapshot(self, top_limit: int = 3) -> Dict[str, Any]:
+        """
+        Computes every dashboard metric with one $facet aggregation per collection
+        (clients, orders, payments), awaiting the three concurrently.
+        """
+        pipelines = queries.snapshot_pipelines()
+
+        async def facet(collection: str) -> Dict[str, Any]:
+            return (await (await get_async_db()[collection].aggregate(pipelines[collection])).to_list(1))[0]
+
+        clients, orders, payments = await asyncio.gather(facet("clients"), facet("orders"), facet("payments"))
+        return queries.shape_snapshot(clients, orders, payments, top_limit)
@@ -0,0 +1,171 @@
+import re
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, TEXT, UpdateOne
+
+from app.core.config import CLIENT_TEXT_SEARCH_ENABLED
+
+
+logger = logging.getLogger(__name__)
+
+# Client lookups go through normalized copies of name, email and phone that are
+# indexed, instead of case-insensitive regexes over the raw fields. User input is
+# always escaped, so "." or "*" only ever match themselves.
+
+_NAME_TOKEN = re.compile(r"\w+", re.UNICODE)
+_PHONE_CHARS = re.compile(r"^[\d\s()+\-.]+$")
+_MIN_PHONE_DIGITS = 4
+_NATIONAL_PHONE_DIGITS = 10
+
+SEARCH_FIELDS = ("email_norm", "phone_norm", "name_norm", "name_tokens")
+
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+def normalize_phone(phone: str) -> str:
+    return re.sub(r"\D", "", phone or "")
+
+
+def name_tokens(name: str) -> List[str]:
+    return _NAME_TOKEN.findall((name or "").lower())
+
+
+def client_search_fields(name: str, email: str, phone: str) -> Dict[str, Any]:
+    """Normalized lookup fields stored alongside every client document."""
+    tokens = name_tokens(name)
+    return {
+        "email_norm": normalize_email(email),
+        "phone_norm": normalize_phone(phone),
+        "name_norm": " ".join(tokens),
+        "name_tokens": tokens,
+    }
+
+
+def resolution_plan(query: str) -> List[Tuple[Dict[str, Any], Optional[List]]]:
+    """
+    Returns the (filter, sort) lookups to try in order for a client query, cheapest first.
+    Every filter is served by an index: equality or an anchored, case-sensitive prefix
+    regex on a normalized field, or the optional text index.
+    """
+    query = (query or "").strip()
+    plan: List[Tuple[Dict[str, Any], Optional[List]]] = []
+    if not query:
+        return plan
+
+    if "@" in query:
+        email = normalize_email(query)
+        plan.append(({"email_norm": email}, None))
+        plan.append(({"email_norm": {"$regex": f"^{re.escape(email)}"}}, None))
+        return plan
+
+    digits = normalize_phone(query)
+    if _PHONE_CHARS.match(query) and len(digits) >= _MIN_PHONE_DIGITS:
+        plan.append(({"phone_norm": digits}, None))
+        if len(digits) > _NATIONAL_PHONE_DIGITS:
+            # Numbers typed with a country code, e.g. "+91 9999999999".
+            plan.append(({"phone_norm": digits[-_NATIONAL_PHONE_DIGITS:]}, None))
+        plan.append(({"phone_norm": {"$regex": f"^{re.escape(digits)}"}}, None))
+        return plan
+
+    tokens = name_tokens(query)
+    if tokens:
+        plan.append(({"name_norm": " ".join(tokens)}, None))
+        plan.append(({"name_tokens": {"$all": tokens}}, None))
+        plan.append(({"$and": [{"name_tokens": {"$regex": f"^{re.escape(t)}"}} for t in tokens]}, None))
+    if CLIENT_TEXT_SEARCH_ENABLED:
+        plan.append(({"$text": {"$search": query}}, [("score", {"$meta": "textScore"})]))
+    return plan
+
+
+def _text_projection(sort):
+    return {"score": {"$meta": "textScore"}} if sort else None
+
+
+def resolve_client(collection, query: str) -> Optional[Dict[str, Any]]:
+    """Finds the best matching client for a name, email or phone query, or None."""
+    for filter_, sort in resolution_plan(query):
+        client = collection.find_one(filter_, _text_projection(sort), sort=sort)
+        if client:
+            client.pop("score", None)
+            return client
+    return None
+
+
+def _group_by_name_norm(queries) -> Dict[str, List[str]]:
+    by_norm: Dict[str, List[str]] = {}
+    for q in queries:
+        by_norm.setdefault(" ".join(name_tokens(q)), []).append(q)
+    return by_norm
+
+
+def resolve_clients(collection, queries) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Resolves many client queries at once. Exact name matches are fetched in a single
+    $in query; only the remaining queries fall back to one lookup plan each.
+    """
+    queries = set(q for q in queries if q)
+    by_norm = _group_by_name_norm(queries)
+
+    resolved: Dict[str, Optional[Dict[str, Any]]] = {}
+    for client in collection.find({"name_norm": {"$in": list(by_norm)}}):
+        for q in by_norm.get(client.get("name_norm"), []):
+            resolved.setdefault(q, client)
+    for q in queries - resolved.keys():
+        resolved[q] = resolve_client(collection, q)
+    return resolved
+
+
+async def resolve_client_async(collection, query: str) -> Optional[Dict[str, Any]]:
+    """Async version of resolve_client for an AsyncMongoClient collection."""
+    for filter_, sort in resolution_plan(query):
+        client = await collection.find_one(filter_, _text_projection(sort), sort=sort)
+        if client:
+            client.pop("score", None)
+            return client
+    return None
+
+
+async def resolve_clients_async(collection, queries) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Async version of resolve_clients for an AsyncMongoClient collection."""
+    queries = set(q for q in queries if q)
+    by_norm = _group_by_name_norm(queries)
+
+    resolved: Dict[str, Optional[Dict[str, Any]]] = {}
+    async for client in collection.find({"name_norm": {"$in": list(by_norm)}}):
+        for q in by_norm.get(client.get("name_norm"), []):
+            resolved.setdefault(q, client)
+    for q in queries - resolved.keys():
+        resolved[q] = await resolve_client_async(collection, q)
+    return resolved
+
+
+def ensure_client_indexes(db):
+    """Creates the indexes client resolution relies on and backfills documents that predate them."""
+    db.clients.create_index([("email_norm", ASCENDING)], name="email_norm")
+    db.clients.create_index([("phone_norm", ASCENDING)], name="phone_norm")
+    db.clients.create_index([("name_norm", ASCENDING)], name="name_norm")
+    db.clients.create_index([("name_tokens", ASCENDING)], name="name_tokens")
+    if CLIENT_TEXT_SEARCH_ENABLED:
+        db.clients.create_index([("name", TEXT), ("email", TEXT)], name="client_text")
+    backfill_client_search_fields(db)
+
+
+def backfill_client_search_fields(db, batch_size: int = 1000) -> int:
+    """Adds normalized lookup fields to clients that do not have them yet. Returns the number updated."""
+    updated = 0
+    batch = []
+    cursor = db.clients.find({"name_tokens": {"$exists": False}}, {"name": 1, "email": 1, "phone": 1})
+    for client in cursor:
+        fields = client_search_fields(client.get("name"), client.get("email"), client.get("phone"))
+        batch.append(UpdateOne({"_id": client["_id"]}, {"$set": fields}))
+        if len(batch) >= batch_size:
+            updated += db.clients.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += db.clients.bulk_write(batch, ordered=False).modified_count
+    if updated:
+        logger.info(f"Backfilled client search fields on {updated} client(s).")
+    return updated
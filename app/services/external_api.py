@@ -1,52 +1,228 @@
-from app.core.database import db
+import re
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.core.database import get_db
+from app.cache.tool_cache import bump_data_version
+from app.services.run_context import invalidate
+from app.services.client_resolver import client_search_fields, resolve_client, resolve_clients
+from app.services.rollups import record_order, record_orders
+from app.services.id_allocator import id_allocator
 from app.models.common import ClientCreate, OrderCreate
+from app.core.metrics import instrument_tool
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
+# Document builders and validation shared by ExternalAPI and AsyncExternalAPI.
+
+COURSE_COLLATION = {"locale": "en", "strength": 2}
+
+
+def client_document(data: ClientCreate, new_id: int, now: datetime) -> Dict[str, Any]:
+    client_data = data.dict()
+    client_data["_id"] = new_id
+    client_data["status"] = "active"
+    client_data["enrolled_services"] = []
+    client_data["created_at"] = now
+    client_data["dob"] = None
+    client_data.update(client_search_fields(data.name, data.email, data.phone))
+    return client_data
+
+
+def order_document(data: OrderCreate, client: Dict[str, Any], course: Dict[str, Any] | None,
+                   new_id: int, new_order_id: int, now: datetime) -> Dict[str, Any]:
+    order_data = data.dict()
+    order_data["_id"] = new_id
+    order_data["order_id"] = new_order_id
+    order_data["client_id"] = client["_id"]
+    order_data["client_name"] = client["name"]
+    order_data["status"] = "pending"
+    order_data["course"] = course["name"] if course else data.course_name
+    order_data["amount"] = course.get("price", 0) if course else 0
+    order_data["created_at"] = now
+    return order_data
+
+
+def validate_rows(rows: List[Any], model, start_index: int) -> Tuple[List[Dict[str, Any]], List[Tuple[int, Any]]]:
+    """
+    Validates bulk rows against a model. Returns a result slot per row (an error dict, or None
+    for valid rows) and the (index, model) pairs to write.
+    """
+    results: List[Dict[str, Any]] = []
+    valid = []
+    for offset, row in enumerate(rows):
+        index = start_index + offset
+        if isinstance(row, Exception):
+            results.append({"index": index, "status": "error", "error": str(row)})
+            continue
+        try:
+            valid.append((index, model.model_validate(row)))
+            results.append(None)
+        except ValidationError as e:
+            results.append({"index": index, "status": "error", "error": "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())})
+    return results, valid
+
+
+def write_errors(e: BulkWriteError) -> Dict[int, str]:
+    """{position in the batch: error message} for the documents an unordered write rejected."""
+    return {err["index"]: err.get("errmsg", "Write failed.") for err in e.details.get("writeErrors", [])}
+
+
+def enrollment_updates(orders: List[Dict[str, Any]]) -> List[UpdateOne]:
+    enrollments = {(doc["client_id"], doc["course"]) for doc in orders}
+    return [
+        UpdateOne({"_id": client_id}, {"$addToSet": {"enrolled_services": course}})
+        for client_id, course in enrollments
+    ]
+
+
+def course_queries(course_name: str) -> List[Dict[str, Any]]:
+    """Exact name (case-insensitive), then partial name. Input is matched literally."""
+    escaped = re.escape(course_name.strip())
+    return [{"name": {"$regex": f"^{escaped}$", "$options": "i"}}, {"name": {"$regex": escaped, "$options": "i"}}]
+
+
+def courses_by_lower_name(course_names) -> Tuple[Dict[str, List[str]], Dict[str, Any]]:
+    """Groups requested names by their lowercased form and builds the collated exact-match query."""
+    by_lower: Dict[str, List[str]] = {}
+    for name in course_names:
+        by_lower.setdefault(name.strip().lower(), []).append(name)
+    return by_lower, {"name": {"$in": [n.strip() for n in course_names]}}
+
+
+@instrument_tool
 class ExternalAPI:
     def create_client(self, data: ClientCreate) -> Dict[str, Any]:
         """Creates a new client entry. [cite: 32]"""
-        last_client = db.clients.find_one(sort=[("_id", -1)])
-        new_id = (last_client["_id"] + 1) if last_client else 1
-        client_data = data.dict()
-        client_data["_id"] = new_id
-        client_data["status"] = "active"
-        client_data["enrolled_services"] = []
-        client_data["created_at"] = datetime.now() 
-        client_data["dob"] = None 
-        result = db.clients.insert_one(client_data)
+        new_id = id_allocator.allocate("clients")
+        client_data = client_document(data, new_id, datetime.now())
+        result = get_db().clients.insert_one(client_data)
+        bump_data_version("clients")
+        invalidate("client")
         return {"id": str(result.inserted_id), "client_id": new_id, "name": client_data["name"]}
 
+    def bulk_create_clients(self, rows: List[Any], start_index: int = 0) -> List[Dict[str, Any]]:
+        """
+        Creates many clients with one unordered insert_many. Returns one result per row, in order;
+        invalid or rejected rows are reported without stopping the rest.
+        """
+        results, valid = validate_rows(rows, ClientCreate, start_index)
+        if not valid:
+            return results
+
+        now = datetime.now()
+        ids = id_allocator.allocate_many("clients", len(valid))
+        docs = []
+        for (index, data), new_id in zip(valid, ids):
+            docs.append(client_document(data, new_id, now))
+            results[index - start_index] = {"index": index, "status": "created", "client_id": new_id, "name": data.name}
+
+        failed = self._insert_many(get_db().clients, docs)
+        for position, error in failed.items():
+            index = valid[position][0]
+            results[index - start_index] = {"index": index, "status": "error", "error": error}
+        bump_data_version("clients")
+        invalidate("client")
+        return results
+
+    def bulk_create_orders(self, rows: List[Any], start_index: int = 0) -> List[Dict[str, Any]]:
+        """
+        Creates many orders. Clients and courses are resolved once per distinct name, IDs are
+        allocated in blocks, and orders, enrollments and rollups are each written in one bulk call.
+        """
+        results, valid = validate_rows(rows, OrderCreate, start_index)
+        if not valid:
+            return results
+
+        clients = resolve_clients(get_db().clients, [data.client_name for _, data in valid])
+        courses = self._find_courses([data.course_name for _, data in valid])
+
+        placeable = []
+        for index, data in valid:
+            if clients.get(data.client_name):
+                placeable.append((index, data))
+            else:
+                results[index - start_index] = {"index": index, "status": "error", "error": "Client not found. Please create client first."}
+        if not placeable:
+            return results
+
+        now = datetime.now()
+        ids = id_allocator.allocate_many("orders", len(placeable))
+        order_ids = id_allocator.allocate_many("order_number", len(placeable))
+        docs = []
+        for (index, data), new_id, new_order_id in zip(placeable, ids, order_ids):
+            client = clients[data.client_name]
+            order_data = order_document(data, client, courses.get(data.course_name), new_id, new_order_id, now)
+            docs.append(order_data)
+            results[index - start_index] = {"index": index, "status": "created", "order_id": new_order_id, "client_name": client["name"],
+                                            "course": order_data["course"], "amount": order_data["amount"]}
+
+        failed = self._insert_many(get_db().orders, docs)
+        for position, error in failed.items():
+            index = placeable[position][0]
+            results[index - start_index] = {"index": index, "status": "error", "error": error}
+
+        written = [doc for position, doc in enumerate(docs) if position not in failed]
+        if written:
+            get_db().clients.bulk_write(enrollment_updates(written), ordered=False)
+        record_orders(written)
+        bump_data_version("orders", "clients")
+        invalidate("client", "order", "orders")
+        return results
+
+    def _insert_many(self, collection, docs: List[Dict[str, Any]]) -> Dict[int, str]:
+        """Unordered insert; returns {position in docs: error message} for the documents that failed."""
+        try:
+            collection.insert_many(docs, ordered=False)
+            return {}
+        except BulkWriteError as e:
+            return write_errors(e)
+
     def create_order(self, data: OrderCreate) -> Dict[str, Any]:
         """Creates a new order entry. [cite: 33]"""
-        last_order = db.orders.find_one(sort=[("_id", -1)])
-        new_id = (last_order["_id"] + 1) if last_order else 1
-        last_order_id_doc = db.orders.find_one(sort=[("order_id", -1)])
-        new_order_id = (last_order_id_doc["order_id"] + 1) if last_order_id_doc else 12346 
-
         # Find client to link by ID
-        client = db.clients.find_one({"name": {"$regex": data.client_name, "$options": "i"}})
+        client = resolve_client(get_db().clients, data.client_name)
         if not client:
             return {"error": "Client not found. Please create client first."}
 
-        order_data = data.dict()
-        order_data["_id"] = new_id
-        order_data["order_id"] = new_order_id
-        order_data["client_id"] = client["_id"]
-        order_data["status"] = "pending" 
+        new_id = id_allocator.allocate("orders")
+        new_order_id = id_allocator.allocate("order_number")
 
-       
-        course = db.courses.find_one({"name": {"$regex": data.course_name, "$options": "i"}})
-        order_data["amount"] = course.get("price", 0) if course else 0
-        order_data["created_at"] = datetime.now()
+        course = self._find_course(data.course_name)
+        order_data = order_document(data, client, course, new_id, new_order_id, datetime.now())
 
-        result = db.orders.insert_one(order_data)
+        result = get_db().orders.insert_one(order_data)
+        record_order(order_data)
         
       
-        if data.course_name not in client.get("enrolled_services", []):
-            db.clients.update_one(
+        if order_data["course"] not in client.get("enrolled_services", []):
+            get_db().clients.update_one(
                 {"_id": client["_id"]},
-                {"$addToSet": {"enrolled_services": data.course_name}}
+                {"$addToSet": {"enrolled_services": order_data["course"]}}
             )
+        bump_data_version("orders", "clients")
+        invalidate("client", "order", "orders")
+
+        return {"id": str(result.inserted_id), "order_id": new_order_id, "client_name": client["name"], "course": order_data["course"], "status": order_data["status"], "amount": order_data["amount"]}
+
+    def _find_courses(self, course_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Finds courses for many names: exact case-insensitive matches in one query, then per-name fallback."""
+        names = set(course_names)
+        found = {}
+        by_lower, exact_query = courses_by_lower_name(names)
+        for course in get_db().courses.find(exact_query, collation=COURSE_COLLATION):
+            for name in by_lower.get(course["name"].lower(), []):
+                found.setdefault(name, course)
+        for name in names - found.keys():
+            course = self._find_course(name)
+            if course:
+                found[name] = course
+        return found
 
-        return {"id": str(result.inserted_id), "order_id": new_order_id, "client_name": client["name"], "course": data.course_name, "status": order_data["status"], "amount": order_data["amount"]}
\ No newline at end of file
+    def _find_course(self, course_name: str) -> Dict[str, Any] | None:
+        """Finds a course by exact name (case-insensitive), then by partial name. Input is matched literally."""
+        for query in course_queries(course_name):
+            course = get_db().courses.find_one(query)
+            if course:
+                return course
+        return None
\ No newline at end of file
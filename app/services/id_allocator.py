@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from typing import Dict, List, Tuple
+
+from pymongo import DESCENDING, ReturnDocument
+
+from app.core.database import get_db, get_async_db
+from app.core.config import ID_BLOCK_SIZE
+
+
+# Counter name -> (collection, field, floor). The first time a process uses a counter it
+# raises the stored value to the current maximum of that field (never lowering it), so
+# existing documents are never reissued an ID.
+COUNTERS: Dict[str, Tuple[str, str, int]] = {
+    "clients": ("clients", "_id", 0),
+    "orders": ("orders", "_id", 0),
+    "order_number": ("orders", "order_id", 12345),
+}
+
+
+class IdAllocator:
+    """
+    Hands out unique, increasing integer IDs backed by the `counters` collection.
+    Each process reserves a block of IDs with one atomic find_one_and_update($inc),
+    so concurrent writers and gunicorn workers never collide and most allocations
+    need no database round trip. IDs left in a block when a process exits are skipped.
+    """
+
+    def __init__(self, block_size: int = ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks: Dict[str, List[int]] = {}
+        self._seeded = set()
+
+    def allocate(self, name: str) -> int:
+        return self.allocate_many(name, 1)[0]
+
+    def allocate_many(self, name: str, count: int) -> List[int]:
+        """Returns `count` fresh IDs for the named counter."""
+        ids: List[int] = []
+        with self._lock:
+            while len(ids) < count:
+                if not self._take(name, count - len(ids), ids):
+                    size = max(self.block_size, count - len(ids))
+                    self._store_block(name, self._reserve(name, size), size)
+        return ids
+
+    def _take(self, name: str, wanted: int, ids: List[int]) -> bool:
+        block = self._blocks.get(name)
+        if not block or block[0] > block[1]:
+            return False
+        take = min(wanted, block[1] - block[0] + 1)
+        ids.extend(range(block[0], block[0] + take))
+        block[0] += take
+        return True
+
+    def _store_block(self, name: str, last: int, size: int):
+        self._blocks[name] = [last - size + 1, last]
+
+    def _reserve(self, name: str, size: int) -> int:
+        if name not in self._seeded:
+            self._seed(name)
+        counter = get_db().counters.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["seq"]
+
+    def _seed(self, name: str):
+        collection, field, floor = COUNTERS[name]
+        last = get_db()[collection].find_one({field: {"$type": "number"}}, {field: 1}, sort=[(field, DESCENDING)])
+        current = max(last[field], floor) if last else floor
+        get_db().counters.update_one({"_id": name}, {"$max": {"seq": current}}, upsert=True)
+        self._seeded.add(name)
+
+    def reset(self):
+        """Forgets reserved blocks, e.g. after the counters collection was cleared."""
+        with self._lock:
+            self._blocks.clear()
+            self._seeded.clear()
+
+
+class AsyncIdAllocator(IdAllocator):
+    """IdAllocator for code on the event loop; reserves its own blocks through the async client."""
+
+    def __init__(self, block_size: int = ID_BLOCK_SIZE):
+        super().__init__(block_size)
+        self._async_lock = asyncio.Lock()
+
+    async def allocate_async(self, name: str) -> int:
+        return (await self.allocate_many_async(name, 1))[0]
+
+    async def allocate_many_async(self, name: str, count: int) -> List[int]:
+        ids: List[int] = []
+        async with self._async_lock:
+            while len(ids) < count:
+                if not self._take(name, count - len(ids), ids):
+                    size = max(self.block_size, count - len(ids))
+                    self._store_block(name, await self._reserve_async(name, size), size)
+        return ids
+
+    async def _reserve_async(self, name: str, size: int) -> int:
+        if name not in self._seeded:
+            await self._seed_async(name)
+        counter = await get_async_db().counters.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["seq"]
+
+    async def _seed_async(self, name: str):
+        collection, field, floor = COUNTERS[name]
+        last = await get_async_db()[collection].find_one({field: {"$type": "number"}}, {field: 1}, sort=[(field, DESCENDING)])
+        current = max(last[field], floor) if last else floor
+        await get_async_db().counters.update_one({"_id": name}, {"$max": {"seq": current}}, upsert=True)
+        self._seeded.add(name)
+
+
+id_allocator = IdAllocator()
+async_id_allocator = AsyncIdAllocator()
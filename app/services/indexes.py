@@ -0,0 +1,13 @@
+from pymongo import ASCENDING
+from app.core.database import get_db
+from app.services.client_resolver import ensure_client_indexes
+from app.services.rollups import ensure_rollup_indexes
+
+
+def ensure_indexes():
+    """Creates every index the services rely on. Safe to run on each startup."""
+    db = get_db()
+    ensure_client_indexes(db)
+    db.attendance.create_index([("class_id", ASCENDING), ("present", ASCENDING)], name="class_id_present")
+    db.classes.create_index([("date", ASCENDING), ("_id", ASCENDING)], name="date_id")
+    ensure_rollup_indexes()
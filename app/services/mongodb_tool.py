@@ -1,170 +1,144 @@
-from app.core.database import db
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from app.core.database import get_db
+from app.cache.tool_cache import cached_result
+from app.services.run_context import memoized
+from app.services.client_resolver import resolve_client
+from app.services.rollups import ORDER_ROLLUPS, PAYMENT_ROLLUPS
+from app.services import queries
+from app.core.metrics import instrument_tool
 from typing import List, Dict, Any, Optional
 
+
+# Runs the per-collection snapshot aggregations side by side.
+_snapshot_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="snapshot")
+
+
+@instrument_tool
 class MongoDBTool:
     def get_client(self, query: str) -> Dict[str, Any] | None:
-        """Searches for a client by name, email, or phone."""
-        client = db.clients.find_one({
-            "$or": [
-                {"name": {"$regex": query, "$options": "i"}},
-                {"email": {"$regex": query, "$options": "i"}},
-                {"phone": {"$regex": query, "$options": "i"}}
-            ]
-        })
-        if client:
-            if 'dob' in client and isinstance(client['dob'], datetime):
-                client['dob'] = client['dob'].strftime("%Y-%m-%d") 
-        return client
+        """Searches for a client by name, email, or phone. Memoized for the current agent run."""
+        client = memoized("client", query.strip().lower(), lambda: self._find_client(query))
+        return dict(client) if client else client
+
+    def _find_client(self, query: str) -> Dict[str, Any] | None:
+        return queries.format_client(resolve_client(get_db().clients, query))
 
     def get_client_enrolled_services(self, client_query: str) -> List[Dict[str, Any]]:
         """Retrieves enrolled services and their status for a given client query (name, email, or phone)."""
-        client = self.get_client(client_query)
-        if client:
-            return [{"client_name": client.get("name"), "enrolled_services": client.get("enrolled_services", []), "status": client.get("status")}]
-        return []
+        return queries.enrolled_services_result(self.get_client(client_query))
 
     def get_order_status(self, order_id: int) -> str:
         """Fetches status by order ID."""
-        order = db.orders.find_one({"order_id": order_id})
+        order = memoized("order", order_id, lambda: get_db().orders.find_one({"order_id": order_id}, {"status": 1}))
         return order["status"] if order else "Not found"
 
+    def _client_orders(self, client_id: int) -> List[Dict[str, Any]]:
+        """All orders of a client, loaded once per agent run and filtered in memory by callers."""
+        return memoized("orders", client_id, lambda: list(
+            get_db().orders.find({"client_id": client_id}, queries.ORDER_SUMMARY_PROJECTION)
+        ))
+
     def get_order_details_by_client(self, client_query: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
         """Gets order details for a client, optionally filtered by status."""
         client = self.get_client(client_query)
         if not client:
             return []
-
-      
-        query = {"client_id": client["_id"]} 
-    
-        
-        if status:
-            query["status"] = {"$regex": status, "$options": "i"}
-        
-        orders = list(db.orders.find(query, {"_id": 0, "order_id": 1, "course": 1, "status": 1, "amount": 1}))
-        return orders
+        return queries.filter_orders_by_status(self._client_orders(client["_id"]), status)
 
     def get_payment_details_for_order(self, order_id: int) -> Dict[str, Any] | None:
         """Retrieves payment details for a specific order."""
-        payment = db.payments.find_one({"order_id": order_id})
-        if payment:
-            payment['_id'] = str(payment['_id']) 
-            if 'date' in payment and isinstance(payment['date'], datetime):
-                payment['date'] = payment['date'].isoformat()
-        return payment
+        payment = memoized("payment", order_id, lambda: queries.format_payment(get_db().payments.find_one({"order_id": order_id})))
+        return dict(payment) if payment else payment
 
     def calculate_pending_dues(self, client_query: str) -> str:
         """Calculates total pending dues for a client."""
         client = self.get_client(client_query)
-        if not client:
-            return f"Client '{client_query}' not found."
-
-      
-        pending_orders = list(db.orders.find({"client_id": client["_id"], "status": "pending"}))
-
-
-        total_pending = sum(order.get("amount", 0) for order in pending_orders)
-        return f"Client: {client['name']}, Total Pending Dues: ${total_pending:.2f}"
+        orders = self._client_orders(client["_id"]) if client else []
+        return queries.pending_dues_message(client_query, client, orders)
 
     def list_upcoming_classes(self) -> List[Dict[str, Any]]:
         """Lists all upcoming services/classes."""
-        classes = list(db.classes.find({"status": "upcoming"}, {"_id": 0}))
-        return classes
+        return list(get_db().classes.find(queries.UPCOMING_CLASSES_FILTER, {"_id": 0}))
 
     def filter_classes(self, query: str) -> List[Dict[str, Any]]:
         """Filters classes by instructor or course."""
-        classes = list(db.classes.find({
-            "$and": [
-                {"status": {"$regex": "upcoming", "$options": "i"}},
-                {"$or": [
-                    {"instructor": {"$regex": query, "$options": "i"}},
-                    {"course": {"$regex": query, "$options": "i"}}
-                ]}
-            ]
-        }, {"_id": 0}))
-        return classes
+        return list(get_db().classes.find(queries.filter_classes_query(query), {"_id": 0}))
 
 
+    @cached_result(["payments"], per_month=True)
     def get_total_revenue_this_month(self) -> float:
         """Calculates total revenue from paid orders this current month."""
-        start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        pipeline = [
-            {"$match": {"status": "completed", "date": {"$gte": start_of_month}}}, 
-            {"$group": {"_id": None, "total_revenue": {"$sum": "$amount"}}}
-        ]
-        result = list(db.payments.aggregate(pipeline))
+        result = list(get_db().payments.aggregate(queries.revenue_this_month_pipeline()))
         return result[0]["total_revenue"] if result else 0.0
 
+    @cached_result(["orders"])
     def get_outstanding_payments(self) -> List[Dict[str, Any]]:
         """Lists orders with pending status and their amounts."""
-        outstanding = list(db.orders.find({"status": "pending"}, {"_id": 0, "order_id": 1, "client_name": 1, "amount": 1, "course": 1}))
-        return outstanding
+        return list(get_db().orders.find(queries.OUTSTANDING_FILTER, queries.OUTSTANDING_PROJECTION))
 
+    @cached_result(["clients"])
     def get_active_inactive_clients_count(self) -> Dict[str, int]:
         """Counts active and inactive clients."""
-        active_count = db.clients.count_documents({"status": "active"})
-        inactive_count = db.clients.count_documents({"status": "inactive"})
+        active_count = get_db().clients.count_documents({"status": "active"})
+        inactive_count = get_db().clients.count_documents({"status": "inactive"})
         return {"active_clients": active_count, "inactive_clients": inactive_count}
 
+    @cached_result(["clients"], per_month=True)
     def get_new_clients_this_month(self) -> int:
         """Counts new clients added this month."""
-        start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        new_clients_count = db.clients.count_documents({"created_at": {"$gte": start_of_month}})
-        return new_clients_count
+        return get_db().clients.count_documents({"created_at": {"$gte": queries.start_of_month()}})
 
+    @cached_result(["orders"])
     def get_enrollment_trends(self) -> List[Dict[str, Any]]:
         """Provides enrollment trends by course."""
-        pipeline = [
-            {"$group": {"_id": "$course", "enrollment_count": {"$sum": 1}}},
-            {"$sort": {"enrollment_count": -1}}
-        ]
-        trends = list(db.orders.aggregate(pipeline))
-        return trends
-
+        return list(get_db().orders.aggregate(queries.enrollment_trends_pipeline()))
+
+    @cached_result(["orders"])
+    def get_enrollment_series(self, start_date: str, end_date: str, granularity: str = "day",
+                              course_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Orders per period and course between two dates (YYYY-MM-DD, inclusive), read from the daily rollups.
+        Granularity is one of day, week, month, quarter or year.
+        """
+        return list(get_db()[ORDER_ROLLUPS].aggregate(queries.enrollment_series_pipeline(start_date, end_date, granularity, course_name)))
+
+    @cached_result(["payments"])
+    def get_revenue_series(self, start_date: str, end_date: str, granularity: str = "day") -> List[Dict[str, Any]]:
+        """
+        Revenue from completed payments per period between two dates (YYYY-MM-DD, inclusive), read from the daily rollups.
+        Granularity is one of day, week, month, quarter or year.
+        """
+        return list(get_db()[PAYMENT_ROLLUPS].aggregate(queries.revenue_series_pipeline(start_date, end_date, granularity)))
+
+    @cached_result(["orders"])
     def get_top_services(self, limit: int = 3) -> List[Dict[str, Any]]:
         """Identifies top courses based on enrollment count."""
-        pipeline = [
-            {"$group": {"_id": "$course", "enrollment_count": {"$sum": 1}}},
-            {"$sort": {"enrollment_count": -1}},
-            {"$limit": limit}
-        ]
-        top_services = list(db.orders.aggregate(pipeline))
-        return top_services
+        return list(get_db().orders.aggregate(queries.top_services_pipeline(limit)))
 
+    @cached_result(["orders"])
     def get_course_completion_rates(self) -> List[Dict[str, Any]]:
         """Calculates approximate course completion rates (requires 'completed' status in orders or specific attendance for a course)."""
-        pipeline = [
-            {"$group": {"_id": "$course",
-                                "total_orders": {"$sum": 1},
-                                "completed_orders": {"$sum": {"$cond": [{"$eq": ["$status", "paid"]}, 1, 0]}} # Using 'paid' as proxy
-                               }},
-            {"$project": {"_id": 0, "course": "$_id",
-                                "completion_rate": {"$cond": [{"$eq": ["$total_orders", 0]}, 0, {"$multiply": [{"$divide": ["$completed_orders", "$total_orders"]}, 100]}]}}}
+        return list(get_db().orders.aggregate(queries.completion_rates_pipeline()))
+
+    @cached_result(["classes", "attendance"])
+    def get_attendance_percentage_by_class(self, course_name: Optional[str] = None, start_date: Optional[str] = None,
+                                           end_date: Optional[str] = None, page: int = 1, page_size: int = 100) -> List[Dict[str, Any]]:
+        """
+        Calculates attendance percentage for classes, optionally by course and class date range (YYYY-MM-DD, inclusive).
+        Runs as a single aggregation: one page of classes, each joined to its attendance counts via the attendance.class_id index.
+        """
+        return list(get_db().classes.aggregate(queries.attendance_pipeline(course_name, start_date, end_date, page, page_size)))
+
+    @cached_result(["clients", "orders", "payments"], per_month=True)
+    def get_dashboard_snapshot(self, top_limit: int = 3) -> Dict[str, Any]:
+        """
+        Computes every dashboard metric with one $facet aggregation per collection
+        (clients, orders, payments), running the three concurrently.
+        """
+        pipelines = queries.snapshot_pipelines()
+        futures = [
+            _snapshot_executor.submit(lambda c=c: next(get_db()[c].aggregate(pipelines[c])))
+            for c in ("clients", "orders", "payments")
         ]
-        completion_rates = list(db.orders.aggregate(pipeline))
-        return completion_rates
-
-    def get_attendance_percentage_by_class(self, course_name: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Calculates attendance percentage for classes, optionally by course."""
-        query = {}
-        if course_name:
-            query["course"] = {"$regex": course_name, "$options": "i"}
-
-        classes = list(db.classes.find(query))
-        attendance_reports = []
-
-        for cls in classes:
-            
-            total_attended = db.attendance.count_documents({"class_id": cls["_id"], "present": True})
-            total_students_enrolled_in_class = db.attendance.count_documents({"class_id": cls["_id"]}) 
-            
-            percentage = (total_attended / total_students_enrolled_in_class * 100) if total_students_enrolled_in_class > 0 else 0
-            attendance_reports.append({
-                "class_id": str(cls["_id"]), 
-                "course": cls.get("course", "N/A"),
-                "instructor": cls.get("instructor", "N/A"),
-                "date": cls.get("date", "N/A"),
-                "attendance_percentage": round(percentage, 2)
-            })
-        return attendance_reports
\ No newline at end of file
+        clients, orders, payments = (f.result() for f in futures)
+        return queries.shape_snapshot(clients, orders, payments, top_limit)
\ No newline at end of file
@@ -0,0 +1,231 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.services.rollups import parse_range, period_key
+
+
+# Query, pipeline and result-shaping helpers shared by MongoDBTool and AsyncMongoDBTool,
+# so the sync and async data access paths always run the same queries.
+
+ORDER_SUMMARY_PROJECTION = {"_id": 0, "order_id": 1, "course": 1, "status": 1, "amount": 1}
+OUTSTANDING_FILTER = {"status": "pending"}
+OUTSTANDING_PROJECTION = {"_id": 0, "order_id": 1, "client_name": 1, "amount": 1, "course": 1}
+UPCOMING_CLASSES_FILTER = {"status": "upcoming"}
+
+
+def start_of_month() -> datetime:
+    return datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def format_client(client: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if client:
+        if 'dob' in client and isinstance(client['dob'], datetime):
+            client['dob'] = client['dob'].strftime("%Y-%m-%d") 
+    return client
+
+
+def format_payment(payment: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if payment:
+        payment['_id'] = str(payment['_id']) 
+        if 'date' in payment and isinstance(payment['date'], datetime):
+            payment['date'] = payment['date'].isoformat()
+    return payment
+
+
+def enrolled_services_result(client: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if client:
+        return [{"client_name": client.get("name"), "enrolled_services": client.get("enrolled_services", []), "status": client.get("status")}]
+    return []
+
+
+def filter_orders_by_status(orders: List[Dict[str, Any]], status: Optional[str]) -> List[Dict[str, Any]]:
+    if status:
+        orders = [o for o in orders if re.search(status, o.get("status", ""), re.IGNORECASE)]
+    return [dict(o) for o in orders]
+
+
+def pending_dues_message(client_query: str, client: Optional[Dict[str, Any]], orders: List[Dict[str, Any]]) -> str:
+    if not client:
+        return f"Client '{client_query}' not found."
+    total_pending = sum(order.get("amount", 0) for order in orders if order.get("status") == "pending")
+    return f"Client: {client['name']}, Total Pending Dues: ${total_pending:.2f}"
+
+
+def filter_classes_query(query: str) -> Dict[str, Any]:
+    return {
+        "$and": [
+            {"status": {"$regex": "upcoming", "$options": "i"}},
+            {"$or": [
+                {"instructor": {"$regex": query, "$options": "i"}},
+                {"course": {"$regex": query, "$options": "i"}}
+            ]}
+        ]
+    }
+
+
+def revenue_this_month_pipeline() -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"status": "completed", "date": {"$gte": start_of_month()}}}, 
+        {"$group": {"_id": None, "total_revenue": {"$sum": "$amount"}}}
+    ]
+
+
+def enrollment_trends_pipeline() -> List[Dict[str, Any]]:
+    return [
+        {"$group": {"_id": "$course", "enrollment_count": {"$sum": 1}}},
+        {"$sort": {"enrollment_count": -1}}
+    ]
+
+
+def top_services_pipeline(limit: int) -> List[Dict[str, Any]]:
+    return enrollment_trends_pipeline() + [{"$limit": limit}]
+
+
+def completion_rates_pipeline() -> List[Dict[str, Any]]:
+    return [
+        {"$group": {"_id": "$course",
+                            "total_orders": {"$sum": 1},
+                            "completed_orders": {"$sum": {"$cond": [{"$eq": ["$status", "paid"]}, 1, 0]}} # Using 'paid' as proxy
+                           }},
+        {"$project": {"_id": 0, "course": "$_id",
+                            "completion_rate": {"$cond": [{"$eq": ["$total_orders", 0]}, 0, {"$multiply": [{"$divide": ["$completed_orders", "$total_orders"]}, 100]}]}}}
+    ]
+
+
+def enrollment_series_pipeline(start_date: str, end_date: str, granularity: str, course_name: Optional[str]) -> List[Dict[str, Any]]:
+    start, end = parse_range(start_date, end_date)
+    match = {"day": {"$gte": start, "$lt": end}}
+    if course_name:
+        match["course"] = {"$regex": re.escape(course_name), "$options": "i"}
+    return [
+        {"$match": match},
+        {"$group": {"_id": {"period": period_key(granularity), "course": "$course"},
+                    "orders": {"$sum": "$orders"}, "amount": {"$sum": "$amount"}}},
+        {"$sort": {"_id.period": 1, "orders": -1}},
+        {"$project": {"_id": 0, "period": {"$dateToString": {"format": "%Y-%m-%d", "date": "$_id.period"}},
+                      "course": "$_id.course", "orders": 1, "amount": 1}}
+    ]
+
+
+def revenue_series_pipeline(start_date: str, end_date: str, granularity: str) -> List[Dict[str, Any]]:
+    start, end = parse_range(start_date, end_date)
+    return [
+        {"$match": {"day": {"$gte": start, "$lt": end}, "status": "completed"}},
+        {"$group": {"_id": period_key(granularity), "revenue": {"$sum": "$amount"}, "payments": {"$sum": "$payments"}}},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "period": {"$dateToString": {"format": "%Y-%m-%d", "date": "$_id"}},
+                      "revenue": 1, "payments": 1}}
+    ]
+
+
+def attendance_pipeline(course_name: Optional[str], start_date: Optional[str], end_date: Optional[str],
+                        page: int, page_size: int) -> List[Dict[str, Any]]:
+    """One page of classes, each joined to its attendance counts via the attendance.class_id index."""
+    query = {}
+    if course_name:
+        query["course"] = {"$regex": re.escape(course_name), "$options": "i"}
+    if start_date or end_date:
+        query["date"] = {}
+        if start_date:
+            query["date"]["$gte"] = start_date
+        if end_date:
+            query["date"]["$lte"] = end_date
+
+    page = max(page, 1)
+    page_size = max(page_size, 1)
+    return [
+        {"$match": query},
+        {"$sort": {"date": 1, "_id": 1}},
+        {"$skip": (page - 1) * page_size},
+        {"$limit": page_size},
+        {"$lookup": {
+            "from": "attendance",
+            "localField": "_id",
+            "foreignField": "class_id",
+            "pipeline": [
+                {"$group": {"_id": None,
+                            "total": {"$sum": 1},
+                            "present": {"$sum": {"$cond": [{"$eq": ["$present", True]}, 1, 0]}}}}
+            ],
+            "as": "attendance"
+        }},
+        {"$set": {"attendance": {"$ifNull": [{"$first": "$attendance"}, {"total": 0, "present": 0}]}}},
+        {"$project": {
+            "_id": 0,
+            "class_id": {"$toString": "$_id"},
+            "course": {"$ifNull": ["$course", "N/A"]},
+            "instructor": {"$ifNull": ["$instructor", "N/A"]},
+            "date": {"$ifNull": ["$date", "N/A"]},
+            "attendance_percentage": {"$cond": [
+                {"$gt": ["$attendance.total", 0]},
+                {"$round": [{"$multiply": [{"$divide": ["$attendance.present", "$attendance.total"]}, 100]}, 2]},
+                0
+            ]}
+        }}
+    ]
+
+
+def snapshot_pipelines() -> Dict[str, List[Dict[str, Any]]]:
+    """One $facet pipeline per collection covering every dashboard metric."""
+    month_start = start_of_month()
+    return {
+        "clients": [{"$facet": {
+            "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "new_this_month": [{"$match": {"created_at": {"$gte": month_start}}}, {"$count": "count"}],
+        }}],
+        "orders": [{"$facet": {
+            "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}, "amount": {"$sum": "$amount"}}}],
+            "by_course": [
+                {"$group": {"_id": "$course",
+                            "enrollment_count": {"$sum": 1},
+                            "completed_orders": {"$sum": {"$cond": [{"$eq": ["$status", "paid"]}, 1, 0]}}}},
+                {"$sort": {"enrollment_count": -1}}
+            ],
+        }}],
+        "payments": [{"$facet": {
+            "this_month": [
+                {"$match": {"status": "completed", "date": {"$gte": month_start}}},
+                {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+            ],
+            "all_time": [
+                {"$match": {"status": "completed"}},
+                {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+            ],
+        }}],
+    }
+
+
+def shape_snapshot(clients: Dict[str, Any], orders: Dict[str, Any], payments: Dict[str, Any], top_limit: int) -> Dict[str, Any]:
+    """Turns the three $facet results into the dashboard snapshot document."""
+    client_status = {row["_id"]: row["count"] for row in clients["by_status"]}
+    order_status = {row["_id"]: row for row in orders["by_status"]}
+    pending = order_status.get("pending", {})
+    trends = [{"_id": row["_id"], "enrollment_count": row["enrollment_count"]} for row in orders["by_course"]]
+
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "clients": {
+            "active_clients": client_status.get("active", 0),
+            "inactive_clients": client_status.get("inactive", 0),
+            "total_clients": sum(client_status.values()),
+            "new_clients_this_month": clients["new_this_month"][0]["count"] if clients["new_this_month"] else 0,
+        },
+        "orders": {
+            "total_orders": sum(row["count"] for row in orders["by_status"]),
+            "by_status": {str(k): v["count"] for k, v in order_status.items()},
+            "outstanding_count": pending.get("count", 0),
+            "outstanding_amount": pending.get("amount", 0),
+        },
+        "revenue": {
+            "this_month": payments["this_month"][0]["total"] if payments["this_month"] else 0.0,
+            "all_time": payments["all_time"][0]["total"] if payments["all_time"] else 0.0,
+        },
+        "enrollment_trends": trends,
+        "top_services": trends[:top_limit],
+        "course_completion_rates": [
+            {"course": row["_id"],
+             "completion_rate": row["completed_orders"] / row["enrollment_count"] * 100 if row["enrollment_count"] else 0}
+            for row in orders["by_course"]
+        ],
+    }
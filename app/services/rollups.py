@@ -0,0 +1,142 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+
+from app.cache.tool_cache import bump_data_version
+from app.core.database import get_db, get_async_db
+
+
+logger = logging.getLogger(__name__)
+
+# Daily counters kept up to date on every write, so time-series analytics read a
+# few hundred rollup documents instead of regrouping all orders and payments.
+ORDER_ROLLUPS = "order_rollups_daily"
+PAYMENT_ROLLUPS = "payment_rollups_daily"
+
+GRANULARITIES = ("day", "week", "month", "quarter", "year")
+
+
+def _day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def order_rollup_update(order: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Returns the (filter, update) that counts one new order in its day/course/status bucket."""
+    day = _day(order.get("created_at") or datetime.now())
+    course = order.get("course") or ""
+    status = order.get("status") or ""
+    return (
+        {"_id": f"{day:%Y-%m-%d}|{course}|{status}"},
+        {"$inc": {"orders": 1, "amount": order.get("amount", 0)},
+         "$setOnInsert": {"day": day, "course": course, "status": status}},
+    )
+
+
+def payment_rollup_update(payment: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Returns the (filter, update) that counts one payment in its day/status bucket."""
+    day = _day(payment.get("date") or datetime.now())
+    status = payment.get("status") or ""
+    return (
+        {"_id": f"{day:%Y-%m-%d}|{status}"},
+        {"$inc": {"payments": 1, "amount": payment.get("amount", 0)},
+         "$setOnInsert": {"day": day, "status": status}},
+    )
+
+
+def record_order(order: Dict[str, Any]):
+    """Adds a newly written order to the daily rollups."""
+    filter_, update = order_rollup_update(order)
+    get_db()[ORDER_ROLLUPS].update_one(filter_, update, upsert=True)
+
+
+def _order_rollup_requests(orders: List[Dict[str, Any]]) -> List[UpdateOne]:
+    """One upsert per touched bucket for a batch of new orders."""
+    buckets: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+    for order in orders:
+        filter_, update = order_rollup_update(order)
+        existing = buckets.get(filter_["_id"])
+        if existing:
+            existing[1]["$inc"]["orders"] += 1
+            existing[1]["$inc"]["amount"] += update["$inc"]["amount"]
+        else:
+            buckets[filter_["_id"]] = (filter_, update)
+    return [UpdateOne(f, u, upsert=True) for f, u in buckets.values()]
+
+
+def record_orders(orders: List[Dict[str, Any]]):
+    """Adds many new orders to the daily rollups with one upsert per touched bucket."""
+    requests = _order_rollup_requests(orders)
+    if requests:
+        get_db()[ORDER_ROLLUPS].bulk_write(requests, ordered=False)
+
+
+async def record_order_async(order: Dict[str, Any]):
+    """Async version of record_order."""
+    filter_, update = order_rollup_update(order)
+    await get_async_db()[ORDER_ROLLUPS].update_one(filter_, update, upsert=True)
+
+
+async def record_orders_async(orders: List[Dict[str, Any]]):
+    """Async version of record_orders."""
+    requests = _order_rollup_requests(orders)
+    if requests:
+        await get_async_db()[ORDER_ROLLUPS].bulk_write(requests, ordered=False)
+
+
+def ensure_rollup_indexes():
+    get_db()[ORDER_ROLLUPS].create_index([("day", ASCENDING), ("course", ASCENDING)], name="day_course")
+    get_db()[PAYMENT_ROLLUPS].create_index([("day", ASCENDING), ("status", ASCENDING)], name="day_status")
+
+
+def rebuild_rollups():
+    """
+    Recomputes both rollup collections from orders and payments in one server-side pass each.
+    Use after bulk imports or to backfill history; $out swaps the new data in atomically.
+    Run it with order writes stopped (as seed does): $out replaces the collections wholesale,
+    so a record_order[s] made while the aggregation runs is silently lost from the rollups.
+    """
+    day_key = lambda field: {"$dateTrunc": {"date": field, "unit": "day"}}
+    day_str = {"$dateToString": {"format": "%Y-%m-%d", "date": "$_id.day"}}
+
+    get_db().orders.aggregate([
+        {"$match": {"created_at": {"$type": "date"}}},
+        {"$group": {"_id": {"day": day_key("$created_at"), "course": {"$ifNull": ["$course", ""]}, "status": {"$ifNull": ["$status", ""]}},
+                    "orders": {"$sum": 1}, "amount": {"$sum": "$amount"}}},
+        {"$project": {"_id": {"$concat": [day_str, "|", "$_id.course", "|", "$_id.status"]},
+                      "day": "$_id.day", "course": "$_id.course", "status": "$_id.status", "orders": 1, "amount": 1}},
+        {"$out": ORDER_ROLLUPS},
+    ])
+    get_db().payments.aggregate([
+        {"$match": {"date": {"$type": "date"}}},
+        {"$group": {"_id": {"day": day_key("$date"), "status": {"$ifNull": ["$status", ""]}},
+                    "payments": {"$sum": 1}, "amount": {"$sum": "$amount"}}},
+        {"$project": {"_id": {"$concat": [day_str, "|", "$_id.status"]},
+                      "day": "$_id.day", "status": "$_id.status", "payments": 1, "amount": 1}},
+        {"$out": PAYMENT_ROLLUPS},
+    ])
+    ensure_rollup_indexes()
+    # The enrollment and revenue series tools read the rollups, cached under these collections' versions.
+    bump_data_version("orders", "payments")
+    logger.info("Rebuilt order and payment rollups.")
+
+
+def parse_range(start_date: str, end_date: str) -> Tuple[datetime, datetime]:
+    """Parses an inclusive YYYY-MM-DD range into [start, end) datetimes."""
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    if end <= start:
+        raise ValueError("end_date must not be before start_date.")
+    return start, end
+
+
+def period_key(granularity: str) -> Dict[str, Any]:
+    """$dateTrunc expression that buckets a rollup's day into the requested granularity."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}.")
+    return {"$dateTrunc": {"date": "$day", "unit": granularity, "startOfWeek": "monday"}}
+
+
+if __name__ == "__main__":
+    rebuild_rollups()
@@ -0,0 +1,105 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+_MISSING = object()
+
+_counters_lock = threading.Lock()
+_counters = {"runs": 0, "hits": 0, "misses": 0}
+
+
+class RunContext:
+    """
+    Memo table shared by every tool call made during one agent run.
+    Lookups are grouped by namespace ("client", "orders", ...) so writes can drop just the affected ones.
+    Also counts those writes, so a run that changed data is not blindly repeated.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Dict[Hashable, Any]] = {}
+        self.writes = 0
+
+    def memoize(self, namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        values = self._values.setdefault(namespace, {})
+        value = values.get(key, _MISSING)
+        if value is not _MISSING:
+            _count("hits")
+            return value
+        _count("misses")
+        value = loader()
+        values[key] = value
+        return value
+
+    async def memoize_async(self, namespace: str, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        values = self._values.setdefault(namespace, {})
+        value = values.get(key, _MISSING)
+        if value is not _MISSING:
+            _count("hits")
+            return value
+        _count("misses")
+        value = await loader()
+        values[key] = value
+        return value
+
+    def invalidate(self, *namespaces: str):
+        self.writes += 1
+        for namespace in namespaces:
+            self._values.pop(namespace, None)
+
+
+_current_run: ContextVar[Optional[RunContext]] = ContextVar("agent_run_context", default=None)
+
+
+def _count(name: str):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+@contextmanager
+def agent_run():
+    """Scopes a fresh RunContext to the enclosed agent run (one crew.kickoff)."""
+    _count("runs")
+    token = _current_run.set(RunContext())
+    try:
+        yield
+    finally:
+        _current_run.reset(token)
+
+
+def memoized(namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+    """
+    Returns the value memoized for the current agent run, loading it on first use.
+    Outside an agent run this simply calls the loader.
+    """
+    ctx = _current_run.get()
+    if ctx is None:
+        return loader()
+    return ctx.memoize(namespace, key, loader)
+
+
+async def memoized_async(namespace: str, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """Async version of memoized; `loader` returns an awaitable."""
+    ctx = _current_run.get()
+    if ctx is None:
+        return await loader()
+    return await ctx.memoize_async(namespace, key, loader)
+
+
+def invalidate(*namespaces: str):
+    """Called by every writer: drops memoized lookups in the given namespaces for the current agent run."""
+    ctx = _current_run.get()
+    if ctx is not None:
+        ctx.invalidate(*namespaces)
+
+
+def wrote_data() -> bool:
+    """Whether the current agent run has written anything (created a client, an order, ...)."""
+    ctx = _current_run.get()
+    return ctx is not None and ctx.writes > 0
+
+
+def run_context_stats() -> Dict[str, int]:
+    with _counters_lock:
+        return dict(_counters)
@@ -3,13 +3,17 @@ from typing import Optional
 from app.services.mongodb_tool import MongoDBTool
 
 @tool("Get Attendance Percentage By Class")
-def get_attendance_percentage_by_class_tool(course_name: Optional[str] = None) -> dict:
+def get_attendance_percentage_by_class_tool(course_name: Optional[str] = None, start_date: Optional[str] = None,
+                                            end_date: Optional[str] = None, page: Optional[int] = 1) -> dict:
     """
     Useful for calculating the attendance percentage for specific classes or all classes.
-    Optionally filtered by course name.
+    Optionally filtered by course name and by class date range.
     If 'course_name' is provided, returns attendance percentage for classes within that course.
     If 'course_name' is omitted, returns attendance percentage for all classes.
+    'start_date' and 'end_date' (YYYY-MM-DD, inclusive) limit the report to classes held in that range.
+    Results are paged 100 classes at a time; pass 'page' (starting at 1) to get further classes.
     Returns a dictionary of attendance percentages for each class.
     """
  
-    return MongoDBTool().get_attendance_percentage_by_class(course_name=course_name)
\ No newline at end of file
+    return MongoDBTool().get_attendance_percentage_by_class(course_name=course_name, start_date=start_date,
+                                                            end_date=end_date, page=page or 1)
\ No newline at end of file
@@ -0,0 +1,17 @@
+from crewai.tools import tool
+from typing import Optional
+from app.services.mongodb_tool import MongoDBTool
+
+@tool("Get Enrollment Time Series")
+def get_enrollment_series_tool(start_date: str, end_date: str, granularity: Optional[str] = "day",
+                               course_name: Optional[str] = None) -> list:
+    """
+    Useful for enrollment (order) counts over an arbitrary date range, broken down by period and course
+    (e.g., 'Weekly Yoga enrollments in June' or 'Enrollments per month this year').
+    'start_date' and 'end_date' are inclusive dates in YYYY-MM-DD format.
+    'granularity' is one of 'day', 'week', 'month', 'quarter' or 'year'; it defaults to 'day'.
+    Optionally pass 'course_name' to limit the series to one course.
+    Returns a list of periods with the number of orders and order amount per course.
+    """
+
+    return MongoDBTool().get_enrollment_series(start_date, end_date, granularity=granularity or "day", course_name=course_name)
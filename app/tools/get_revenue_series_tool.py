@@ -0,0 +1,15 @@
+from crewai.tools import tool
+from typing import Optional
+from app.services.mongodb_tool import MongoDBTool
+
+@tool("Get Revenue Time Series")
+def get_revenue_series_tool(start_date: str, end_date: str, granularity: Optional[str] = "day") -> list:
+    """
+    Useful for revenue over an arbitrary date range, broken down by period
+    (e.g., 'Revenue by week for Q2' or 'Monthly revenue this year').
+    'start_date' and 'end_date' are inclusive dates in YYYY-MM-DD format.
+    'granularity' is one of 'day', 'week', 'month', 'quarter' or 'year'; it defaults to 'day'.
+    Returns a list of periods with their revenue and number of completed payments.
+    """
+
+    return MongoDBTool().get_revenue_series(start_date, end_date, granularity=granularity or "day")
@@ -0,0 +1,100 @@
+"""Deterministic dataset for the benchmarks, shaped like app/data/seed.py but sized by the caller."""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from app.cache.tool_cache import bump_data_version
+from app.core.database import get_db
+from app.services.client_resolver import backfill_client_search_fields
+from app.services.id_allocator import async_id_allocator, id_allocator
+from app.services.rollups import ORDER_ROLLUPS, PAYMENT_ROLLUPS, payment_rollup_update, record_orders
+
+FIRST_NAMES = ["Priya", "Rahul", "Amit", "Neha", "Sita", "Arjun", "Kavya", "Vikram", "Anjali", "Rohan",
+               "Meera", "Karan", "Divya", "Sanjay", "Pooja", "Nikhil", "Isha", "Aditya", "Tara", "Dev"]
+LAST_NAMES = ["Sharma", "Singh", "Kumar", "Reddy", "Devi", "Patel", "Iyer", "Gupta", "Nair", "Mehta"]
+COURSES = [
+    {"_id": 101, "name": "Yoga Beginner", "description": "Introduction to Yoga", "price": 100},
+    {"_id": 102, "name": "Pilates Advanced", "description": "Advanced Pilates techniques", "price": 150},
+    {"_id": 103, "name": "Zumba Basics", "description": "Fun cardio dance", "price": 80},
+    {"_id": 104, "name": "Meditation Fundamentals", "description": "Learn basic meditation techniques", "price": 70},
+]
+INSTRUCTORS = ["Anjali", "Deepa", "Ravi", "Kiran"]
+
+
+def client_name(index: int) -> str:
+    """Name of the client with _id index + 1; unique for the first 200 clients."""
+    return f"{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+
+
+def build(clients: int, seed: int = 42) -> Dict[str, List[Dict[str, Any]]]:
+    """Clients with 0-4 orders each, payments for the paid orders, past and upcoming classes with attendance."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    data: Dict[str, List[Dict[str, Any]]] = {
+        "clients": [], "courses": [dict(c) for c in COURSES], "classes": [], "orders": [], "payments": [], "attendance": [],
+    }
+
+    for i in range(clients):
+        name = client_name(i)
+        data["clients"].append({
+            "_id": i + 1, "name": name, "email": f"{name.lower().replace(' ', '.')}{i}@example.com",
+            "phone": f"9{i:09d}", "status": "active" if rng.random() < 0.8 else "inactive",
+            "enrolled_services": rng.sample([c["name"] for c in COURSES], rng.randint(0, 2)),
+            "created_at": now - timedelta(days=rng.randint(0, 365)), "dob": datetime(1980 + rng.randint(0, 25), rng.randint(1, 12), rng.randint(1, 28)),
+        })
+
+    for client in data["clients"]:
+        for _ in range(rng.randint(0, 4)):
+            course = rng.choice(COURSES)
+            order_id = 12345 + len(data["orders"])
+            status = "paid" if rng.random() < 0.6 else "pending"
+            created_at = now - timedelta(days=rng.randint(0, 120), hours=rng.randint(0, 23))
+            data["orders"].append({
+                "_id": len(data["orders"]) + 1, "order_id": order_id, "client_id": client["_id"], "client_name": client["name"],
+                "course": course["name"], "status": status, "amount": course["price"], "created_at": created_at,
+            })
+            if status == "paid":
+                data["payments"].append({
+                    "_id": len(data["payments"]) + 1, "order_id": order_id, "amount": course["price"],
+                    "date": created_at + timedelta(days=1), "status": "completed",
+                })
+
+    for i in range(max(10, clients // 5)):
+        course = COURSES[i % len(COURSES)]
+        day = today + timedelta(days=rng.randint(-60, 30))
+        past = day < today
+        data["classes"].append({
+            "_id": 201 + i, "course": course["name"], "instructor": rng.choice(INSTRUCTORS),
+            "status": "completed" if past else "upcoming", "date": day.strftime("%Y-%m-%d"),
+            "time": rng.choice(["07:00 AM", "10:00 AM", "05:00 PM", "06:00 PM"]),
+        })
+        if past:
+            for client in rng.sample(data["clients"], min(len(data["clients"]), rng.randint(3, 12))):
+                data["attendance"].append({
+                    "_id": len(data["attendance"]) + 1, "class_id": 201 + i, "course": course["name"],
+                    "date": day.strftime("%Y-%m-%d"), "client_id": client["_id"], "client_name": client["name"],
+                    "present": rng.random() < 0.75,
+                })
+    return data
+
+
+def load(clients: int, seed: int = 42) -> Dict[str, int]:
+    """Replaces the database contents with build(clients, seed) and rebuilds everything derived from it."""
+    db = get_db()
+    data = build(clients, seed)
+    for name in ("counters", ORDER_ROLLUPS, PAYMENT_ROLLUPS):
+        db[name].delete_many({})
+    for name, docs in data.items():
+        db[name].delete_many({})
+        if docs:
+            db[name].insert_many(docs)
+    id_allocator.reset()
+    async_id_allocator.reset()
+    backfill_client_search_fields(db)
+    # The incremental rollup writers rather than rebuild_rollups(): mongomock has no $dateTrunc.
+    record_orders(data["orders"])
+    for payment in data["payments"]:
+        db[PAYMENT_ROLLUPS].update_one(*payment_rollup_update(payment), upsert=True)
+    bump_data_version(*data)
+    return {name: len(docs) for name, docs in data.items()}
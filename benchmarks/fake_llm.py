@@ -0,0 +1,138 @@
+"""
+Deterministic stand-in for the LLM provider. Registered with LiteLLM as the "bench" provider,
+so the agents run their real CrewAI loop (ReAct prompt, tool call, observation, final answer)
+while every completion is scripted and takes a configurable, fixed time.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import litellm
+from litellm import CustomLLM
+from litellm.types.utils import ModelResponse, Usage
+
+PROVIDER = "bench"
+
+_CLIENT = r"(?:for|of|does|has|is)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)"
+
+# (pattern on the user's question, tool name as CrewAI shows it, tool input built from the match).
+# The first pattern whose tool the agent has wins; questions matching none are answered directly.
+# CrewAI validates tool inputs without the functions' defaults, so optional arguments are passed too.
+SCRIPT: List[Tuple[str, str, Callable[[re.Match], Dict[str, Any]]]] = [
+    (r"payment.*order\s*#?(\d{4,})", "Get Payment Details For Order", lambda m: {"order_id": int(m.group(1))}),
+    (r"order\s*#?(\d{4,})", "Get Order Status", lambda m: {"order_id": int(m.group(1))}),
+    (r"(?:dues|owe).*?" + _CLIENT, "Calculate Pending Dues", lambda m: {"client_query": m.group(1)}),
+    (r"(?:enrolled|services).*?" + _CLIENT, "Get Client Enrolled Services", lambda m: {"client_query": m.group(1)}),
+    (r"orders.*?" + _CLIENT, "Get Order Details By Client", lambda m: {"client_query": m.group(1), "status": None}),
+    (r"(?:details|email|phone|contact).*?" + _CLIENT, "Get Client Details", lambda m: {"query": m.group(1)}),
+    (r"(?:classes|sessions).*?(yoga|pilates|zumba|meditation)", "Filter Upcoming Classes", lambda m: {"query": m.group(1)}),
+    (r"upcoming classes|schedule", "List Upcoming Classes", lambda m: {}),
+    (r"revenue", "Get Total Revenue This Month", lambda m: {}),
+    (r"outstanding|unpaid", "Get Outstanding Payments", lambda m: {}),
+    (r"top\s*(\d*)\s*services|popular", "Get Top Services", lambda m: {"limit": int(m.group(1) or 3)}),
+    (r"new clients", "Get New Clients This Month", lambda m: {}),
+    (r"active", "Get Active and Inactive Clients Count", lambda m: {}),
+    (r"completion", "Get Course Completion Rates", lambda m: {}),
+    (r"attendance", "Get Attendance Percentage By Class",
+     lambda m: {"course_name": None, "start_date": None, "end_date": None, "page": 1}),
+    (r"enrollment", "Get Enrollment Trends", lambda m: {}),
+]
+
+_OBSERVATION = "Observation:"
+_TOOL_ERROR = "error while trying to use the tool"
+
+
+def _question(messages: List[Dict[str, Any]]) -> str:
+    """The user's question inside CrewAI's task prompt (the last "User:" turn for support prompts)."""
+    text = next((str(m.get("content") or "") for m in messages if m.get("role") == "user"), "")
+    match = re.search(r"Current Task:(.*?)(?:\n\s*This is the expected criteria|$)", text, re.S)
+    task = match.group(1) if match else text
+    turns = task.split("User:")
+    return turns[-1].strip()
+
+
+def _tools(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+
+
+def _observation(messages: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    The result of the last tool call, once CrewAI has fed one back as "<our reply>\nObservation: <result>".
+    The system prompt's format help, which also mentions "Observation:", is skipped.
+    """
+    for message in reversed(messages):
+        content = str(message.get("content") or "")
+        if message.get("role") != "system" and _OBSERVATION in content:
+            return content.split(_OBSERVATION, 1)[1].strip()
+    return None
+
+
+def scripted_reply(messages: List[Dict[str, Any]]) -> str:
+    """Either a ReAct tool call for the question or, after an observation (or with no matching tool), the final answer."""
+    observation = _observation(messages)
+    if observation is not None:
+        return f"Thought: I now know the final answer\nFinal Answer: Here is what I found: {observation[:300]}"
+
+    question = _question(messages)
+    tools = _tools(messages)
+    for pattern, tool, build_input in SCRIPT:
+        match = re.search(pattern, question, re.I)
+        if match and f"Tool Name: {tool}" in tools:
+            return f"Thought: I should look this up with {tool}.\nAction: {tool}\nAction Input: {json.dumps(build_input(match))}"
+    return f"Thought: I can answer this without a tool.\nFinal Answer: Thanks for asking about \"{question[:120]}\"."
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class ScriptedLLM(CustomLLM):
+    """
+    LiteLLM custom provider answering with scripted_reply() after `latency_ms`. Counts the
+    calls and the tool errors CrewAI reported back, which still end in a 200 response.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self.tool_errors = 0
+        self._lock = threading.Lock()
+
+    def _response(self, model: str, messages: List[Dict[str, Any]], model_response: ModelResponse) -> ModelResponse:
+        observation = _observation(messages)
+        with self._lock:
+            self.calls += 1
+            self.tool_errors += bool(observation and _TOOL_ERROR in observation)
+        reply = scripted_reply(messages)
+        prompt_tokens = _tokens("".join(str(m.get("content") or "") for m in messages))
+        completion_tokens = _tokens(reply)
+        model_response.choices[0].message.content = reply
+        model_response.choices[0].finish_reason = "stop"
+        model_response.model = model
+        setattr(model_response, "usage", Usage(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ))
+        return model_response
+
+    def completion(self, model, messages, api_base, custom_prompt_dict, model_response, *args, **kwargs) -> ModelResponse:
+        time.sleep(self.latency_ms / 1000)
+        return self._response(model, messages, model_response)
+
+    async def acompletion(self, model, messages, api_base, custom_prompt_dict, model_response, *args, **kwargs) -> ModelResponse:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._response(model, messages, model_response)
+
+
+def install(latency_ms: float) -> ScriptedLLM:
+    """Registers the scripted provider; models named "bench/<anything>" are served by it."""
+    handler = ScriptedLLM(latency_ms)
+    litellm.custom_provider_map = [
+        item for item in litellm.custom_provider_map if item["provider"] != PROVIDER
+    ] + [{"provider": PROVIDER, "custom_handler": handler}]
+    litellm.suppress_debug_info = True
+    return handler
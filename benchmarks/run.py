@@ -0,0 +1,344 @@
+"""
+Offline load test for the API. Runs the real app (app.main:app) in-process through its
+lifespan, with the scripted LLM provider (benchmarks/fake_llm.py) and in-memory MongoDB and
+Redis (benchmarks/stores.py) unless --mongo-uri / --redis-url point at local servers. Each
+scenario is driven at --concurrency and reported as p50/p95/p99 latency and throughput;
+--baseline compares the run against a stored result and exits 1 on a regression (error rates
+and tool errors; latency and throughput too with --gate-latency, for same-machine baselines).
+
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+    python -m benchmarks.run --scenarios support --concurrency 16 --llm-latency-ms 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Request = Tuple[str, str, Dict[str, Any]]
+
+SCENARIOS = ("support", "dashboard", "external")
+
+# Latency metrics, gated only with --gate-latency: absolute timings are only comparable against a
+# baseline recorded on the same machine. p99 is reported but never gated; a few hundred requests
+# make it too noisy. Error rates and tool errors do not depend on the machine and are always gated.
+_LOWER_IS_BETTER = ("p50_ms", "p95_ms")
+_HIGHER_IS_BETTER = ("throughput_rps",)
+_ERROR_RATE_SLACK = 0.01
+
+# Scenarios run with the similarity cache off. The dashboard has a handful of parameterless
+# questions, so after the warmup every request would be a near-duplicate hit and the scenario
+# would time the cache rather than the agent. The tool result cache stays on.
+_NO_SIMILARITY_CACHE = {"dashboard"}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline load test with a scripted LLM and in-memory data stores.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario, run first.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once.")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="Time each scripted LLM completion takes.")
+    parser.add_argument("--clients", type=int, default=200, help="Clients in the generated dataset (orders, payments and classes scale with it).")
+    parser.add_argument("--sessions", type=int, default=50, help="Distinct support session IDs the requests rotate through.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cold", action="store_true", help="Disable the similarity and tool result caches.")
+    parser.add_argument("--mongo-uri", help="Use this MongoDB (e.g. a local mongod) instead of the in-memory one. Its benchmark database is overwritten.")
+    parser.add_argument("--redis-url", help="Use this Redis instead of the in-memory one.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against this results file and exit 1 on a regression.")
+    parser.add_argument("--gate-latency", action="store_true",
+                        help="Also fail on p50/p95/throughput regressions. Only meaningful against a baseline recorded on this machine.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative latency regression with --gate-latency (0.25 = 25%%).")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to --baseline instead of comparing.")
+    args = parser.parse_args(argv)
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def configure_environment(args: argparse.Namespace):
+    """Settings the app reads at import time: every model goes to the scripted provider, nothing leaves the machine."""
+    from benchmarks.fake_llm import PROVIDER
+
+    models = {
+        "SUPPORT_FAST_MODEL": f"{PROVIDER}/support-fast",
+        "SUPPORT_PRO_MODEL": f"{PROVIDER}/support-pro",
+        "DASHBOARD_FAST_MODEL": f"{PROVIDER}/dashboard-fast",
+        "DASHBOARD_PRO_MODEL": f"{PROVIDER}/dashboard-pro",
+    }
+    os.environ.update(models)
+    os.environ.update({
+        "CONTEXT_SUMMARY_MODEL": models["SUPPORT_FAST_MODEL"],
+        "MODEL_PRICES": json.dumps({model: [0, 0] for model in models.values()}),
+        "GEMINI_API_KEY": "offline",
+        "MONGO_URI": args.mongo_uri or "mongodb://in-memory",
+        "DB_NAME": os.environ.get("BENCH_DB_NAME", "benchmark"),
+        "REDIS_URL": args.redis_url or "redis://in-memory",
+        "LLM_STREAMING": "false",
+        "SERVER_TIMING_ENABLED": "true",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+        "LITELLM_LOCAL_MODEL_COST_MAP": "true",
+    })
+    if args.cold:
+        os.environ.update({"SIMILARITY_CACHE_ENABLED": "false", "TOOL_CACHE_ENABLED": "false"})
+
+
+def support_requests(args: argparse.Namespace) -> Callable[[int], Request]:
+    from benchmarks.data import client_name
+
+    prompts = [
+        "What is the status of order {order}?",
+        "Show the contact details for {name}",
+        "What services is {name} enrolled in?",
+        "What are the pending dues for {name}?",
+        "List the orders for {name}",
+        "Which classes are available for yoga next week?",
+        "Show the payment details for order {order}",
+        "What is your cancellation policy?",
+    ]
+
+    def request(i: int) -> Request:
+        client = (i * 7) % args.clients
+        prompt = prompts[i % len(prompts)].format(name=client_name(client), order=12345 + (i * 13) % (args.clients * 2))
+        return "GET", "/support/query", {"params": {"q": prompt}, "headers": {"session-id": f"bench-{i % args.sessions}"}}
+    return request
+
+
+def dashboard_requests(args: argparse.Namespace) -> Callable[[int], Request]:
+    # No attendance or time-series prompts: mongomock lacks $lookup pipelines and $dateTrunc.
+    prompts = [
+        "What is the total revenue this month?",
+        "Which are the top {limit} services?",
+        "Show the outstanding payments",
+        "How many new clients joined this month?",
+        "How many active and inactive clients do we have?",
+        "What are the course completion rates?",
+        "Show the enrollment trends",
+    ]
+
+    def request(i: int) -> Request:
+        prompt = prompts[i % len(prompts)].format(limit=2 + i % 4)
+        return "GET", "/dashboard/query", {"params": {"q": prompt}}
+    return request
+
+
+def external_requests(args: argparse.Namespace) -> Callable[[int], Request]:
+    from benchmarks.data import COURSES, client_name
+
+    def request(i: int) -> Request:
+        if i % 2 == 0:
+            body = {"name": f"Bench Client {i}", "email": f"bench{i}@example.com", "phone": f"8{i:09d}"}
+            return "POST", "/external/client", {"json": body}
+        body = {"client_name": client_name((i * 11) % args.clients), "course_name": COURSES[i % len(COURSES)]["name"]}
+        return "POST", "/external/order", {"json": body}
+    return request
+
+
+REQUESTS = {"support": support_requests, "dashboard": dashboard_requests, "external": external_requests}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _server_timing(header: str) -> Dict[str, float]:
+    phases = {}
+    for item in header.split(","):
+        name, _, duration = item.strip().partition(";dur=")
+        if duration and name != "total":
+            phases[name] = float(duration)
+    return phases
+
+
+async def run_scenario(client, build_request: Callable[[int], Request], requests: int, warmup: int, concurrency: int) -> Dict[str, Any]:
+    """Sends `warmup` and then `requests` requests with `concurrency` in flight and summarizes the measured ones."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    phase_totals: Dict[str, float] = {}
+
+    async def send(i: int, measured: bool):
+        method, url, kwargs = build_request(i)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except Exception as e:
+            response, status = None, type(e).__name__
+        elapsed = (time.perf_counter() - start) * 1000
+        if measured:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            if response is not None:
+                for phase, ms in _server_timing(response.headers.get("server-timing", "")).items():
+                    phase_totals[phase] = phase_totals.get(phase, 0.0) + ms
+
+    async def drive(indexes, measured: bool):
+        async def worker():
+            for i in indexes:
+                await send(i, measured)
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    await drive(iter(range(warmup)), measured=False)
+    start = time.perf_counter()
+    await drive(iter(range(warmup, warmup + requests)), measured=True)
+    wall = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50), 2),
+        "p95_ms": round(percentile(ordered, 95), 2),
+        "p99_ms": round(percentile(ordered, 99), 2),
+        "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "status": dict(sorted(statuses.items())),
+        "phases_mean_ms": {phase: round(total / requests, 2) for phase, total in sorted(phase_totals.items())},
+    }
+
+
+@contextmanager
+def similarity_cache_enabled(enabled: bool):
+    """Turns the similarity cache on or off (SIMILARITY_CACHE_ENABLED) for one scenario."""
+    from app.agents import dashboard_agent, support_agent
+    from app.api import routes
+
+    modules = (dashboard_agent, support_agent, routes)
+    previous = [module.SIMILARITY_CACHE_ENABLED for module in modules]
+    for module in modules:
+        module.SIMILARITY_CACHE_ENABLED = enabled
+    try:
+        yield
+    finally:
+        for module, value in zip(modules, previous):
+            module.SIMILARITY_CACHE_ENABLED = value
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    configure_environment(args)
+
+    import httpx
+    from benchmarks import data, fake_llm, stores
+
+    llm = fake_llm.install(args.llm_latency_ms)
+    from app.core.config import DB_NAME
+    if not args.mongo_uri:
+        stores.install_memory_mongo(DB_NAME)
+    if not args.redis_url:
+        stores.install_memory_redis()
+    from app.main import app
+
+    dataset = data.load(args.clients, args.seed)
+    results: Dict[str, Any] = {"scenarios": {}}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+            for name in args.scenarios:
+                use_similarity_cache = not args.cold and name not in _NO_SIMILARITY_CACHE
+                with similarity_cache_enabled(use_similarity_cache):
+                    results["scenarios"][name] = await run_scenario(
+                        client, REQUESTS[name](args), args.requests, args.warmup, args.concurrency,
+                    )
+                results["scenarios"][name]["similarity_cache"] = use_similarity_cache
+                print(f"{name}: done", file=sys.stderr)
+
+    results["llm_calls"] = llm.calls
+    results["tool_errors"] = llm.tool_errors
+    results["config"] = {
+        "requests": args.requests, "warmup": args.warmup, "concurrency": args.concurrency,
+        "llm_latency_ms": args.llm_latency_ms, "clients": args.clients, "sessions": args.sessions,
+        "seed": args.seed, "cold": args.cold, "mongo": "external" if args.mongo_uri else "in-memory",
+        "redis": "external" if args.redis_url else "in-memory", "dataset": dataset,
+    }
+    results["environment"] = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, gate_latency: bool = False) -> List[str]:
+    """Human-readable regressions of `results` against `baseline`; empty when none."""
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        for key in _LOWER_IS_BETTER if gate_latency else ():
+            if base[key] and current[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name} {key}: {current[key]} > {base[key]} (+{current[key] / base[key] - 1:.0%})")
+        for key in _HIGHER_IS_BETTER if gate_latency else ():
+            if base[key] and current[key] < base[key] * (1 - tolerance):
+                regressions.append(f"{name} {key}: {current[key]} < {base[key]} ({current[key] / base[key] - 1:.0%})")
+        if current["error_rate"] > base["error_rate"] + _ERROR_RATE_SLACK:
+            regressions.append(f"{name} error_rate: {current['error_rate']} > {base['error_rate']}")
+    if results["tool_errors"] > baseline.get("tool_errors", 0):
+        regressions.append(f"tool_errors: {results['tool_errors']} > {baseline.get('tool_errors', 0)}")
+    return regressions
+
+
+def _config_differences(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    keys = ("requests", "concurrency", "llm_latency_ms", "clients", "sessions", "seed", "cold", "mongo", "redis")
+    current, base = results["config"], baseline.get("config", {})
+    return [f"{key}={current.get(key)} (baseline {base.get(key)})" for key in keys if current.get(key) != base.get(key)]
+
+
+def report(results: Dict[str, Any]):
+    header = f"{'scenario':<10} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}  phases (mean ms)"
+    print(header)
+    print("-" * len(header))
+    for name, s in results["scenarios"].items():
+        phases = ", ".join(f"{phase}={ms}" for phase, ms in s["phases_mean_ms"].items())
+        print(f"{name:<10} {s['throughput_rps']:>8} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} {s['max_ms']:>9} {s['errors']:>7}  {phases}")
+    print(f"LLM calls: {results['llm_calls']}, tool errors: {results['tool_errors']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    differences = _config_differences(results, baseline)
+    if differences:
+        print("Warning: run settings differ from the baseline: " + ", ".join(differences))
+    gated = f"latency tolerance {args.tolerance:.0%}" if args.gate_latency else "error metrics only"
+    regressions = compare(results, baseline, args.tolerance, args.gate_latency)
+    if regressions:
+        print(f"Regressions against {args.baseline} ({gated}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"No regressions against {args.baseline} ({gated}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+In-memory stand-ins for MongoDB (mongomock) and Redis (fakeredis), installed into the app's
+client slots before it starts. The async Mongo adapter runs each mongomock call inline on the
+event loop, which is roughly what a query against a local, warm mongod costs.
+"""
+from typing import Any, Iterable
+
+import fakeredis
+import mongomock
+
+
+class AsyncCursor:
+    """The parts of pymongo's AsyncCursor / AsyncCommandCursor the app uses."""
+
+    def __init__(self, cursor: Iterable[Any]):
+        self._cursor = cursor
+        self._iter = None
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, *args):
+        self._cursor = self._cursor.limit(*args)
+        return self
+
+    def skip(self, *args):
+        self._cursor = self._cursor.skip(*args)
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        items = list(self._cursor)
+        return items if length is None else items[:length]
+
+    async def close(self):
+        pass
+
+
+class AsyncCollection:
+    def __init__(self, collection: mongomock.Collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs) -> AsyncCursor:
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **kwargs) -> AsyncCursor:
+        return AsyncCursor(self._collection.aggregate(pipeline, **kwargs))
+
+    def __getattr__(self, name: str):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, db: mongomock.Database):
+        self._db = db
+
+    async def command(self, *args, **kwargs):
+        return self._db.command(*args, **kwargs)
+
+    def __getitem__(self, name: str) -> AsyncCollection:
+        return AsyncCollection(self._db[name])
+
+    def __getattr__(self, name: str) -> AsyncCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return AsyncCollection(self._db[name])
+
+
+class AsyncClient:
+    def __init__(self, client: mongomock.MongoClient):
+        self._client = client
+
+    def __getitem__(self, name: str) -> AsyncDatabase:
+        return AsyncDatabase(self._client[name])
+
+    async def close(self):
+        pass
+
+
+def install_memory_mongo(db_name: str) -> mongomock.Database:
+    """Points get_db() and get_async_db() at one shared in-memory database."""
+    from app.core import database
+
+    client = mongomock.MongoClient()
+    database._client = client
+    database._db = client[db_name]
+    database._async_client = AsyncClient(client)
+    database._async_db = database._async_client[db_name]
+    return database._db
+
+
+def install_memory_redis():
+    """Points the sync and asyncio Redis clients at one in-memory fakeredis server (Lua included)."""
+    from app.cache import redis_cache
+
+    server = fakeredis.FakeServer()
+    redis_cache.r = fakeredis.FakeRedis(server=server, decode_responses=True)
+    redis_cache._async_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
@@ -0,0 +1,71 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.agents import single_flight as sf
+from app.cache import redis_cache
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(redis_cache, "_async_client", client)
+    monkeypatch.setattr(redis_cache, "_healthy", True)
+    monkeypatch.setattr(sf, "SINGLE_FLIGHT_ENABLED", True)
+    return client
+
+
+def test_waiter_gets_the_result_of_the_run_in_flight(fake_redis):
+    """A second leader starting within result_ttl of the first one's publish must not hand out the first result."""
+    async def scenario():
+        first, second, waiter = (sf.SingleFlight(lock_ttl=10, result_ttl=30) for _ in range(3))
+        key = sf.flight_key("dashboard", "What is the total revenue this month?")
+
+        async def answer(text, started=None, release=None):
+            if started:
+                started.set()
+                await release.wait()
+            return text
+
+        assert await first.do(key, lambda: answer("before the write")) == "before the write"
+
+        started, release = asyncio.Event(), asyncio.Event()
+        leader = asyncio.create_task(second.do(key, lambda: answer("after the write", started, release)))
+        await started.wait()
+        joined = asyncio.create_task(waiter.do(key, lambda: answer("ran again")))
+        await asyncio.sleep(0.05)
+        assert not joined.done()
+        release.set()
+        return await leader, await joined, waiter.stats()
+
+    leader, joined, stats = asyncio.run(scenario())
+    assert leader == "after the write"
+    assert joined == "after the write"
+    assert stats["remote_joins"] == 1
+
+
+def test_waiter_runs_the_query_when_the_leader_fails(fake_redis):
+    async def scenario():
+        leader_flight, waiter_flight = sf.SingleFlight(lock_ttl=10, result_ttl=30), sf.SingleFlight(lock_ttl=10, result_ttl=30)
+        key = sf.flight_key("dashboard", "Which are the top services?")
+        started = asyncio.Event()
+
+        async def fail():
+            started.set()
+            await asyncio.sleep(0.05)
+            raise RuntimeError("LLM unavailable")
+
+        async def answer():
+            return "top services"
+
+        leader = asyncio.create_task(leader_flight.do(key, fail))
+        await started.wait()
+        joined = await waiter_flight.do(key, answer)
+        with pytest.raises(RuntimeError):
+            await leader
+        return joined, waiter_flight.stats()
+
+    joined, stats = asyncio.run(scenario())
+    assert joined == "top services"
+    assert stats["remote_fallbacks"] == 1